@@ -0,0 +1,192 @@
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from data_exporter import HospitalDataExporter
+from export_writers import WRITERS, WRITERS_BY_TITLE, open_output, write_all
+from synthetic_db import create_synthetic_database
+
+try:
+    import resource
+except ImportError:
+    # На Windows модуля resource нет: пиковая память не измеряется
+    resource = None
+
+DEFAULT_SIZES = (10000, 100000, 1000000)
+RESULT_FIELDS = ('patients', 'appointments_per_patient', 'medications_per_patient', 'stage', 'rows',
+                 'seconds', 'rows_per_second', 'peak_rss_kb', 'output_bytes', 'error')
+
+
+def peak_rss_kb():
+    """Пиковый объем памяти текущего процесса в КБ (None, если измерить нельзя)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # В macOS ru_maxrss в байтах, в Linux - в килобайтах
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def count_rows(db_path):
+    """Число строк, которые выгрузка читает из базы: пациенты, приемы и лекарства"""
+    conn = sqlite3.connect(db_path)
+    try:
+        return sum(conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                   for table in ('patients', 'appointments', 'medications'))
+    finally:
+        conn.close()
+
+
+def run_stage(stage, db_path, out_dir):
+    """Выполняет один этап в текущем процессе: выборку или выборку с записью одного формата"""
+    output_bytes = None
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        exporter = HospitalDataExporter(db_path, out_dir)
+        if stage == 'fetch':
+            for _ in exporter.iter_patient_data():
+                pass
+        else:
+            writer_cls = WRITERS_BY_TITLE[stage]
+            with open_output(writer_cls, out_dir) as output:
+                write_all(writer_cls, output.stream, exporter.iter_patient_data())
+            output_bytes = os.path.getsize(output.path)
+    return {'seconds': time.perf_counter() - started, 'peak_rss_kb': peak_rss_kb(),
+            'output_bytes': output_bytes}
+
+
+def measure(stage, db_path, out_dir):
+    """Запускает этап в отдельном процессе, чтобы пиковая память относилась только к нему"""
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--stage', stage, '--db', db_path, '--out-dir', out_dir],
+        capture_output=True, text=True, encoding='utf-8')
+    if completed.returncode != 0:
+        error = completed.stderr.strip().splitlines()
+        return {'seconds': None, 'peak_rss_kb': None, 'output_bytes': None,
+                'error': error[-1] if error else f"код возврата {completed.returncode}"}
+    return json.loads(completed.stdout)
+
+
+def prepare_database(db_dir, patients, appointments, medications):
+    """Синтетическая база нужного размера; уже созданная база используется повторно"""
+    db_path = os.path.join(db_dir, f'hospital-{patients}-{appointments}-{medications}.db')
+    if os.path.exists(db_path):
+        print(f"База {db_path} уже создана")
+        return db_path
+
+    started = time.perf_counter()
+    # База создается под временным именем, чтобы прерванная генерация не осталась в кэше
+    create_synthetic_database(db_path + '.tmp', patients, appointments, medications)
+    os.replace(db_path + '.tmp', db_path)
+    print(f"База {db_path} создана за {time.perf_counter() - started:.1f} с")
+    return db_path
+
+
+def save_results(results_dir, meta, results):
+    """Сохраняет результаты в JSON (с описанием окружения) и CSV"""
+    os.makedirs(results_dir, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    json_path = os.path.join(results_dir, f'export-{stamp}.json')
+    csv_path = os.path.join(results_dir, f'export-{stamp}.csv')
+
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump({'meta': meta, 'results': results}, f, ensure_ascii=False, indent=2)
+    with open(csv_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        writer.writerows(results)
+    return json_path, csv_path
+
+
+def git_revision():
+    """Текущий коммит репозитория (None, если git недоступен)"""
+    try:
+        completed = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                   cwd=os.path.dirname(os.path.abspath(__file__)))
+    except OSError:
+        return None
+    return completed.stdout.strip() or None
+
+
+def main():
+    """Бенчмарк выгрузки на синтетических базах разного размера"""
+    parser = argparse.ArgumentParser(description="Бенчмарк экспорта на синтетических базах")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help="числа пациентов")
+    parser.add_argument('--appointments', type=int, default=2, help="приемов на пациента")
+    parser.add_argument('--medications', type=int, default=2, help="лекарств на пациента")
+    parser.add_argument('--formats', nargs='+', choices=[writer_cls.title for writer_cls in WRITERS],
+                        default=[writer_cls.title for writer_cls in WRITERS])
+    parser.add_argument('--db-dir', default=os.path.join(tempfile.gettempdir(), 'hospital-benchmark'),
+                        help="папка для синтетических баз (базы сохраняются между запусками)")
+    parser.add_argument('--results-dir', default='benchmark_results')
+    # Служебные параметры: запуск одного этапа в дочернем процессе
+    parser.add_argument('--stage', help=argparse.SUPPRESS)
+    parser.add_argument('--db', help=argparse.SUPPRESS)
+    parser.add_argument('--out-dir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.stage:
+        print(json.dumps(run_stage(args.stage, args.db, args.out_dir)))
+        return
+
+    os.makedirs(args.db_dir, exist_ok=True)
+    results = []
+    for patients in args.sizes:
+        print(f"\nПациентов: {patients}, приемов и лекарств на пациента: "
+              f"{args.appointments} и {args.medications}")
+        print("-" * 20)
+        db_path = prepare_database(args.db_dir, patients, args.appointments, args.medications)
+        rows = count_rows(db_path)
+
+        with tempfile.TemporaryDirectory() as out_dir:
+            for stage in ['fetch'] + args.formats:
+                measured = measure(stage, db_path, out_dir)
+                seconds = measured['seconds']
+                result = {
+                    'patients': patients,
+                    'appointments_per_patient': args.appointments,
+                    'medications_per_patient': args.medications,
+                    'stage': stage,
+                    'rows': rows,
+                    'seconds': seconds,
+                    'rows_per_second': rows / seconds if seconds else None,
+                    'peak_rss_kb': measured['peak_rss_kb'],
+                    'output_bytes': measured['output_bytes'],
+                    'error': measured.get('error')
+                }
+                results.append(result)
+
+                if result['error']:
+                    print(f"{stage:6} ошибка: {result['error']}")
+                    continue
+                line = f"{stage:6} время: {seconds:8.3f} с  строк/с: {result['rows_per_second']:12.0f}"
+                if result['peak_rss_kb'] is not None:
+                    line += f"  пик памяти: {result['peak_rss_kb'] / 1024:7.1f} МБ"
+                if result['output_bytes'] is not None:
+                    line += f"  размер: {result['output_bytes']} байт"
+                print(line)
+
+    meta = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'note': "время этапа формата включает выборку данных (см. этап fetch)"
+    }
+    json_path, csv_path = save_results(args.results_dir, meta, results)
+    print(f"\nРезультаты сохранены: {json_path}, {csv_path}")
+
+
+if __name__ == "__main__":
+    main()
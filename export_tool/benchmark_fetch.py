@@ -0,0 +1,118 @@
+import argparse
+import contextlib
+import io
+import os
+import sqlite3
+import tempfile
+import time
+
+from data_exporter import HospitalDataExporter
+from synthetic_db import create_synthetic_database
+
+# Прежний запрос: назначения и лекарства в одном JOIN дают A x M строк на пациента
+LEGACY_QUERY = """
+SELECT
+    p.patient_id, p.surname, p.name, p.patronymic, p.doctor_id,
+    d.surname, d.name, d.patronymic,
+    mc.health_complaints, mc.medical_history, mc.treatment_plan,
+    a.appointment_id, a.appointment_date, a.appointment_time, a.confirmed,
+    m.medication_id, m.medication_name, m.usage_description, m.is_taken
+FROM patients p
+LEFT JOIN doctors d ON p.doctor_id = d.doctor_id
+LEFT JOIN medical_cards mc ON p.patient_id = mc.patient_id
+LEFT JOIN appointments a ON p.patient_id = a.patient_id
+LEFT JOIN medications m ON p.patient_id = m.patient_id
+ORDER BY p.patient_id
+"""
+
+
+def legacy_fetch(db_path):
+    """Прежняя выборка с группировкой и поиском дубликатов перебором списка"""
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute(LEGACY_QUERY).fetchall()
+    conn.close()
+
+    patients = {}
+    for row in rows:
+        patient_id = row[0]
+        if patient_id not in patients:
+            patients[patient_id] = {
+                'patient_id': patient_id,
+                'surname': row[1],
+                'name': row[2],
+                'patronymic': row[3],
+                'doctor_id': row[4],
+                'doctor': {'surname': row[5], 'name': row[6], 'patronymic': row[7]} if row[5] else None,
+                'medical_card': {
+                    'health_complaints': row[8],
+                    'medical_history': row[9],
+                    'treatment_plan': row[10]
+                } if row[8] else None,
+                'appointments': [],
+                'medications': []
+            }
+        if row[11]:
+            appointment = {'appointment_id': row[11], 'appointment_date': row[12],
+                           'appointment_time': row[13], 'confirmed': bool(row[14])}
+            if not any(a['appointment_id'] == appointment['appointment_id'] for a in
+                       patients[patient_id]['appointments']):
+                patients[patient_id]['appointments'].append(appointment)
+        if row[15]:
+            medication = {'medication_id': row[15], 'medication_name': row[16],
+                          'usage_description': row[17], 'is_taken': bool(row[18])}
+            if not any(m['medication_id'] == medication['medication_id'] for m in
+                       patients[patient_id]['medications']):
+                patients[patient_id]['medications'].append(medication)
+
+    return list(patients.values()), len(rows)
+
+
+def merge_fetch(db_path, out_dir):
+    """Новая выборка: отдельные запросы по таблицам и слияние за один проход"""
+    return HospitalDataExporter(db_path, out_dir).fetch_patient_data()
+
+
+def merge_row_count(db_path):
+    """Строк, которые читает слияние: сумма размеров таблиц. Считается вне замера времени"""
+    conn = sqlite3.connect(db_path)
+    try:
+        return sum(conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                   for table in ('patients', 'appointments', 'medications'))
+    finally:
+        conn.close()
+
+
+def main():
+    """Сравнение прежнего JOIN-запроса и слияния отсортированных выборок"""
+    parser = argparse.ArgumentParser(description="Бенчмарк выборки данных для экспорта")
+    parser.add_argument('--patients', type=int, default=500)
+    parser.add_argument('--appointments', type=int, default=50, help="приемов на пациента")
+    parser.add_argument('--medications', type=int, default=50, help="лекарств на пациента")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'hospital.db')
+        create_synthetic_database(db_path, args.patients, args.appointments, args.medications)
+        print(f"Пациентов: {args.patients}, приемов и лекарств на пациента: "
+              f"{args.appointments} и {args.medications}")
+
+        results = {}
+        # Папка выгрузки экспортера - временная: бенчмарк не создает out/ в текущей папке
+        fetches = (('JOIN (прежний)', lambda: legacy_fetch(db_path)),
+                   ('слияние', lambda: (merge_fetch(db_path, tmp), None)))
+        for title, fetch in fetches:
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                data, rows = fetch()
+            elapsed = time.perf_counter() - started
+            if rows is None:
+                rows = merge_row_count(db_path)
+            results[title] = data
+            print(f"{title:15} строк из базы: {rows:>10}  время: {elapsed:8.3f} с")
+
+        legacy, merged = results.values()
+        print("Результаты совпадают" if legacy == merged else "ВНИМАНИЕ: результаты различаются")
+
+
+if __name__ == "__main__":
+    main()
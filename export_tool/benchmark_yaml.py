@@ -0,0 +1,141 @@
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+from datetime import date
+
+from data_exporter import HospitalDataExporter
+from export_writers import YamlWriter, write_all
+from synthetic_db import create_synthetic_database
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+
+class LegacyYamlWriter:
+    """Прежняя запись YAML: рекурсия с вызовом write на каждое значение"""
+
+    def __init__(self, f):
+        self.f = f
+
+    def write(self, data):
+        for patient in data:
+            self.f.write('- \n')
+            self._write_yaml(patient, self.f, 1)
+
+    def _write_yaml(self, data, f, indent=0):
+        indent_str = '  ' * indent
+
+        if isinstance(data, list):
+            for item in data:
+                f.write(f'{indent_str}- ')
+                if isinstance(item, (dict, list)):
+                    f.write('\n')
+                    self._write_yaml(item, f, indent + 1)
+                else:
+                    f.write(f'{self._yaml_value(item)}\n')
+        elif isinstance(data, dict):
+            first = True
+            for key, value in data.items():
+                if isinstance(value, (dict, list)):
+                    if not first:
+                        f.write('\n')
+                    f.write(f'{indent_str}{key}:\n')
+                    self._write_yaml(value, f, indent + 1)
+                else:
+                    f.write(f'{indent_str}{key}: {self._yaml_value(value)}\n')
+                first = False
+        else:
+            f.write(f'{indent_str}{self._yaml_value(data)}\n')
+
+    def _yaml_value(self, value):
+        if value is None:
+            return 'null'
+        elif isinstance(value, bool):
+            return 'true' if value else 'false'
+        elif isinstance(value, (int, float)):
+            return str(value)
+        else:
+            str_value = str(value)
+            if any(char in str_value for char in ':[]{}#&*!|>\"\'%@`'):
+                return f'"{str_value}"'
+            return str_value
+
+
+def legacy_emit(data, f):
+    LegacyYamlWriter(f).write(data)
+
+
+def new_emit(data, f):
+    write_all(YamlWriter, f, data)
+
+
+def pyyaml_emit(data, f):
+    dumper = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+    yaml.dump(data, f, Dumper=dumper, allow_unicode=True, sort_keys=False, default_flow_style=False)
+
+
+def _dates_to_text(value):
+    """Даты ГГГГ-ММ-ДД YAML читает как date - приводим обратно к строке для сравнения"""
+    if isinstance(value, dict):
+        return {key: _dates_to_text(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_dates_to_text(item) for item in value]
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def run(title, emit, data, path, repeat):
+    """Лучшее из repeat время записи в файл"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        with open(path, 'w', encoding='utf-8') as f:
+            emit(data, f)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    size = os.path.getsize(path)
+    print(f"{title:22} время: {best:8.3f} с  {size / best / 1024 / 1024:7.1f} МБ/с  размер: {size} байт")
+    return path
+
+
+def main():
+    """Сравнение прежней записи YAML, новой записи и PyYAML"""
+    parser = argparse.ArgumentParser(description="Бенчмарк записи YAML")
+    parser.add_argument('--patients', type=int, default=20000)
+    parser.add_argument('--appointments', type=int, default=3, help="приемов на пациента")
+    parser.add_argument('--medications', type=int, default=3, help="лекарств на пациента")
+    parser.add_argument('--repeat', type=int, default=3, help="число повторов, берется лучшее время")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'hospital.db')
+        create_synthetic_database(db_path, args.patients, args.appointments, args.medications)
+        # Папка выгрузки экспортера - временная, чтобы не создавать out/ в текущей папке
+        with contextlib.redirect_stdout(io.StringIO()):
+            data = HospitalDataExporter(db_path, tmp).fetch_patient_data()
+        print(f"Пациентов: {args.patients}, приемов и лекарств на пациента: "
+              f"{args.appointments} и {args.medications}")
+
+        run('прежняя запись', legacy_emit, data, os.path.join(tmp, 'legacy.yaml'), args.repeat)
+        new_path = run('новая запись', new_emit, data, os.path.join(tmp, 'new.yaml'), args.repeat)
+        if yaml is None:
+            print("PyYAML не установлен: сравнение с ним и проверка разбора пропущены")
+            return
+        dumper = 'CSafeDumper' if hasattr(yaml, 'CSafeDumper') else 'SafeDumper'
+        run(f'PyYAML ({dumper})', pyyaml_emit, data, os.path.join(tmp, 'pyyaml.yaml'), args.repeat)
+
+        loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+        with open(new_path, encoding='utf-8') as f:
+            loaded = yaml.load(f, Loader=loader)
+        print("Новый YAML читается PyYAML без потерь" if _dates_to_text(loaded) == data
+              else "ВНИМАНИЕ: прочитанный YAML отличается от данных")
+
+
+if __name__ == "__main__":
+    main()
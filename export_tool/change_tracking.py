@@ -0,0 +1,95 @@
+import json
+import os
+
+# Таблицы, изменения в которых затрагивают выгрузку пациента
+TRACKED_TABLES = ('patients', 'medical_cards', 'appointments', 'medications')
+
+
+def install_change_tracking(conn):
+    """Создает журнал изменений и триггеры на отслеживаемых таблицах (повторный вызов безопасен)"""
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS change_log (
+            change_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            patient_id INTEGER NOT NULL,
+            operation TEXT NOT NULL,
+            changed_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Поиск по patient_id идет по индексам схемы (idx_appointments_patient, idx_medications_patient_taken).
+    # Прежние версии создавали здесь idx_medications_patient - он повторяет начало idx_medications_patient_taken
+    cursor.execute('DROP INDEX IF EXISTS idx_medications_patient')
+
+    for table in TRACKED_TABLES:
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_change_insert
+            AFTER INSERT ON {table}
+            BEGIN
+                INSERT INTO change_log (table_name, patient_id, operation)
+                VALUES ('{table}', NEW.patient_id, 'insert');
+            END
+        ''')
+        # При переносе записи к другому пациенту затронуты оба пациента
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_change_update
+            AFTER UPDATE ON {table}
+            BEGIN
+                INSERT INTO change_log (table_name, patient_id, operation)
+                VALUES ('{table}', NEW.patient_id, 'update');
+                INSERT INTO change_log (table_name, patient_id, operation)
+                SELECT '{table}', OLD.patient_id, 'update'
+                WHERE OLD.patient_id IS NOT NEW.patient_id;
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_change_delete
+            AFTER DELETE ON {table}
+            BEGIN
+                INSERT INTO change_log (table_name, patient_id, operation)
+                VALUES ('{table}', OLD.patient_id, 'delete');
+            END
+        ''')
+
+    conn.commit()
+
+
+def last_change_id(conn):
+    """Номер последнего изменения в журнале"""
+    return conn.execute('SELECT COALESCE(MAX(change_id), 0) FROM change_log').fetchone()[0]
+
+
+def prune_change_log(conn, upto):
+    """Удаляет из журнала изменения, уже учтенные выгрузкой (по номер upto включительно).
+    Номера новых изменений не повторяются (AUTOINCREMENT), даже если журнал опустеет"""
+    return conn.execute('DELETE FROM change_log WHERE change_id <= ?', (upto,)).rowcount
+
+
+def load_changed_patient_ids(conn, after, upto):
+    """Заполняет временную таблицу export_patient_ids пациентами, измененными в (after, upto]"""
+    cursor = conn.cursor()
+    cursor.execute('CREATE TEMP TABLE IF NOT EXISTS export_patient_ids (patient_id INTEGER PRIMARY KEY)')
+    cursor.execute('DELETE FROM temp.export_patient_ids')
+    cursor.execute('''
+        INSERT INTO temp.export_patient_ids (patient_id)
+        SELECT DISTINCT patient_id FROM change_log
+        WHERE change_id > ? AND change_id <= ?
+    ''', (after, upto))
+    return [row[0] for row in cursor.execute('SELECT patient_id FROM temp.export_patient_ids')]
+
+
+def read_watermark(state_path):
+    """Читает номер изменения, по которое выполнена прошлая выгрузка (None, если выгрузок не было)"""
+    if not os.path.exists(state_path):
+        return None
+    with open(state_path, encoding='utf-8') as f:
+        return json.load(f)['last_change_id']
+
+
+def write_watermark(state_path, change_id):
+    """Атомарно сохраняет номер изменения, по которое выполнена выгрузка"""
+    tmp_path = state_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'last_change_id': change_id}, f)
+    os.replace(tmp_path, state_path)
@@ -0,0 +1,386 @@
+import argparse
+import json
+import mmap
+import shutil
+import struct
+import sys
+import tempfile
+import time
+from array import array
+from collections import Counter
+from datetime import date
+
+MAGIC = b'HCOL'
+VERSION = 1
+# Заголовок: сигнатура, версия, длина JSON-описания столбцов
+PREAMBLE = struct.Struct('<4sIQ')
+ALIGNMENT = 8
+# Сколько значений столбца держать в памяти до сброса во временный файл
+CHUNK_VALUES = 65536
+# Сколько разных строк словарь помнит для поиска повторов; строки словаря держатся в памяти
+# до этого размера в байтах, дальше - во временном файле
+DICTIONARY_ENTRIES = 65536
+DICTIONARY_SPOOL_BYTES = 1024 * 1024
+
+# Значения NULL для типизированных столбцов
+NULL_INT = -2 ** 63
+NULL_CODE = -1
+NULL_DAY = -2 ** 31
+NULL_MINUTE = -1
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# Столбцы: (таблица, поле, тип array); тип 'text' - строка, закодированная словарем (коды int32)
+COLUMNS = (
+    ('patients', 'patient_id', 'q'),
+    ('patients', 'doctor_id', 'q'),
+    ('patients', 'surname', 'text'),
+    ('patients', 'name', 'text'),
+    ('patients', 'patronymic', 'text'),
+    ('patients', 'doctor_surname', 'text'),
+    ('patients', 'doctor_name', 'text'),
+    ('patients', 'doctor_patronymic', 'text'),
+    ('patients', 'health_complaints', 'text'),
+    ('patients', 'medical_history', 'text'),
+    ('patients', 'treatment_plan', 'text'),
+    ('appointments', 'appointment_id', 'q'),
+    ('appointments', 'patient_id', 'q'),
+    ('appointments', 'appointment_date', 'i'),
+    ('appointments', 'appointment_time', 'h'),
+    ('appointments', 'confirmed', 'B'),
+    ('medications', 'medication_id', 'q'),
+    ('medications', 'patient_id', 'q'),
+    ('medications', 'medication_name', 'text'),
+    ('medications', 'usage_description', 'text'),
+    ('medications', 'is_taken', 'B'),
+)
+
+
+def date_to_day(value):
+    """Дата ГГГГ-ММ-ДД -> число дней с 1970-01-01 (NULL_DAY для NULL).
+    ValueError - дату не разобрать: испорченное значение не должно молча превратиться в NULL"""
+    if value is None:
+        return NULL_DAY
+    try:
+        year, month, day = value.split('-')
+        return date(int(year), int(month), int(day)).toordinal() - EPOCH_ORDINAL
+    except (AttributeError, ValueError):
+        raise ValueError(f"Неверная дата приема: {value!r}") from None
+
+
+def day_to_date(day):
+    """Число дней с 1970-01-01 -> строка ГГГГ-ММ-ДД"""
+    return None if day == NULL_DAY else date.fromordinal(day + EPOCH_ORDINAL).isoformat()
+
+
+def time_to_minute(value):
+    """Время ЧЧ:ММ -> минуты от полуночи (NULL_MINUTE для NULL).
+    ValueError - время не разобрать: испорченное значение не должно молча превратиться в NULL"""
+    if value is None:
+        return NULL_MINUTE
+    try:
+        hours, minutes = value.split(':')
+        hours, minutes = int(hours), int(minutes)
+    except (AttributeError, ValueError):
+        raise ValueError(f"Неверное время приема: {value!r}") from None
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError(f"Неверное время приема: {value!r}")
+    return hours * 60 + minutes
+
+
+def minute_to_time(minute):
+    """Минуты от полуночи -> строка ЧЧ:ММ"""
+    return None if minute == NULL_MINUTE else f'{minute // 60:02d}:{minute % 60:02d}'
+
+
+def _int_or_null(value):
+    return NULL_INT if value is None else value
+
+
+class _Column:
+    """Типизированный столбец: значения копятся блоками и сбрасываются во временный файл"""
+
+    def __init__(self, typecode):
+        self.typecode = typecode
+        self.values = array(typecode)
+        self.spill = None
+        self.spilled = 0
+
+    def append(self, value):
+        self.values.append(value)
+        if len(self.values) >= CHUNK_VALUES:
+            if self.spill is None:
+                self.spill = tempfile.TemporaryFile()
+            self.values.tofile(self.spill)
+            self.spilled += len(self.values)
+            del self.values[:]
+
+    @property
+    def count(self):
+        return self.spilled + len(self.values)
+
+    @property
+    def nbytes(self):
+        return self.count * self.values.itemsize
+
+    def write_to(self, f):
+        if self.spill is not None:
+            self.spill.seek(0)
+            shutil.copyfileobj(self.spill, f)
+            self.spill.close()
+        self.values.tofile(f)
+
+
+class _Dictionary:
+    """Словарь строк столбца: строки - во временном файле, смещения - столбцом, сбрасываемым блоками.
+    Повторы ищутся среди первых DICTIONARY_ENTRIES строк; в столбцах со свободным текстом почти все
+    значения разные, и дальше новая строка получает новый код, не запоминаясь (повтор может попасть
+    в словарь дважды - читатель этого не замечает). Память не растет с числом пациентов"""
+
+    def __init__(self):
+        self.codes = {}
+        self.count = 0
+        self.size = 0
+        self.offsets = _Column('q')
+        self.offsets.append(0)
+        self.blobs = tempfile.SpooledTemporaryFile(DICTIONARY_SPOOL_BYTES)
+
+    def encode(self, value):
+        if value is None:
+            return NULL_CODE
+        code = self.codes.get(value)
+        if code is None:
+            code = self.count
+            if len(self.codes) < DICTIONARY_ENTRIES:
+                self.codes[value] = code
+            blob = value.encode('utf-8')
+            self.blobs.write(blob)
+            self.size += len(blob)
+            self.offsets.append(self.size)
+            self.count += 1
+        return code
+
+    def write_blobs(self, f):
+        self.blobs.seek(0)
+        shutil.copyfileobj(self.blobs, f)
+        self.blobs.close()
+
+
+def _padding(position):
+    return -position % ALIGNMENT
+
+
+class ColumnarWriter:
+    """Двоичный столбцовый формат: типизированные столбцы, строки через словари, небольшой заголовок.
+    Файл читается через mmap без копирования (см. ColumnarFile)"""
+    title = 'HCOL'
+    file_name = 'data.hcol'
+    newline = None
+    # Двоичный файл не сжимается: его нужно отображать в память как есть
+    binary = True
+
+    def __init__(self, f):
+        self.f = f
+        self.count = 0
+        self.columns = {}
+        self.dictionaries = {}
+        for table, field, typecode in COLUMNS:
+            key = f'{table}.{field}'
+            if typecode == 'text':
+                self.columns[key] = _Column('i')
+                self.dictionaries[key] = _Dictionary()
+            else:
+                self.columns[key] = _Column(typecode)
+
+    def begin(self):
+        pass
+
+    def _text(self, key, value):
+        self.columns[key].append(self.dictionaries[key].encode(value))
+
+    def write_patient(self, patient):
+        columns = self.columns
+        columns['patients.patient_id'].append(patient['patient_id'])
+        columns['patients.doctor_id'].append(_int_or_null(patient['doctor_id']))
+        self._text('patients.surname', patient['surname'])
+        self._text('patients.name', patient['name'])
+        self._text('patients.patronymic', patient['patronymic'])
+
+        doctor = patient['doctor'] or {}
+        self._text('patients.doctor_surname', doctor.get('surname'))
+        self._text('patients.doctor_name', doctor.get('name'))
+        self._text('patients.doctor_patronymic', doctor.get('patronymic'))
+
+        card = patient['medical_card'] or {}
+        self._text('patients.health_complaints', card.get('health_complaints'))
+        self._text('patients.medical_history', card.get('medical_history'))
+        self._text('patients.treatment_plan', card.get('treatment_plan'))
+
+        for appointment in patient['appointments']:
+            # Дата и время разбираются до добавления строки: при ошибке столбцы не расходятся по длине
+            try:
+                day = date_to_day(appointment['appointment_date'])
+                minute = time_to_minute(appointment['appointment_time'])
+            except ValueError as e:
+                raise ValueError(f"Запись {appointment['appointment_id']} пациента {patient['patient_id']}: "
+                                 f"{e}") from None
+            columns['appointments.appointment_id'].append(appointment['appointment_id'])
+            columns['appointments.patient_id'].append(patient['patient_id'])
+            columns['appointments.appointment_date'].append(day)
+            columns['appointments.appointment_time'].append(minute)
+            columns['appointments.confirmed'].append(1 if appointment['confirmed'] else 0)
+
+        for medication in patient['medications']:
+            columns['medications.medication_id'].append(medication['medication_id'])
+            columns['medications.patient_id'].append(patient['patient_id'])
+            self._text('medications.medication_name', medication['medication_name'])
+            self._text('medications.usage_description', medication['usage_description'])
+            columns['medications.is_taken'].append(1 if medication['is_taken'] else 0)
+
+        self.count += 1
+
+    def end(self):
+        # Раскладка секций известна только после всех пациентов, поэтому заголовок пишется в конце
+        sections = []
+        header_columns = {}
+        position = 0
+        for key, column in self.columns.items():
+            entry = {'type': column.typecode, 'count': column.count, 'offset': position}
+            sections.append((position, column.nbytes, column.write_to))
+            position += column.nbytes
+            position += _padding(position)
+
+            dictionary = self.dictionaries.get(key)
+            if dictionary is not None:
+                offsets_bytes = dictionary.offsets.nbytes
+                blob_bytes = dictionary.size
+                entry['dictionary'] = {
+                    'count': dictionary.count,
+                    'offsets': position,
+                    'blob': position + offsets_bytes,
+                    'blob_bytes': blob_bytes
+                }
+                sections.append((position, offsets_bytes, dictionary.offsets.write_to))
+                sections.append((position + offsets_bytes, blob_bytes, dictionary.write_blobs))
+                position += offsets_bytes + blob_bytes
+                position += _padding(position)
+            header_columns[key] = entry
+
+        header = json.dumps({
+            'version': VERSION,
+            'byteorder': sys.byteorder,
+            'tables': {
+                'patients': self.columns['patients.patient_id'].count,
+                'appointments': self.columns['appointments.appointment_id'].count,
+                'medications': self.columns['medications.medication_id'].count
+            },
+            'columns': header_columns
+        }, ensure_ascii=False).encode('utf-8')
+
+        self.f.write(PREAMBLE.pack(MAGIC, VERSION, len(header)))
+        self.f.write(header)
+        self.f.write(b'\0' * _padding(PREAMBLE.size + len(header)))
+
+        written = 0
+        for offset, size, write in sections:
+            self.f.write(b'\0' * (offset - written))
+            write(self.f)
+            written = offset + size
+        self.f.write(b'\0' * (position - written))
+
+
+class ColumnarFile:
+    """Чтение столбцового файла через mmap: столбцы отдаются как memoryview без копирования"""
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buffer = memoryview(self._mmap)
+        self._views = []
+
+        magic, version, header_length = PREAMBLE.unpack_from(self._buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Файл {path} не является столбцовой выгрузкой версии {VERSION}")
+        self.header = json.loads(bytes(self._buffer[PREAMBLE.size:PREAMBLE.size + header_length]))
+        if self.header['byteorder'] != sys.byteorder:
+            raise ValueError("Файл записан с другим порядком байт")
+        # Данные начинаются сразу после заголовка, выровненного по 8 байт
+        self._data_start = PREAMBLE.size + header_length + _padding(PREAMBLE.size + header_length)
+        self._column_cache = {}
+        self._dictionary_cache = {}
+
+    def num_rows(self, table):
+        """Количество строк таблицы (patients, appointments, medications)"""
+        return self.header['tables'][table]
+
+    def _view(self, offset, typecode, count):
+        start = self._data_start + offset
+        view = self._buffer[start:start + count * array(typecode).itemsize].cast(typecode)
+        self._views.append(view)
+        return view
+
+    def column(self, key):
+        """Столбец 'таблица.поле' как memoryview (для текстовых полей - коды словаря)"""
+        if key not in self._column_cache:
+            entry = self.header['columns'][key]
+            self._column_cache[key] = self._view(entry['offset'], entry['type'], entry['count'])
+        return self._column_cache[key]
+
+    def dictionary(self, key):
+        """Список строк словаря текстового столбца (декодируется при первом обращении)"""
+        if key not in self._dictionary_cache:
+            entry = self.header['columns'][key]['dictionary']
+            offsets = self._view(entry['offsets'], 'q', entry['count'] + 1)
+            start = self._data_start + entry['blob']
+            blob = self._buffer[start:start + entry['blob_bytes']]
+            self._views.append(blob)
+            self._dictionary_cache[key] = [bytes(blob[offsets[i]:offsets[i + 1]]).decode('utf-8')
+                                           for i in range(entry['count'])]
+        return self._dictionary_cache[key]
+
+    def text(self, key, row):
+        """Строковое значение текстового столбца в строке row"""
+        code = self.column(key)[row]
+        return None if code == NULL_CODE else self.dictionary(key)[code]
+
+    def close(self):
+        # Представления нужно освободить до закрытия mmap
+        for view in self._views:
+            view.release()
+        self._views.clear()
+        self._column_cache.clear()
+        self._buffer.release()
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def main():
+    """Загрузка столбцовой выгрузки и пример агрегаций с замером времени"""
+    parser = argparse.ArgumentParser(description="Агрегации по столбцовой выгрузке data.hcol")
+    parser.add_argument('path', nargs='?', default='out/data.hcol')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    with ColumnarFile(args.path) as data:
+        doctor_ids = data.column('patients.doctor_id')
+        patients_per_doctor = Counter(doctor_ids)
+        taken = sum(data.column('medications.is_taken'))
+        confirmed = sum(data.column('appointments.confirmed'))
+        loaded = time.perf_counter() - started
+
+        print(f"Пациентов: {data.num_rows('patients')}, приемов: {data.num_rows('appointments')}, "
+              f"лекарств: {data.num_rows('medications')}")
+        for doctor_id, count in sorted(patients_per_doctor.items()):
+            print(f"  Врач {'не назначен' if doctor_id == NULL_INT else doctor_id}: пациентов {count}")
+        print(f"Принятых лекарств: {taken}, подтвержденных приемов: {confirmed}")
+        print(f"Загрузка и агрегация: {loaded * 1000:.1f} мс")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,105 @@
+import argparse
+import itertools
 import json
-import csv
-import xml.etree.ElementTree as ET
 import os
+import pickle
 import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from columnar import ColumnarWriter
+from change_tracking import (install_change_tracking, last_change_id, load_changed_patient_ids,
+                             prune_change_log, read_watermark, write_watermark)
+from export_writers import (COMPRESSION_SUFFIXES, WRITERS, WRITERS_BY_TITLE, JsonWriter, CsvWriter, XmlWriter,
+                            YamlWriter, error_report, format_report, open_output, write_all)
+from sharding import (SHARD_BY_CHOICES, doctor_shards, file_checksum, load_shard_patient_ids, shard_file_name,
+                      shard_function)
+
+# Пациенты с врачом и медкартой: связи один-к-одному, строк столько же, сколько пациентов
+PATIENTS_QUERY = """
+SELECT 
+    p.patient_id,
+    p.surname,
+    p.name,
+    p.patronymic,
+    p.doctor_id,
+    d.surname as doctor_surname,
+    d.name as doctor_name,
+    d.patronymic as doctor_patronymic,
+    mc.health_complaints,
+    mc.medical_history,
+    mc.treatment_plan
+FROM patients p
+LEFT JOIN doctors d ON p.doctor_id = d.doctor_id
+LEFT JOIN medical_cards mc ON p.patient_id = mc.patient_id
+{patient_filter}
+ORDER BY p.patient_id
+"""
+
+# Порядок внутри пациента совпадает с прежним общим JOIN-запросом:
+# назначения по дате и времени, лекарства по названию
+APPOINTMENTS_QUERY = """
+SELECT patient_id, appointment_id, appointment_date, appointment_time, confirmed
+FROM appointments
+{patient_filter}
+ORDER BY patient_id, appointment_date, appointment_time, confirmed, appointment_id
+"""
+
+MEDICATIONS_QUERY = """
+SELECT patient_id, medication_id, medication_name, usage_description, is_taken
+FROM medications
+{patient_filter}
+ORDER BY patient_id, medication_name, usage_description, is_taken, medication_id
+"""
+
+# Ограничение выборки пациентами из временной таблицы (выгрузка изменений, шарды по врачу)
+CHANGED_PATIENTS_FILTER = "WHERE {column} IN (SELECT patient_id FROM temp.export_patient_ids)"
+
+
+class _ChildRows:
+    """Выборка дочерней таблицы, отсортированная по patient_id, для слияния с пациентами"""
+
+    def __init__(self, cursor):
+        self.rows = iter(cursor)
+        self.row = next(self.rows, None)
+        self.count = 0
+
+    def take(self, patient_id):
+        """Забирает строки пациента, пропуская строки без пациента"""
+        taken = []
+        while self.row is not None and self.row[0] <= patient_id:
+            if self.row[0] == patient_id:
+                taken.append(self.row)
+            self.count += 1
+            self.row = next(self.rows, None)
+        return taken
+
+
+def _export_format_worker(title, payload, out_dir, compression=None, compression_level=None):
+    """Запись одного формата в отдельном процессе, возвращает отчет о записанном файле"""
+    writer_cls = WRITERS_BY_TITLE[title]
+    started = time.perf_counter()
+    data = pickle.loads(payload)
+    with open_output(writer_cls, out_dir, compression=compression, level=compression_level) as output:
+        write_all(writer_cls, output.stream, data)
+    return output.report(title, time.perf_counter() - started)
 
 
 class HospitalDataExporter:
-    def __init__(self, db_path):
+    def __init__(self, db_path, out_dir='out', compression=None, compression_level=None):
         self.db_path = db_path
+        self.out_dir = out_dir
+        # Сжатие выходных файлов на лету: None, 'gzip', 'bz2' или 'lzma'
+        self.compression = compression
+        self.compression_level = compression_level
         self.ensure_out_directory()
 
     def ensure_out_directory(self):
         """Создает папку out, если её нет"""
-        if not os.path.exists('out'):
-            os.makedirs('out')
-        print("Папка 'out' создана или уже существует")
+        if not os.path.exists(self.out_dir):
+            os.makedirs(self.out_dir)
+        print(f"Папка '{self.out_dir}' создана или уже существует")
 
     def get_connection(self):
         """Создает соединение с базой данных"""
@@ -30,320 +115,510 @@ class HospitalDataExporter:
             print(f"Ошибка подключения к базе: {e}")
             return None
 
-    def fetch_patient_data(self):
-        """Извлекает данные пациентов с их назначениями"""
+    def iter_patient_data(self):
+        """Отдает пациентов по одному, сливая отсортированные выборки таблиц за один проход"""
         conn = self.get_connection()
         if not conn:
-            return []
-
-        cursor = conn.cursor()
+            return
 
         try:
-            # Получаем данные пациентов с их медкартами, назначениями и лекарствами
-            query = """
-            SELECT 
-                p.patient_id,
-                p.surname,
-                p.name,
-                p.patronymic,
-                p.doctor_id,
-                d.surname as doctor_surname,
-                d.name as doctor_name,
-                d.patronymic as doctor_patronymic,
-                mc.health_complaints,
-                mc.medical_history,
-                mc.treatment_plan,
-                a.appointment_id,
-                a.appointment_date,
-                a.appointment_time,
-                a.confirmed,
-                m.medication_id,
-                m.medication_name,
-                m.usage_description,
-                m.is_taken
-            FROM patients p
-            LEFT JOIN doctors d ON p.doctor_id = d.doctor_id
-            LEFT JOIN medical_cards mc ON p.patient_id = mc.patient_id
-            LEFT JOIN appointments a ON p.patient_id = a.patient_id
-            LEFT JOIN medications m ON p.patient_id = m.patient_id
-            ORDER BY p.patient_id
-            """
-
-            cursor.execute(query)
-            rows = cursor.fetchall()
-            print(f"Получено строк из базы: {len(rows)}")
+            # Все выборки читаются в одной транзакции, то есть из одного снимка базы
+            conn.execute('BEGIN')
+            yield from self._iter_patients(conn)
+        finally:
+            conn.close()
+
+    def _iter_patients(self, conn, changed_only=False):
+        """Слияние выборок на открытом соединении; changed_only - только пациенты из export_patient_ids"""
+        patients_filter = CHANGED_PATIENTS_FILTER.format(column='p.patient_id') if changed_only else ''
+        children_filter = CHANGED_PATIENTS_FILTER.format(column='patient_id') if changed_only else ''
 
+        # Каждая таблица читается отдельно и отсортирована по patient_id,
+        # поэтому назначения и лекарства не перемножаются между собой
+        try:
+            patients_cursor = conn.execute(PATIENTS_QUERY.format(patient_filter=patients_filter))
+            appointments = _ChildRows(conn.execute(APPOINTMENTS_QUERY.format(patient_filter=children_filter)))
+            medications = _ChildRows(conn.execute(MEDICATIONS_QUERY.format(patient_filter=children_filter)))
         except sqlite3.Error as e:
             print(f"Ошибка выполнения запроса: {e}")
-            return []
-        finally:
-            conn.close()
+            return
 
-        # Группируем данные по пациентам
-        patients = {}
-        for row in rows:
+        patients_count = 0
+        for row in patients_cursor:
+            patient = self._new_patient(row)
             patient_id = row[0]
-            if patient_id not in patients:
-                patients[patient_id] = {
-                    'patient_id': patient_id,
-                    'surname': row[1],
-                    'name': row[2],
-                    'patronymic': row[3],
-                    'doctor_id': row[4],
-                    'doctor': {
-                        'surname': row[5],
-                        'name': row[6],
-                        'patronymic': row[7]
-                    } if row[5] else None,
-                    'medical_card': {
-                        'health_complaints': row[8],
-                        'medical_history': row[9],
-                        'treatment_plan': row[10]
-                    } if row[8] else None,
-                    'appointments': [],
-                    'medications': []
-                }
+            self._add_appointments(patient, appointments.take(patient_id))
+            self._add_medications(patient, medications.take(patient_id))
+            patients_count += 1
+            yield patient
 
-            # Добавляем назначение, если оно есть
-            if row[11]:  # appointment_id
-                appointment = {
-                    'appointment_id': row[11],
-                    'appointment_date': row[12],
-                    'appointment_time': row[13],
-                    'confirmed': bool(row[14])
-                }
-                # Проверяем дубликаты
-                if not any(a['appointment_id'] == appointment['appointment_id'] for a in
-                           patients[patient_id]['appointments']):
-                    patients[patient_id]['appointments'].append(appointment)
-
-            # Добавляем лекарство, если оно есть
-            if row[15]:  # medication_id
-                medication = {
-                    'medication_id': row[15],
-                    'medication_name': row[16],
-                    'usage_description': row[17],
-                    'is_taken': bool(row[18])
-                }
-                # Проверяем дубликаты
-                if not any(
-                        m['medication_id'] == medication['medication_id'] for m in patients[patient_id]['medications']):
-                    patients[patient_id]['medications'].append(medication)
+        rows_count = patients_count + appointments.count + medications.count
+        print(f"Получено строк из базы: {rows_count}")
+        print(f"Сгруппировано пациентов: {patients_count}")
 
-        result = list(patients.values())
-        print(f"Сгруппировано пациентов: {len(result)}")
-        return result
+    def fetch_patient_data(self):
+        """Извлекает данные пациентов с их назначениями"""
+        return list(self.iter_patient_data())
+
+    def _new_patient(self, row):
+        """Создает запись пациента по строке пациента с врачом и медкартой"""
+        return {
+            'patient_id': row[0],
+            'surname': row[1],
+            'name': row[2],
+            'patronymic': row[3],
+            'doctor_id': row[4],
+            'doctor': {
+                'surname': row[5],
+                'name': row[6],
+                'patronymic': row[7]
+            } if row[5] else None,
+            'medical_card': {
+                'health_complaints': row[8],
+                'medical_history': row[9],
+                'treatment_plan': row[10]
+            } if row[8] else None,
+            'appointments': [],
+            'medications': []
+        }
+
+    def _add_appointments(self, patient, rows):
+        """Добавляет назначения пациента"""
+        seen = set()
+        for row in rows:
+            # Проверяем дубликаты за O(1)
+            if row[1] and row[1] not in seen:  # appointment_id
+                seen.add(row[1])
+                patient['appointments'].append({
+                    'appointment_id': row[1],
+                    'appointment_date': row[2],
+                    'appointment_time': row[3],
+                    'confirmed': bool(row[4])
+                })
+
+    def _add_medications(self, patient, rows):
+        """Добавляет лекарства пациента"""
+        seen = set()
+        for row in rows:
+            # Проверяем дубликаты за O(1)
+            if row[1] and row[1] not in seen:  # medication_id
+                seen.add(row[1])
+                patient['medications'].append({
+                    'medication_id': row[1],
+                    'medication_name': row[2],
+                    'usage_description': row[3],
+                    'is_taken': bool(row[4])
+                })
+
+    def _open_output(self, writer_cls, out_dir=None, file_name=None):
+        """Открывает файл формата в папке out (со сжатием, если оно задано)"""
+        return open_output(writer_cls, out_dir or self.out_dir, file_name,
+                           self.compression, self.compression_level)
+
+    def _export_format(self, writer_cls, data):
+        """Экспорт данных в один формат"""
+        try:
+            started = time.perf_counter()
+            with self._open_output(writer_cls) as output:
+                write_all(writer_cls, output.stream, data)
+            report = output.report(writer_cls.title, time.perf_counter() - started)
+        except Exception as e:
+            report = error_report(writer_cls.title, e)
+        print(format_report(report))
+        return report
 
     def export_to_json(self, data):
         """Экспорт данных в JSON"""
-        try:
-            with open('out/data.json', 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            print("Данные успешно экспортированы в JSON")
-        except Exception as e:
-            print(f"Ошибка при экспорте в JSON: {e}")
+        self._export_format(JsonWriter, data)
 
     def export_to_csv(self, data):
         """Экспорт данных в CSV"""
-        try:
-            with open('out/data.csv', 'w', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-
-                # Заголовки
-                writer.writerow([
-                    'patient_id', 'surname', 'name', 'patronymic', 'doctor_id',
-                    'doctor_info', 'health_complaints', 'medical_history', 'treatment_plan',
-                    'appointments_info', 'medications_info'
-                ])
-
-                # Данные
-                for patient in data:
-                    # Формируем информацию о враче
-                    doctor_info = ""
-                    if patient['doctor']:
-                        doctor_info = f"{patient['doctor']['surname']} {patient['doctor']['name']} {patient['doctor']['patronymic']}"
-
-                    # Формируем информацию о медкарте
-                    health_complaints = patient['medical_card']['health_complaints'] if patient['medical_card'] else ""
-                    medical_history = patient['medical_card']['medical_history'] if patient['medical_card'] else ""
-                    treatment_plan = patient['medical_card']['treatment_plan'] if patient['medical_card'] else ""
-
-                    # Формируем информацию о назначениях
-                    appointments_info = ""
-                    if patient['appointments']:
-                        appointments_list = []
-                        for app in patient['appointments']:
-                            app_str = f"{app['appointment_date']} {app['appointment_time']} ({'Подтверждена' if app['confirmed'] else 'Ожидает'})"
-                            appointments_list.append(app_str)
-                        appointments_info = "; ".join(appointments_list)
-
-                    # Формируем информацию о лекарствах
-                    medications_info = ""
-                    if patient['medications']:
-                        medications_list = []
-                        for med in patient['medications']:
-                            med_str = f"{med['medication_name']}: {med['usage_description']} ({'Принято' if med['is_taken'] else 'Не принято'})"
-                            medications_list.append(med_str)
-                        medications_info = "; ".join(medications_list)
-
-                    writer.writerow([
-                        patient['patient_id'],
-                        patient['surname'],
-                        patient['name'],
-                        patient['patronymic'],
-                        patient['doctor_id'],
-                        doctor_info,
-                        health_complaints,
-                        medical_history,
-                        treatment_plan,
-                        appointments_info,
-                        medications_info
-                    ])
-
-            print("Данные успешно экспортированы в CSV")
-        except Exception as e:
-            print(f"Ошибка при экспорте в CSV: {e}")
+        self._export_format(CsvWriter, data)
 
     def export_to_xml(self, data):
         """Экспорт данных в XML"""
-        try:
-            root = ET.Element('patients')
-
-            for patient in data:
-                patient_elem = ET.SubElement(root, 'patient')
-
-                ET.SubElement(patient_elem, 'patient_id').text = str(patient['patient_id'])
-                ET.SubElement(patient_elem, 'surname').text = patient['surname']
-                ET.SubElement(patient_elem, 'name').text = patient['name']
-                ET.SubElement(patient_elem, 'patronymic').text = patient['patronymic']
-                ET.SubElement(patient_elem, 'doctor_id').text = str(patient['doctor_id'])
-
-                # Информация о враче
-                if patient['doctor']:
-                    doctor_elem = ET.SubElement(patient_elem, 'doctor')
-                    ET.SubElement(doctor_elem, 'surname').text = patient['doctor']['surname']
-                    ET.SubElement(doctor_elem, 'name').text = patient['doctor']['name']
-                    ET.SubElement(doctor_elem, 'patronymic').text = patient['doctor']['patronymic']
-
-                # Медицинская карта
-                if patient['medical_card']:
-                    medical_card_elem = ET.SubElement(patient_elem, 'medical_card')
-                    ET.SubElement(medical_card_elem, 'health_complaints').text = patient['medical_card'][
-                                                                                     'health_complaints'] or ''
-                    ET.SubElement(medical_card_elem, 'medical_history').text = patient['medical_card'][
-                                                                                   'medical_history'] or ''
-                    ET.SubElement(medical_card_elem, 'treatment_plan').text = patient['medical_card'][
-                                                                                  'treatment_plan'] or ''
-
-                # Назначения
-                appointments_elem = ET.SubElement(patient_elem, 'appointments')
-                for appointment in patient['appointments']:
-                    app_elem = ET.SubElement(appointments_elem, 'appointment')
-                    ET.SubElement(app_elem, 'appointment_id').text = str(appointment['appointment_id'])
-                    ET.SubElement(app_elem, 'appointment_date').text = appointment['appointment_date']
-                    ET.SubElement(app_elem, 'appointment_time').text = appointment['appointment_time']
-                    ET.SubElement(app_elem, 'confirmed').text = str(appointment['confirmed'])
-
-                # Лекарства
-                medications_elem = ET.SubElement(patient_elem, 'medications')
-                for medication in patient['medications']:
-                    med_elem = ET.SubElement(medications_elem, 'medication')
-                    ET.SubElement(med_elem, 'medication_id').text = str(medication['medication_id'])
-                    ET.SubElement(med_elem, 'medication_name').text = medication['medication_name']
-                    ET.SubElement(med_elem, 'usage_description').text = medication['usage_description']
-                    ET.SubElement(med_elem, 'is_taken').text = str(medication['is_taken'])
-
-            tree = ET.ElementTree(root)
-            tree.write('out/data.xml', encoding='utf-8', xml_declaration=True)
-            print("Данные успешно экспортированы в XML")
-        except Exception as e:
-            print(f"Ошибка при экспорте в XML: {e}")
+        self._export_format(XmlWriter, data)
 
     def export_to_yaml(self, data):
         """Экспорт данных в YAML (без внешних библиотек)"""
+        self._export_format(YamlWriter, data)
+
+    def export_to_columnar(self, data):
+        """Экспорт данных в двоичный столбцовый формат"""
+        self._export_format(ColumnarWriter, data)
+
+    def export_streaming(self, patients, out_dir=None):
+        """Потоковый экспорт: каждый пациент сразу записывается во все форматы.
+        Возвращает отчет по каждому формату"""
+        outputs = {}
+        writers = {}
+        seconds = {}
+        reports = {}
         try:
-            with open('out/data.yaml', 'w', encoding='utf-8') as f:
-                self._write_yaml(data, f)
-            print("Данные успешно экспортированы в YAML")
-        except Exception as e:
-            print(f"Ошибка при экспорте в YAML: {e}")
-
-    def _write_yaml(self, data, f, indent=0):
-        """Ручная реализация YAML записи"""
-        indent_str = '  ' * indent
-
-        if isinstance(data, list):
-            for item in data:
-                f.write(f'{indent_str}- ')
-                if isinstance(item, (dict, list)):
-                    f.write('\n')
-                    self._write_yaml(item, f, indent + 1)
-                else:
-                    f.write(f'{self._yaml_value(item)}\n')
-        elif isinstance(data, dict):
-            first = True
-            for key, value in data.items():
-                if isinstance(value, (dict, list)):
-                    if not first:
-                        f.write('\n')
-                    f.write(f'{indent_str}{key}:\n')
-                    self._write_yaml(value, f, indent + 1)
-                else:
-                    f.write(f'{indent_str}{key}: {self._yaml_value(value)}\n')
-                first = False
-        else:
-            f.write(f'{indent_str}{self._yaml_value(data)}\n')
-
-    def _yaml_value(self, value):
-        """Форматирование значения для YAML"""
-        if value is None:
-            return 'null'
-        elif isinstance(value, bool):
-            return 'true' if value else 'false'
-        elif isinstance(value, (int, float)):
-            return str(value)
-        else:
-            # Экранирование специальных символов
-            str_value = str(value)
-            if any(char in str_value for char in ':[]{}#&*!|>\"\'%@`'):
-                return f'"{str_value}"'
-            return str_value
-
-    def run_export(self):
-        """Основной метод для выполнения экспорта"""
+            for writer_cls in WRITERS:
+                try:
+                    outputs[writer_cls] = self._open_output(writer_cls, out_dir)
+                    writers[writer_cls] = writer_cls(outputs[writer_cls].stream)
+                    writers[writer_cls].begin()
+                    seconds[writer_cls] = 0.0
+                except Exception as e:
+                    reports[writer_cls] = error_report(writer_cls.title, e)
+
+            for patient in patients:
+                for writer_cls, writer in list(writers.items()):
+                    started = time.perf_counter()
+                    try:
+                        writer.write_patient(patient)
+                    except Exception as e:
+                        # Сбой одного формата не останавливает остальные
+                        reports[writer_cls] = error_report(writer_cls.title, e)
+                        del writers[writer_cls]
+                    seconds[writer_cls] += time.perf_counter() - started
+
+            for writer_cls, writer in writers.items():
+                started = time.perf_counter()
+                try:
+                    writer.end()
+                    outputs[writer_cls].close()
+                    seconds[writer_cls] += time.perf_counter() - started
+                    reports[writer_cls] = outputs[writer_cls].report(writer_cls.title, seconds[writer_cls])
+                except Exception as e:
+                    reports[writer_cls] = error_report(writer_cls.title, e)
+        finally:
+            for output in outputs.values():
+                output.close()
+
+        report = [reports[writer_cls] for writer_cls in WRITERS]
+        for entry in report:
+            print(format_report(entry))
+        return report
+
+    def export_parallel(self, data, max_workers=None):
+        """Параллельный экспорт одного снимка во все форматы в пуле процессов.
+        Возвращает отчет по каждому формату: время, размер файла или ошибку"""
+        # Снимок сериализуется один раз, процессы получают готовые байты
+        payload = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        report = []
+
+        with ProcessPoolExecutor(max_workers=max_workers or len(WRITERS)) as pool:
+            futures = [(writer_cls, pool.submit(_export_format_worker, writer_cls.title, payload, self.out_dir,
+                                                self.compression, self.compression_level))
+                       for writer_cls in WRITERS]
+
+            for writer_cls, future in futures:
+                # Ошибка одного формата не мешает остальным
+                try:
+                    entry = future.result()
+                except Exception as e:
+                    entry = error_report(writer_cls.title, e)
+                report.append(entry)
+                print(format_report(entry))
+
+        return report
+
+    def run_sharded_export(self, shards, shard_by='patient_id'):
+        """Экспорт во все форматы, разбитый на shards файлов по диапазону patient_id или по врачу,
+        с манифестом для параллельной загрузки шардов"""
         print("=" * 50)
-        print("НАЧАЛО ЭКСПОРТА ДАННЫХ")
+        print(f"ЭКСПОРТ ПО ШАРДАМ ({shards}, разбиение: {shard_by})")
         print("=" * 50)
 
-        # Получаем данные
-        data = self.fetch_patient_data()
+        conn = self.get_connection()
+        if not conn:
+            print("Не удалось получить данные из базы")
+            return
+
+        shard_dir = os.path.join(self.out_dir, 'shards')
+        os.makedirs(shard_dir, exist_ok=True)
+        # Шарды прошлого запуска удаляются, чтобы в папке были только файлы из манифеста
+        for name in os.listdir(shard_dir):
+            if name.startswith('data-') or name == 'manifest.json':
+                os.remove(os.path.join(shard_dir, name))
+
+        open_shards = {}
+        written = {}
+        failed = {}
+        stats = [{'patients': 0, 'min_patient_id': None, 'max_patient_id': None, 'doctor_ids': set()}
+                 for _ in range(shards)]
+
+        try:
+            conn.execute('BEGIN')
+            current = None
+
+            for shard, patient in self._iter_shard_patients(conn, shards, shard_by):
+                if shard != current:
+                    # Пациенты идут шард за шардом, поэтому предыдущий шард уже завершен:
+                    # открыты файлы только одного шарда
+                    self._close_shards(open_shards, failed)
+                    current = shard
+
+                for writer_cls in WRITERS:
+                    if writer_cls.title in failed:
+                        continue
+                    try:
+                        writer = open_shards.get((writer_cls, shard))
+                        if writer is None:
+                            output, writer = self._open_shard(writer_cls, shard_dir, shard)
+                            open_shards[(writer_cls, shard)] = (output, writer)
+                            written[(writer_cls, shard)] = output
+                        else:
+                            writer = writer[1]
+                        writer.write_patient(patient)
+                    except Exception as e:
+                        # Сбой одного формата не останавливает остальные
+                        failed[writer_cls.title] = str(e)
+                        print(f"Ошибка при экспорте в {writer_cls.title}: {e}")
+
+                shard_stats = stats[shard]
+                shard_stats['patients'] += 1
+                if shard_stats['min_patient_id'] is None:
+                    shard_stats['min_patient_id'] = patient['patient_id']
+                shard_stats['max_patient_id'] = patient['patient_id']
+                shard_stats['doctor_ids'].add(patient['doctor_id'])
+
+            self._close_shards(open_shards, failed)
+
+            # Пустые шарды тоже записываются, чтобы у каждого формата было ровно shards файлов
+            for writer_cls in WRITERS:
+                for shard in range(shards):
+                    if writer_cls.title not in failed and (writer_cls, shard) not in written:
+                        open_shards[(writer_cls, shard)] = self._open_shard(writer_cls, shard_dir, shard)
+                        written[(writer_cls, shard)] = open_shards[(writer_cls, shard)][0]
+            self._close_shards(open_shards, failed)
+        except sqlite3.Error as e:
+            print(f"Ошибка экспорта по шардам: {e}")
+            self._close_shards(open_shards, failed)
+            return
+        finally:
+            conn.close()
+
+        manifest = {
+            'shard_by': shard_by,
+            'shards': shards,
+            'compression': self.compression,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'formats': {},
+            'errors': failed
+        }
+        for writer_cls in WRITERS:
+            if writer_cls.title in failed:
+                continue
+            entries = []
+            for shard in range(shards):
+                output = written[(writer_cls, shard)]
+                entry = {
+                    'shard': shard,
+                    'file': output.file_name,
+                    'patients': stats[shard]['patients'],
+                    'bytes': os.path.getsize(output.path),
+                    'uncompressed_bytes': output.uncompressed_bytes,
+                    'sha256': file_checksum(output.path),
+                    'min_patient_id': stats[shard]['min_patient_id'],
+                    'max_patient_id': stats[shard]['max_patient_id']
+                }
+                if shard_by == 'doctor':
+                    entry['doctor_ids'] = sorted(stats[shard]['doctor_ids'], key=lambda d: (d is None, d))
+                entries.append(entry)
+            manifest['formats'][writer_cls.title] = entries
+            print(f"Данные успешно экспортированы в {writer_cls.title}: {shards} шардов")
+
+        with open(os.path.join(shard_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        print(f"Файлы и manifest.json сохранены в папке '{shard_dir}'")
+
+    def _iter_shard_patients(self, conn, shards, shard_by):
+        """Пары (шард, пациент), сгруппированные по шардам. По диапазону patient_id - один проход
+        по возрастанию patient_id; по врачу - отдельная выборка пациентов врачей каждого шарда"""
+        if shard_by != 'doctor':
+            shard_of = shard_function(conn, shards, shard_by)
+            for patient in self._iter_patients(conn):
+                yield shard_of(patient), patient
+            return
+        for shard, doctor_ids in enumerate(doctor_shards(conn, shards)):
+            load_shard_patient_ids(conn, doctor_ids)
+            for patient in self._iter_patients(conn, changed_only=True):
+                yield shard, patient
+
+    def _open_shard(self, writer_cls, shard_dir, shard):
+        """Открывает файл шарда и начинает документ"""
+        output = self._open_output(writer_cls, shard_dir, shard_file_name(writer_cls.file_name, shard))
+        writer = writer_cls(output.stream)
+        writer.begin()
+        return output, writer
+
+    def _close_shards(self, open_shards, failed):
+        """Завершает и закрывает открытые файлы шардов"""
+        for (writer_cls, shard), (output, writer) in open_shards.items():
+            try:
+                if writer_cls.title not in failed:
+                    writer.end()
+            except Exception as e:
+                failed[writer_cls.title] = str(e)
+                print(f"Ошибка при экспорте в {writer_cls.title}: {e}")
+            finally:
+                output.close()
+        open_shards.clear()
+
+    def run_delta_export(self):
+        """Выгрузка только пациентов, измененных после прошлой выгрузки, в подпапку delta папки выгрузки"""
+        print("=" * 50)
+        print("ВЫГРУЗКА ИЗМЕНЕНИЙ")
+        print("=" * 50)
 
-        if not data:
+        conn = self.get_connection()
+        if not conn:
             print("Не удалось получить данные из базы")
             return
 
-        print(f"Найдено пациентов: {len(data)}")
+        delta_root = os.path.join(self.out_dir, 'delta')
+        os.makedirs(delta_root, exist_ok=True)
+        state_path = os.path.join(delta_root, 'state.json')
+
+        try:
+            install_change_tracking(conn)
+            previous = read_watermark(state_path)
+
+            # Журнал и данные читаются в одной транзакции: граница выгрузки совпадает со снимком
+            conn.execute('BEGIN')
+            upto = last_change_id(conn)
+
+            if previous is None:
+                # Первая выгрузка - полный снимок, от которого дальше считаются изменения
+                changed_ids = None
+                print("Прошлых выгрузок нет, выполняется полная выгрузка")
+            elif upto <= previous:
+                print("Изменений с прошлой выгрузки нет")
+                return
+            else:
+                changed_ids = load_changed_patient_ids(conn, previous, upto)
+                print(f"Изменено пациентов: {len(changed_ids)}")
+
+            delta_dir = os.path.join(delta_root, f'{upto:010d}')
+            os.makedirs(delta_dir, exist_ok=True)
+
+            exported_ids = set()
+            patients_count = 0
+
+            def tracked(patients):
+                nonlocal patients_count
+                for patient in patients:
+                    patients_count += 1
+                    if changed_ids is not None:
+                        exported_ids.add(patient['patient_id'])
+                    yield patient
+
+            report = self.export_streaming(tracked(self._iter_patients(conn, changed_only=changed_ids is not None)),
+                                           delta_dir)
+            if any(entry['error'] for entry in report):
+                print("Выгрузка изменений не завершена, отметка выгрузки не сдвинута")
+                return
+
+            # Пациенты из журнала, которых больше нет в базе, были удалены
+            deleted_ids = sorted(set(changed_ids) - exported_ids) if changed_ids is not None else []
+            manifest = {
+                'type': 'full' if changed_ids is None else 'delta',
+                'from_change_id': previous or 0,
+                'to_change_id': upto,
+                'created_at': datetime.now().isoformat(timespec='seconds'),
+                'patients': patients_count,
+                'deleted_patient_ids': deleted_ids,
+                'compression': self.compression,
+                'files': [
+                    {
+                        'format': entry['format'],
+                        'file': entry['file'],
+                        'bytes': entry['bytes'],
+                        'uncompressed_bytes': entry['uncompressed_bytes']
+                    } for entry in report
+                ]
+            }
+            with open(os.path.join(delta_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+            write_watermark(state_path, upto)
+            # Учтенные выгрузкой записи журнала больше не нужны: журнал не растет бесконечно
+            pruned = prune_change_log(conn, upto)
+            conn.commit()
+            print(f"Выгружено пациентов: {patients_count}, удалено: {len(deleted_ids)}")
+            print(f"Из журнала изменений удалено записей: {pruned}")
+            print(f"Файлы сохранены в папке '{delta_dir}'")
+        except sqlite3.Error as e:
+            print(f"Ошибка выгрузки изменений: {e}")
+        finally:
+            conn.close()
+
+    def run_export(self, streaming=False, parallel=False):
+        """Основной метод для выполнения экспорта"""
+        print("=" * 50)
+        print("НАЧАЛО ЭКСПОРТА ДАННЫХ")
+        print("=" * 50)
 
-        # Экспортируем во все форматы
-        print("\nЭкспорт в форматы:")
-        print("-" * 20)
-        self.export_to_json(data)
-        self.export_to_csv(data)
-        self.export_to_xml(data)
-        self.export_to_yaml(data)
+        if streaming:
+            # Пациенты читаются из курсора по одному и сразу уходят во все форматы
+            patients = self.iter_patient_data()
+            first = next(patients, None)
+
+            if first is None:
+                print("Не удалось получить данные из базы")
+                return
+
+            print("\nПотоковый экспорт в форматы:")
+            print("-" * 20)
+            self.export_streaming(itertools.chain([first], patients))
+        else:
+            # Получаем данные
+            data = self.fetch_patient_data()
+
+            if not data:
+                print("Не удалось получить данные из базы")
+                return
+
+            print(f"Найдено пациентов: {len(data)}")
+
+            # Экспортируем во все форматы
+            if parallel:
+                print("\nПараллельный экспорт в форматы:")
+                print("-" * 20)
+                started = time.perf_counter()
+                self.export_parallel(data)
+                print(f"Общее время записи: {time.perf_counter() - started:.3f} с")
+            else:
+                print("\nЭкспорт в форматы:")
+                print("-" * 20)
+                self.export_to_json(data)
+                self.export_to_csv(data)
+                self.export_to_xml(data)
+                self.export_to_yaml(data)
+                self.export_to_columnar(data)
 
         print("\n" + "=" * 50)
         print("ЭКСПОРТ ЗАВЕРШЕН!")
-        print("Файлы сохранены в папке 'out/':")
-        print("  - data.json")
-        print("  - data.csv")
-        print("  - data.xml")
-        print("  - data.yaml")
+        print(f"Файлы сохранены в папке '{self.out_dir}':")
+        for writer_cls in WRITERS:
+            suffix = '' if writer_cls.binary else COMPRESSION_SUFFIXES.get(self.compression, '')
+            print(f"  - {writer_cls.file_name}{suffix}")
         print("=" * 50)
 
 
 def main():
     """Главная функция"""
+    parser = argparse.ArgumentParser(description="Экспорт данных больницы")
+    parser.add_argument('--stream', action='store_true',
+                        help="потоковый экспорт без загрузки всех пациентов в память")
+    parser.add_argument('--delta', action='store_true',
+                        help="выгрузить только пациентов, измененных после прошлой выгрузки")
+    parser.add_argument('--parallel', action='store_true',
+                        help="записывать форматы параллельно в пуле процессов")
+    parser.add_argument('--shards', type=int, default=0,
+                        help="разбить каждый формат на указанное число шардов (папка out/shards)")
+    parser.add_argument('--shard-by', choices=SHARD_BY_CHOICES, default='patient_id',
+                        help="разбиение по диапазону patient_id или по врачу")
+    parser.add_argument('--compress', choices=sorted(COMPRESSION_SUFFIXES),
+                        help="сжимать выходные файлы на лету")
+    parser.add_argument('--level', type=int,
+                        help="уровень сжатия (gzip и bz2: 1-9, lzma: 0-9)")
+    args = parser.parse_args()
+
     # Пробуем разные возможные пути к базе данных
     possible_paths = [
         "hospital.db",  # В текущей папке
@@ -365,8 +640,13 @@ def main():
         return
 
     # Создаем экземпляр класса и запускаем экспорт
-    exporter = HospitalDataExporter(db_path)
-    exporter.run_export()
+    exporter = HospitalDataExporter(db_path, compression=args.compress, compression_level=args.level)
+    if args.delta:
+        exporter.run_delta_export()
+    elif args.shards > 0:
+        exporter.run_sharded_export(args.shards, args.shard_by)
+    else:
+        exporter.run_export(streaming=args.stream, parallel=args.parallel)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,478 @@
+import bz2
+import csv
+import functools
+import gzip
+import io
+import json
+import lzma
+import os
+import re
+from datetime import date
+
+from columnar import ColumnarWriter
+
+# Поддерживаемые алгоритмы сжатия и расширения сжатых файлов
+COMPRESSION_SUFFIXES = {'gzip': '.gz', 'bz2': '.bz2', 'lzma': '.xz'}
+
+
+class JsonWriter:
+    """Потоковая запись JSON: результат совпадает с json.dump(data, indent=2)"""
+    title = 'JSON'
+    file_name = 'data.json'
+    newline = None
+    binary = False
+
+    def __init__(self, f):
+        self.f = f
+        self.count = 0
+
+    def begin(self):
+        """Открывающая скобка пишется вместе с первым пациентом"""
+
+    def write_patient(self, patient):
+        """Запись одного пациента как элемента массива"""
+        text = json.dumps(patient, ensure_ascii=False, indent=2)
+        self.f.write('[\n  ' if self.count == 0 else ',\n  ')
+        # Переводы строк внутри значений экранируются json, поэтому сдвигаем только структуру
+        self.f.write(text.replace('\n', '\n  '))
+        self.count += 1
+
+    def end(self):
+        self.f.write('\n]' if self.count else '[]')
+
+
+class CsvWriter:
+    """Потоковая запись CSV: одна строка на пациента"""
+    title = 'CSV'
+    file_name = 'data.csv'
+    newline = ''
+    binary = False
+
+    def __init__(self, f):
+        self.f = f
+        self.writer = csv.writer(f)
+        self.count = 0
+
+    def begin(self):
+        # Заголовки
+        self.writer.writerow([
+            'patient_id', 'surname', 'name', 'patronymic', 'doctor_id',
+            'doctor_info', 'health_complaints', 'medical_history', 'treatment_plan',
+            'appointments_info', 'medications_info'
+        ])
+
+    def write_patient(self, patient):
+        # Формируем информацию о враче
+        doctor_info = ""
+        if patient['doctor']:
+            doctor_info = f"{patient['doctor']['surname']} {patient['doctor']['name']} {patient['doctor']['patronymic']}"
+
+        # Формируем информацию о медкарте
+        health_complaints = patient['medical_card']['health_complaints'] if patient['medical_card'] else ""
+        medical_history = patient['medical_card']['medical_history'] if patient['medical_card'] else ""
+        treatment_plan = patient['medical_card']['treatment_plan'] if patient['medical_card'] else ""
+
+        # Формируем информацию о назначениях
+        appointments_info = ""
+        if patient['appointments']:
+            appointments_list = []
+            for app in patient['appointments']:
+                app_str = f"{app['appointment_date']} {app['appointment_time']} ({'Подтверждена' if app['confirmed'] else 'Ожидает'})"
+                appointments_list.append(app_str)
+            appointments_info = "; ".join(appointments_list)
+
+        # Формируем информацию о лекарствах
+        medications_info = ""
+        if patient['medications']:
+            medications_list = []
+            for med in patient['medications']:
+                med_str = f"{med['medication_name']}: {med['usage_description']} ({'Принято' if med['is_taken'] else 'Не принято'})"
+                medications_list.append(med_str)
+            medications_info = "; ".join(medications_list)
+
+        self.writer.writerow([
+            patient['patient_id'],
+            patient['surname'],
+            patient['name'],
+            patient['patronymic'],
+            patient['doctor_id'],
+            doctor_info,
+            health_complaints,
+            medical_history,
+            treatment_plan,
+            appointments_info,
+            medications_info
+        ])
+        self.count += 1
+
+    def end(self):
+        pass
+
+
+def xml_text(value):
+    """Экранирование текста элемента так же, как в ElementTree (&, <, >)"""
+    if '&' in value:
+        value = value.replace('&', '&amp;')
+    if '<' in value:
+        value = value.replace('<', '&lt;')
+    if '>' in value:
+        value = value.replace('>', '&gt;')
+    return value
+
+
+def xml_element(tag, text):
+    """Элемент с текстом; пустой элемент записывается как <tag />, как в ElementTree"""
+    if not text:
+        return f'<{tag} />'
+    return f'<{tag}>{xml_text(text)}</{tag}>'
+
+
+class XmlWriter:
+    """Потоковая запись XML: каждый <patient> собирается строкой и сразу пишется в файл.
+    Результат совпадает с сериализацией того же дерева через ElementTree"""
+    title = 'XML'
+    file_name = 'data.xml'
+    # Переводы строк внутри текста пишутся как есть, поэтому не преобразуем их
+    newline = ''
+    binary = False
+
+    def __init__(self, f):
+        self.f = f
+        self.count = 0
+
+    def begin(self):
+        self.f.write("<?xml version='1.0' encoding='utf-8'?>\n")
+
+    def write_patient(self, patient):
+        if self.count == 0:
+            self.f.write('<patients>')
+        self.f.write(''.join(self._patient_parts(patient)))
+        self.count += 1
+
+    def end(self):
+        self.f.write('</patients>' if self.count else '<patients />')
+
+    def _patient_parts(self, patient):
+        """Части элемента <patient> для одного пациента"""
+        parts = [
+            '<patient>',
+            xml_element('patient_id', str(patient['patient_id'])),
+            xml_element('surname', patient['surname']),
+            xml_element('name', patient['name']),
+            xml_element('patronymic', patient['patronymic']),
+            xml_element('doctor_id', str(patient['doctor_id']))
+        ]
+
+        # Информация о враче
+        doctor = patient['doctor']
+        if doctor:
+            parts += [
+                '<doctor>',
+                xml_element('surname', doctor['surname']),
+                xml_element('name', doctor['name']),
+                xml_element('patronymic', doctor['patronymic']),
+                '</doctor>'
+            ]
+
+        # Медицинская карта
+        medical_card = patient['medical_card']
+        if medical_card:
+            parts += [
+                '<medical_card>',
+                xml_element('health_complaints', medical_card['health_complaints']),
+                xml_element('medical_history', medical_card['medical_history']),
+                xml_element('treatment_plan', medical_card['treatment_plan']),
+                '</medical_card>'
+            ]
+
+        # Назначения
+        if patient['appointments']:
+            parts.append('<appointments>')
+            for appointment in patient['appointments']:
+                parts += [
+                    '<appointment>',
+                    xml_element('appointment_id', str(appointment['appointment_id'])),
+                    xml_element('appointment_date', appointment['appointment_date']),
+                    xml_element('appointment_time', appointment['appointment_time']),
+                    xml_element('confirmed', str(appointment['confirmed'])),
+                    '</appointment>'
+                ]
+            parts.append('</appointments>')
+        else:
+            parts.append('<appointments />')
+
+        # Лекарства
+        if patient['medications']:
+            parts.append('<medications>')
+            for medication in patient['medications']:
+                parts += [
+                    '<medication>',
+                    xml_element('medication_id', str(medication['medication_id'])),
+                    xml_element('medication_name', medication['medication_name']),
+                    xml_element('usage_description', medication['usage_description']),
+                    xml_element('is_taken', str(medication['is_taken'])),
+                    '</medication>'
+                ]
+            parts.append('</medications>')
+        else:
+            parts.append('<medications />')
+
+        parts.append('</patient>')
+        return parts
+
+
+# Символы, при которых строка всегда записывалась в кавычках
+_YAML_SPECIAL = r'[:\[\]{}#&*!|>"\'%@`]'
+# Строка не может быть простым скаляром YAML: спецсимволы, управляющие символы,
+# пробелы по краям, индикаторы '-', '?', ',' в начале, пустая строка
+_YAML_NEEDS_QUOTES = re.compile(
+    _YAML_SPECIAL + r'|[\x00-\x1f\x7f-\x9f\u2028\u2029\ufeff]|^[\s,]|^[-?](?: |$)|\s$|^$')
+# Простой скаляр, который YAML прочитает не как строку (число, bool, null)
+_YAML_IMPLICIT = re.compile(r"""(?x)^(?:
+    [-+]?(?:[0-9][0-9_]*(?:\.[0-9_]*)?(?:[eE][-+]?[0-9]+)?|\.[0-9_]+(?:[eE][-+]?[0-9]+)?)
+    |[-+]?\.(?:inf|Inf|INF)|\.(?:nan|NaN|NAN)
+    |[-+]?0(?:b[01_]+|o?[0-7_]+|x[0-9a-fA-F_]+)
+    |~|null|Null|NULL
+    |y|Y|yes|Yes|YES|n|N|no|No|NO|true|True|TRUE|false|False|FALSE|on|On|ON|off|Off|OFF
+    |<<|=
+)$""")
+# Дата/время в форме YAML timestamp; допустимые даты ГГГГ-ММ-ДД остаются без кавычек, как раньше
+_YAML_TIMESTAMP = re.compile(r'[0-9]{4}-[0-9]{1,2}-[0-9]{1,2}(?:(?:[Tt]|[ \t]+)[0-9]|$)')
+_YAML_ESCAPE = re.compile(r'[\\"\x00-\x1f\x7f-\x9f\u2028\u2029\ufeff]')
+_YAML_ESCAPES = {'\\': '\\\\', '"': '\\"', '\0': '\\0', '\t': '\\t', '\n': '\\n', '\r': '\\r'}
+
+
+def _yaml_escape_char(match):
+    char = match.group()
+    escaped = _YAML_ESCAPES.get(char)
+    if escaped is None:
+        code = ord(char)
+        escaped = f'\\x{code:02x}' if code < 0x100 else f'\\u{code:04x}'
+    return escaped
+
+
+def _is_iso_date(value):
+    try:
+        return len(value) == 10 and date.fromisoformat(value) is not None
+    except ValueError:
+        return False
+
+
+@functools.lru_cache(maxsize=65536)
+def yaml_string(value):
+    """Строка как скаляр YAML: как есть или в двойных кавычках с экранированием"""
+    if (_YAML_NEEDS_QUOTES.search(value) or _YAML_IMPLICIT.match(value)
+            or _YAML_TIMESTAMP.match(value) and not _is_iso_date(value)):
+        return '"' + _YAML_ESCAPE.sub(_yaml_escape_char, value) + '"'
+    return value
+
+
+def yaml_scalar(value):
+    """Форматирование значения для YAML"""
+    if value is None:
+        return 'null'
+    if value is True:
+        return 'true'
+    if value is False:
+        return 'false'
+    if isinstance(value, str):
+        return yaml_string(value)
+    if isinstance(value, (int, float)):
+        return str(value)
+    return yaml_string(str(value))
+
+
+def _yaml_empty(value):
+    return '{}' if isinstance(value, dict) else '[]'
+
+
+def emit_yaml(data, out, indent=0):
+    """Добавляет строки YAML для data в список out (блочный стиль, отступ 2 пробела на уровень)"""
+    indent_str = '  ' * indent
+    append = out.append
+    if isinstance(data, list):
+        for item in data:
+            # Строки - самый частый случай, проверяем точный тип без isinstance
+            if type(item) is str:
+                append(f'{indent_str}- {yaml_string(item)}\n')
+            elif not isinstance(item, (dict, list)):
+                append(f'{indent_str}- {yaml_scalar(item)}\n')
+            elif item:
+                append(f'{indent_str}- \n')
+                emit_yaml(item, out, indent + 1)
+            else:
+                append(f'{indent_str}- {_yaml_empty(item)}\n')
+    elif isinstance(data, dict):
+        first = True
+        for key, value in data.items():
+            if type(value) is str:
+                append(f'{indent_str}{key}: {yaml_string(value)}\n')
+            elif not isinstance(value, (dict, list)):
+                append(f'{indent_str}{key}: {yaml_scalar(value)}\n')
+            else:
+                # Вложенные блоки отделяются пустой строкой
+                if not first:
+                    append('\n')
+                if value:
+                    append(f'{indent_str}{key}:\n')
+                    emit_yaml(value, out, indent + 1)
+                else:
+                    append(f'{indent_str}{key}: {_yaml_empty(value)}\n')
+            first = False
+    else:
+        append(f'{indent_str}{yaml_scalar(data)}\n')
+
+
+def dump_yaml(data):
+    """Документ YAML для data одной строкой"""
+    out = []
+    emit_yaml(data, out)
+    return ''.join(out)
+
+
+class YamlWriter:
+    """Потоковая запись YAML (без внешних библиотек).
+    Каждый пациент собирается в буфер и пишется в файл одним вызовом write"""
+    title = 'YAML'
+    file_name = 'data.yaml'
+    newline = None
+    binary = False
+
+    def __init__(self, f):
+        self.f = f
+        self.count = 0
+
+    def begin(self):
+        pass
+
+    def write_patient(self, patient):
+        # Пациент - элемент списка верхнего уровня
+        out = ['- \n']
+        emit_yaml(patient, out, 1)
+        self.f.write(''.join(out))
+        self.count += 1
+
+    def end(self):
+        # Пустой файл YAML читается как null, а не как пустой список
+        if not self.count:
+            self.f.write('[]\n')
+
+
+# Форматы в порядке экспорта
+WRITERS = (JsonWriter, CsvWriter, XmlWriter, YamlWriter, ColumnarWriter)
+WRITERS_BY_TITLE = {writer_cls.title: writer_cls for writer_cls in WRITERS}
+
+
+class _CountingStream(io.RawIOBase):
+    """Передает байты дальше (в файл или компрессор) и считает их количество"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.bytes_written = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.raw.write(data)
+        self.bytes_written += len(data)
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self.raw.close()
+        super().close()
+
+
+class OutputFile:
+    """Файл выгрузки: текстовый (или двоичный) поток, при необходимости сжимаемый на лету
+    без промежуточной копии"""
+
+    def __init__(self, path, newline=None, compression=None, level=None, binary=False):
+        if compression is not None:
+            path += COMPRESSION_SUFFIXES[compression]
+        self.path = path
+        self.file_name = os.path.basename(path)
+        self._counter = _CountingStream(self._open_raw(path, compression, level))
+        self.stream = io.BufferedWriter(self._counter, 1024 * 1024)
+        if not binary:
+            self.stream = io.TextIOWrapper(self.stream, encoding='utf-8', newline=newline)
+
+    @staticmethod
+    def _open_raw(path, compression, level):
+        """Открывает двоичный поток: обычный файл или компрессор stdlib"""
+        if compression is None:
+            return open(path, 'wb')
+        if compression == 'gzip':
+            # mtime=0 делает сжатый файл воспроизводимым (одинаковые данные - одинаковая контрольная сумма)
+            return gzip.GzipFile(path, 'wb', compresslevel=9 if level is None else level, mtime=0)
+        if compression == 'bz2':
+            return bz2.BZ2File(path, 'wb', compresslevel=9 if level is None else level)
+        if compression == 'lzma':
+            return lzma.LZMAFile(path, 'wb', preset=level)
+        raise ValueError(f"Неизвестный алгоритм сжатия: {compression}")
+
+    @property
+    def uncompressed_bytes(self):
+        """Сколько байт текста записано до сжатия"""
+        return self._counter.bytes_written
+
+    def close(self):
+        self.stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def report(self, title, seconds):
+        """Отчет о записанном файле: размеры, степень сжатия и скорость записи"""
+        size = os.path.getsize(self.path)
+        raw = self.uncompressed_bytes
+        return {
+            'format': title,
+            'file': self.file_name,
+            'seconds': seconds,
+            'bytes': size,
+            'uncompressed_bytes': raw,
+            'compression_ratio': raw / size if size else None,
+            'throughput_mb_s': raw / seconds / 1e6 if seconds else None,
+            'error': None
+        }
+
+
+def format_report(entry):
+    """Строка отчета о формате для вывода в консоль"""
+    if entry['error']:
+        return f"Ошибка при экспорте в {entry['format']}: {entry['error']}"
+    line = f"Данные успешно экспортированы в {entry['format']}: {entry['file']}, {entry['seconds']:.3f} с, {entry['bytes']} байт"
+    if entry['bytes'] != entry['uncompressed_bytes']:
+        line += f" (без сжатия {entry['uncompressed_bytes']} байт, сжатие {entry['compression_ratio']:.1f}x)"
+    if entry['throughput_mb_s'] is not None:
+        line += f", {entry['throughput_mb_s']:.1f} МБ/с"
+    return line
+
+
+def error_report(title, error):
+    """Отчет о формате, запись которого завершилась ошибкой"""
+    return {'format': title, 'file': None, 'seconds': None, 'bytes': None, 'uncompressed_bytes': None,
+            'compression_ratio': None, 'throughput_mb_s': None, 'error': str(error)}
+
+
+def open_output(writer_cls, out_dir, file_name=None, compression=None, level=None):
+    """Открывает файл формата в указанной папке (двоичные форматы не сжимаются)"""
+    if writer_cls.binary:
+        compression = None
+    return OutputFile(os.path.join(out_dir, file_name or writer_cls.file_name), writer_cls.newline,
+                      compression, level, writer_cls.binary)
+
+
+def write_all(writer_cls, f, patients):
+    """Записывает всех пациентов в один формат"""
+    writer = writer_cls(f)
+    writer.begin()
+    for patient in patients:
+        writer.write_patient(patient)
+    writer.end()
+    return writer
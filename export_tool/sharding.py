@@ -0,0 +1,84 @@
+import bisect
+import hashlib
+
+SHARD_BY_CHOICES = ('patient_id', 'doctor')
+
+
+def range_boundaries(conn, shards):
+    """Границы диапазонов patient_id, делящие пациентов на shards частей примерно поровну.
+    Граница - последний patient_id шарда, пациент попадает в шард bisect_left(boundaries, patient_id)"""
+    total = conn.execute('SELECT COUNT(*) FROM patients').fetchone()[0]
+    boundaries = []
+    for shard in range(1, shards):
+        last_position = shard * total // shards - 1
+        if last_position < 0:
+            continue
+        row = conn.execute('SELECT patient_id FROM patients ORDER BY patient_id LIMIT 1 OFFSET ?',
+                           (last_position,)).fetchone()
+        if row is not None and (not boundaries or row[0] > boundaries[-1]):
+            boundaries.append(row[0])
+    return boundaries
+
+
+def doctor_assignment(conn, shards):
+    """Распределяет врачей по шардам так, чтобы число пациентов в шардах было близким.
+    Все пациенты одного врача оказываются в одном шарде"""
+    rows = conn.execute('''
+        SELECT doctor_id, COUNT(*) FROM patients
+        GROUP BY doctor_id
+        ORDER BY COUNT(*) DESC, doctor_id
+    ''').fetchall()
+
+    loads = [0] * shards
+    assignment = {}
+    for doctor_id, count in rows:
+        # Самый крупный из оставшихся врачей уходит в наименее загруженный шард
+        shard = loads.index(min(loads))
+        assignment[doctor_id] = shard
+        loads[shard] += count
+    return assignment
+
+
+def doctor_shards(conn, shards):
+    """Врачи каждого шарда: список из shards списков doctor_id (по распределению doctor_assignment)"""
+    doctors = [[] for _ in range(shards)]
+    for doctor_id, shard in doctor_assignment(conn, shards).items():
+        doctors[shard].append(doctor_id)
+    return doctors
+
+
+def load_shard_patient_ids(conn, doctor_ids):
+    """Заполняет временную таблицу export_patient_ids пациентами врачей шарда"""
+    conn.execute('CREATE TEMP TABLE IF NOT EXISTS export_patient_ids (patient_id INTEGER PRIMARY KEY)')
+    conn.execute('DELETE FROM temp.export_patient_ids')
+    # IS, а не =: пациенты без врача (doctor_id NULL) тоже составляют группу
+    conn.executemany('''
+        INSERT INTO temp.export_patient_ids (patient_id)
+        SELECT patient_id FROM patients WHERE doctor_id IS ?
+    ''', [(doctor_id,) for doctor_id in doctor_ids])
+
+
+def shard_function(conn, shards, shard_by):
+    """Функция, возвращающая номер шарда для пациента"""
+    if shard_by == 'patient_id':
+        boundaries = range_boundaries(conn, shards)
+        return lambda patient: bisect.bisect_left(boundaries, patient['patient_id'])
+    if shard_by == 'doctor':
+        assignment = doctor_assignment(conn, shards)
+        return lambda patient: assignment.get(patient['doctor_id'], 0)
+    raise ValueError(f"Неизвестный способ разбиения: {shard_by}")
+
+
+def shard_file_name(file_name, shard):
+    """Имя файла шарда: data.json -> data-00003.json"""
+    stem, dot, extension = file_name.partition('.')
+    return f'{stem}-{shard:05d}{dot}{extension}'
+
+
+def file_checksum(path):
+    """SHA-256 файла, читаемого блоками"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
@@ -0,0 +1,115 @@
+import sqlite3
+import os
+
+SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS doctors (
+        doctor_id INTEGER PRIMARY KEY,
+        surname TEXT NOT NULL,
+        name TEXT NOT NULL,
+        patronymic TEXT NOT NULL,
+        password TEXT NOT NULL
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS patients (
+        patient_id INTEGER PRIMARY KEY,
+        surname TEXT NOT NULL,
+        name TEXT NOT NULL,
+        patronymic TEXT NOT NULL,
+        doctor_id INTEGER,
+        FOREIGN KEY (doctor_id) REFERENCES doctors (doctor_id)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS medical_cards (
+        patient_id INTEGER PRIMARY KEY,
+        health_complaints TEXT,
+        medical_history TEXT,
+        treatment_plan TEXT,
+        FOREIGN KEY (patient_id) REFERENCES patients (patient_id)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS appointments (
+        appointment_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        patient_id INTEGER NOT NULL,
+        appointment_date TEXT NOT NULL,
+        appointment_time TEXT NOT NULL,
+        confirmed INTEGER DEFAULT 0,
+        FOREIGN KEY (patient_id) REFERENCES patients (patient_id)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS medications (
+        medication_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        patient_id INTEGER NOT NULL,
+        medication_name TEXT NOT NULL,
+        usage_description TEXT,
+        is_taken INTEGER DEFAULT 0,
+        FOREIGN KEY (patient_id) REFERENCES patients (patient_id)
+    )
+    ''',
+]
+
+SURNAMES = ['Белкин', 'Волков', 'Котов', 'Медведев', 'Стрелкин', 'Петров', 'Соколов']
+NAMES = ['Дмитрий', 'Андрей', 'Владислав', 'Михаил', 'Николай', 'Антон', 'Олег']
+PATRONYMICS = ['Дмитриевич', 'Владимирович', 'Владиславович', 'Михайлович', 'Николаевич']
+COMPLAINTS = ['Головная боль, кашель, температура', 'Кашель, озноб', 'Насморк, красное горло, кашель']
+HISTORIES = ['Ранее болел ОРВИ', 'Ранее болел ангиной', 'Ранее ничем не болел']
+MEDICATIONS = [
+    ('Парацетамол', 'По 1 таблетке 3 раза в день после еды'),
+    ('Ибупрофен', 'По 1 таблетке при температуре'),
+    ('Арбидол', 'По 2 капсулы 4 раза в день'),
+    ('Стрепсилс', 'По 1 таблетке каждые 2-3 часа'),
+]
+DOCTORS = [
+    (111, 'Антибиотиков', 'Андрей', 'Андреевич', '111222'),
+    (222, 'Вируснов', 'Виталий', 'Витальевич', '222111'),
+]
+
+
+def create_synthetic_database(db_path, patients=1000, appointments_per_patient=1, medications_per_patient=1):
+    """Создает базу со схемой больницы и заданным числом пациентов, приемов и лекарств"""
+    if os.path.exists(db_path):
+        os.remove(db_path)
+
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute('PRAGMA journal_mode = OFF')
+    cursor.execute('PRAGMA synchronous = OFF')
+
+    for statement in SCHEMA:
+        cursor.execute(statement)
+
+    cursor.executemany('''
+        INSERT INTO doctors (doctor_id, surname, name, patronymic, password)
+        VALUES (?, ?, ?, ?, ?)
+    ''', DOCTORS)
+
+    cursor.executemany('''
+        INSERT INTO patients (patient_id, surname, name, patronymic, doctor_id)
+        VALUES (?, ?, ?, ?, ?)
+    ''', ((i, SURNAMES[i % len(SURNAMES)], NAMES[i % len(NAMES)], PATRONYMICS[i % len(PATRONYMICS)],
+           DOCTORS[i % len(DOCTORS)][0]) for i in range(1, patients + 1)))
+
+    cursor.executemany('''
+        INSERT INTO medical_cards (patient_id, health_complaints, medical_history, treatment_plan)
+        VALUES (?, ?, ?, ?)
+    ''', ((i, COMPLAINTS[i % len(COMPLAINTS)], HISTORIES[i % len(HISTORIES)], '')
+          for i in range(1, patients + 1)))
+
+    cursor.executemany('''
+        INSERT INTO appointments (patient_id, appointment_date, appointment_time, confirmed)
+        VALUES (?, ?, ?, ?)
+    ''', ((i, f'2025-{1 + j % 12:02d}-{1 + j % 28:02d}', f'{8 + j % 12:02d}:{(j * 5) % 60:02d}', j % 2)
+          for i in range(1, patients + 1) for j in range(appointments_per_patient)))
+
+    cursor.executemany('''
+        INSERT INTO medications (patient_id, medication_name, usage_description, is_taken)
+        VALUES (?, ?, ?, ?)
+    ''', ((i, MEDICATIONS[j % len(MEDICATIONS)][0], MEDICATIONS[j % len(MEDICATIONS)][1], j % 2)
+          for i in range(1, patients + 1) for j in range(medications_per_patient)))
+
+    conn.commit()
+    conn.close()
@@ -0,0 +1,162 @@
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+from benchmark_connections import percentile
+from generate_data import DataGenerator, generate_database
+from main import HospitalSystem
+from repositories import AppointmentRepository
+from slot_index import SLOT_STEP, WORK_END, WORK_START, SlotBusy, SlotTaken, format_minute
+from storage_profiles import DEFAULT_PROFILE, connect
+
+# Врач, к которому одновременно записывают все процессы
+DOCTOR = 1
+PATIENTS = 1000
+
+# Прием пересекается с записью врача: начинается до ее конца и заканчивается после ее начала
+OVERLAP = '''
+    SELECT 1 FROM appointments
+    WHERE doctor_id = ? AND appointment_date = ? AND appointment_time < ?
+      AND substr(appointment_time, 1, 2) * 60 + substr(appointment_time, 4, 2) + duration_minutes > ?
+    LIMIT 1
+'''
+# Пары пересекающихся записей одного врача в один день - двойные записи
+DOUBLE_BOOKINGS = '''
+    WITH booked AS (
+        SELECT appointment_id, doctor_id, appointment_date,
+               substr(appointment_time, 1, 2) * 60 + substr(appointment_time, 4, 2) AS start, duration_minutes
+        FROM appointments
+        WHERE appointment_date BETWEEN ? AND ?
+    )
+    SELECT COUNT(*)
+    FROM booked a
+    JOIN booked b ON a.doctor_id = b.doctor_id AND a.appointment_date = b.appointment_date
+                 AND a.appointment_id < b.appointment_id
+    WHERE a.start < b.start + b.duration_minutes AND b.start < a.start + a.duration_minutes
+'''
+
+
+def naive_book(conn, patient_id, day, start, duration):
+    """Прежняя запись: проверка SELECT, затем INSERT в обычной (отложенной) транзакции.
+    Между проверкой и вставкой время может занять другой процесс"""
+    if conn.execute(OVERLAP, (DOCTOR, day, format_minute(start + duration), start)).fetchone():
+        raise SlotTaken(f"Время {format_minute(start)} {day} занято")
+    conn.execute(AppointmentRepository.ADD, (patient_id, DOCTOR, day, format_minute(start), duration))
+    conn.commit()
+
+
+def worker(db_path, mode, number, slots, duration, barrier, results):
+    """Процесс-администратор: пытается записать пациентов на все слоты в своем случайном порядке"""
+    rnd = random.Random(number)
+    slots = rnd.sample(slots, len(slots))
+    if mode == 'atomic':
+        with contextlib.redirect_stdout(io.StringIO()):
+            system = HospitalSystem(db_path)
+        book = lambda patient_id, day, start: system.appointments.add(patient_id, DOCTOR, day,
+                                                                       format_minute(start), duration)
+        close = system.close
+    else:
+        conn = connect(db_path, DEFAULT_PROFILE)
+        book = lambda patient_id, day, start: naive_book(conn, patient_id, day, start, duration)
+        close = conn.close
+
+    booked = conflicts = busy = 0
+    latencies = []
+    try:
+        barrier.wait()
+        for day, start in slots:
+            started = time.perf_counter()
+            try:
+                book(rnd.randint(1, PATIENTS), day, start)
+            except sqlite3.IntegrityError:
+                # SlotTaken или нарушение ux_appointments_doctor_slot
+                conflicts += 1
+                continue
+            except sqlite3.OperationalError as e:
+                if not isinstance(e, SlotBusy) and not str(e).startswith('database is locked'):
+                    raise
+                if mode == 'naive':
+                    conn.rollback()
+                busy += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+            booked += 1
+    finally:
+        close()
+    results.put((booked, conflicts, busy, latencies))
+
+
+def main():
+    """Несколько процессов одновременно записывают пациентов к одному врачу на одни и те же слоты"""
+    parser = argparse.ArgumentParser(description="Нагрузочный тест одновременной записи на прием")
+    parser.add_argument('--processes', type=int, default=8)
+    parser.add_argument('--days', type=int, default=2, help="дней, на слоты которых идет запись")
+    parser.add_argument('--duration', type=int, default=15,
+                        help=f"длительность приема, минут (начала - с шагом {SLOT_STEP} минут, "
+                             f"поэтому соседние начала пересекаются)")
+    parser.add_argument('--mode', choices=('atomic', 'naive'), default='atomic',
+                        help="atomic - запись системы; naive - прежние проверка и вставка отдельными запросами")
+    args = parser.parse_args()
+
+    first = date(2025, 3, 3)
+    first_date, last_date = first.isoformat(), (first + timedelta(days=args.days - 1)).isoformat()
+    slots = [((first + timedelta(days=offset)).isoformat(), start)
+             for offset in range(args.days)
+             for start in range(WORK_START, WORK_END - args.duration + 1, SLOT_STEP)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'hospital.db')
+        generate_database(db_path, DataGenerator(doctors=2, patients=PATIENTS, appointments=0))
+
+        barrier = multiprocessing.Barrier(args.processes + 1)
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=worker,
+                                             args=(db_path, args.mode, number, slots, args.duration, barrier, results))
+                     for number in range(args.processes)]
+        for process in processes:
+            process.start()
+        # Отсчет - когда все процессы открыли базу и начинают одновременно
+        barrier.wait()
+        started = time.perf_counter()
+        outcomes = [results.get() for _ in processes]
+        elapsed = time.perf_counter() - started
+        for process in processes:
+            process.join()
+
+        conn = sqlite3.connect(db_path)
+        try:
+            stored = conn.execute('SELECT COUNT(*) FROM appointments').fetchone()[0]
+            doubles = conn.execute(DOUBLE_BOOKINGS, (first_date, last_date)).fetchone()[0]
+        finally:
+            conn.close()
+
+    booked = sum(outcome[0] for outcome in outcomes)
+    conflicts = sum(outcome[1] for outcome in outcomes)
+    busy = sum(outcome[2] for outcome in outcomes)
+    latencies = [value for outcome in outcomes for value in outcome[3]]
+    attempts = booked + conflicts + busy
+
+    print(f"Режим {args.mode}: процессов {args.processes}, каждый пытается занять все {len(slots)} слотов "
+          f"врача {DOCTOR} с {first_date} по {last_date}, прием {args.duration} мин")
+    print(f"Попыток: {attempts} за {elapsed:.2f} с ({attempts / elapsed:.0f}/с)")
+    print(f"Записано: {booked} ({booked / elapsed:.0f} записей/с), конфликтов: {conflicts}, "
+          f"база занята после всех повторов: {busy}")
+    if latencies:
+        print(f"Задержка успешной записи: медиана {statistics.median(latencies) * 1000:.2f} мс, "
+              f"p95 {percentile(latencies, 0.95) * 1000:.2f} мс")
+    print(f"Записей в базе: {stored} (совпадает с записанными: {stored == booked})")
+    print(f"Двойных записей (пересекающихся приемов врача): {doubles}")
+    if args.mode == 'atomic' and (doubles or stored != booked):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import argparse
+import builtins
+import contextlib
+import io
+import os
+import statistics
+import tempfile
+import time
+
+from benchmark_connections import ScriptedInput, percentile
+from generate_data import DataGenerator, generate_database
+from main import HospitalSystem
+
+# Врачи из сценария: с самым большим списком пациентов (1) и с обычным
+DOCTORS = (1, 10)
+
+
+def run_navigation(db_path, cache_size, rounds):
+    """Повторная навигация по меню: вход врача, его пациенты, выбор пациента, список всех пациентов.
+    Возвращает задержки по действиям и счетчики кэша"""
+    scripted = ScriptedInput()
+    latencies = {}
+
+    def timed(action, method, *args, answers=()):
+        scripted.answers = list(answers)
+        started = time.perf_counter()
+        method(*args)
+        latencies.setdefault(action, []).append(time.perf_counter() - started)
+
+    original_input = builtins.input
+    builtins.input = scripted
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            system = HospitalSystem(db_path, cache_size=cache_size)
+            try:
+                for round_number in range(rounds):
+                    doctor_id = DOCTORS[round_number % len(DOCTORS)]
+                    patient_id = system.patients.doctor_roster(doctor_id)[0].patient_id
+                    timed('doctor_login', system.doctor_login, answers=(str(doctor_id), str(doctor_id) * 2))
+                    timed('show_doctor_patients', system.show_doctor_patients)
+                    # Выбор пациента и сразу "Назад"
+                    timed('work_with_patient', system.work_with_patient, answers=(str(patient_id), '7'))
+                    timed('show_all_patients', system.show_all_patients)
+                stats = system.cache.stats() if system.cache is not None else None
+            finally:
+                system.close()
+    finally:
+        builtins.input = original_input
+    return latencies, stats
+
+
+def main():
+    """Навигация по меню с кэшем врачей и списков пациентов и без него"""
+    parser = argparse.ArgumentParser(description="Бенчмарк кэша чтения HospitalSystem")
+    parser.add_argument('--rounds', type=int, default=50, help="повторов навигации")
+    parser.add_argument('--patients', type=int, default=50000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'hospital.db')
+        generate_database(db_path, DataGenerator(doctors=50, patients=args.patients, appointments=10000))
+        without_cache, _ = run_navigation(db_path, 0, args.rounds)
+        with_cache, stats = run_navigation(db_path, 1024, args.rounds)
+
+    print(f"Пациентов: {args.patients}, повторов: {args.rounds}, задержка в мс (медиана / p95)")
+    print(f"{'действие':22} {'без кэша':>20} {'с кэшем':>20} {'ускорение':>10}")
+    for action in without_cache:
+        before, after = without_cache[action], with_cache[action]
+        print(f"{action:22} {statistics.median(before) * 1000:9.3f} / {percentile(before, 0.95) * 1000:8.3f}"
+              f" {statistics.median(after) * 1000:9.3f} / {percentile(after, 0.95) * 1000:8.3f}"
+              f" {statistics.median(before) / statistics.median(after):9.1f}x")
+    print(f"Кэш: попаданий {stats['hits']}, промахов {stats['misses']} ({stats['hit_rate']:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import argparse
+import builtins
+import contextlib
+import io
+import os
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+from main import HospitalSystem
+from storage_profiles import connect
+
+
+class LegacyConnectionSystem(HospitalSystem):
+    """Прежнее поведение: новое соединение и проверка папки на каждое действие.
+    Профиль хранения тот же, что у пула, чтобы сравнивалось только переиспользование соединений"""
+
+    def get_connection(self):
+        try:
+            db_dir = os.path.dirname(self.db_path)
+            if not os.path.exists(db_dir):
+                os.makedirs(db_dir, exist_ok=True)
+            return connect(self.db_path, self.pool.profile)
+        except Exception as e:
+            print(f"Ошибка подключения к базе: {e}")
+            return None
+
+
+class ScriptedInput:
+    """Подменяет input(): ответы берутся из заранее заданного списка"""
+
+    def __init__(self):
+        self.answers = []
+
+    def __call__(self, prompt=''):
+        return self.answers.pop(0)
+
+
+def slots(count):
+    """Свободные слоты записи: дни 2025 года, время с 8:00 с шагом 5 минут"""
+    day = date(2025, 1, 1)
+    produced = 0
+    while produced < count:
+        for minute in range(8 * 60, 20 * 60, 5):
+            yield day.isoformat(), f'{minute // 60:02d}:{minute % 60:02d}'
+            produced += 1
+            if produced == count:
+                return
+        day += timedelta(days=1)
+
+
+def last_id(system, table, column):
+    conn = system.get_connection()
+    value = conn.execute(f'SELECT MAX({column}) FROM {table}').fetchone()[0]
+    conn.close()
+    return value
+
+
+def run_load(system_cls, db_path, iterations):
+    """Сценарий: вход врача, просмотр пациентов и медкарты, назначение и отметка препарата,
+    запись на прием и ее подтверждение. Возвращает задержки по каждому действию"""
+    scripted = ScriptedInput()
+    latencies = {}
+
+    def timed(action, method, *args, answers=()):
+        scripted.answers = list(answers)
+        started = time.perf_counter()
+        method(*args)
+        latencies.setdefault(action, []).append(time.perf_counter() - started)
+
+    original_input = builtins.input
+    builtins.input = scripted
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            system = system_cls(db_path)
+            system.seed_demo_data()
+            try:
+                for slot_date, slot_time in slots(iterations):
+                    timed('doctor_login', system.doctor_login, answers=('111', '111222'))
+                    timed('show_doctor_patients', system.show_doctor_patients)
+                    timed('view_patient_medical_card', system.view_patient_medical_card, 1)
+                    timed('add_medication', system.add_medication, 1, answers=('Парацетамол', 'По 1 таблетке'))
+
+                    system.current_patient_id = 1
+                    medication_id = last_id(system, 'medications', 'medication_id')
+                    timed('mark_medication_taken', system.mark_medication_taken, answers=(str(medication_id),))
+
+                    timed('schedule_appointment', system.schedule_appointment,
+                          answers=('2', slot_date, slot_time, '5'))
+                    appointment_id = last_id(system, 'appointments', 'appointment_id')
+                    timed('confirm_appointment', system.confirm_appointment, answers=(str(appointment_id),))
+            finally:
+                if hasattr(system, 'pool'):
+                    system.close()
+    finally:
+        builtins.input = original_input
+    return latencies
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main():
+    """Сравнение задержки действий с новым соединением на каждое действие и с пулом соединений"""
+    parser = argparse.ArgumentParser(description="Бенчмарк соединений HospitalSystem")
+    parser.add_argument('--iterations', type=int, default=300, help="повторов сценария")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for title, system_cls in (('новое соединение', LegacyConnectionSystem), ('пул', HospitalSystem)):
+            db_path = os.path.join(tmp, title.replace(' ', '_'), 'hospital.db')
+            results[title] = run_load(system_cls, db_path, args.iterations)
+
+    legacy, pooled = results.values()
+    print(f"Повторов сценария: {args.iterations}, задержка в мс (медиана / p95)")
+    print(f"{'действие':28} {'новое соединение':>20} {'пул':>20} {'ускорение':>10}")
+    for action in legacy:
+        before, after = legacy[action], pooled[action]
+        print(f"{action:28} {statistics.median(before) * 1000:9.3f} / {percentile(before, 0.95) * 1000:8.3f}"
+              f" {statistics.median(after) * 1000:9.3f} / {percentile(after, 0.95) * 1000:8.3f}"
+              f" {statistics.median(before) / statistics.median(after):9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmark_connections import percentile
+from generate_data import DataGenerator, generate_database
+
+SERVICE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'http_service.py')
+
+
+class Client:
+    """Клиент HTTP/1.1 с keep-alive: одно соединение, запросы по очереди"""
+
+    def __init__(self, reader, writer, latencies):
+        self.reader = reader
+        self.writer = writer
+        self.latencies = latencies
+        self.token = None
+
+    async def request(self, action, method, path, payload=None):
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        head = f'{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n'
+        if self.token:
+            head += f'Authorization: Bearer {self.token}\r\n'
+        started = time.perf_counter()
+        self.writer.write(head.encode('latin-1') + b'\r\n' + body)
+        response_head = await self.reader.readuntil(b'\r\n\r\n')
+        status = int(response_head.split(b' ', 2)[1])
+        length = int(re.search(rb'Content-Length: (\d+)', response_head).group(1))
+        data = json.loads(await self.reader.readexactly(length))
+        self.latencies.setdefault(action, []).append(time.perf_counter() - started)
+        return status, data
+
+
+async def doctor_session(host, port, doctor_id, rounds, latencies, errors):
+    """Сценарий врача: вход, список пациентов, медкарта и назначение препарата своему пациенту"""
+    reader, writer = await asyncio.open_connection(host, port)
+    client = Client(reader, writer, latencies)
+    try:
+        status, data = await client.request('login', 'POST', '/login/doctor',
+                                            {'doctor_id': doctor_id, 'password': str(doctor_id) * 2})
+        if status != 200:
+            errors.append(status)
+            return
+        client.token = data['token']
+        for _ in range(rounds):
+            status, data = await client.request('patients', 'GET', '/doctor/patients')
+            if status != 200 or not data['patients']:
+                errors.append(status)
+                continue
+            patient_id = random.choice(data['patients'])['patient_id']
+            for action, method, path, payload in (
+                    ('card', 'GET', f'/patients/{patient_id}/card', None),
+                    ('prescribe', 'POST', f'/patients/{patient_id}/medications',
+                     {'medication_name': 'Ибупрофен', 'usage_description': 'По 1 таблетке'})):
+                status, _ = await client.request(action, method, path, payload)
+                if status >= 300:
+                    errors.append(status)
+    finally:
+        writer.close()
+
+
+async def run_clients(host, port, clients, rounds, doctors):
+    latencies = {}
+    errors = []
+    started = time.perf_counter()
+    await asyncio.gather(*(doctor_session(host, port, client % doctors + 1, rounds, latencies, errors)
+                           for client in range(clients)))
+    return latencies, errors, time.perf_counter() - started
+
+
+def start_service(db_path, workers):
+    """Запускает сервис в отдельном процессе на свободном порту. Возвращает (процесс, хост, порт)"""
+    process = subprocess.Popen([sys.executable, SERVICE, '--db', db_path, '--port', '0', '--workers', str(workers)],
+                               stdout=subprocess.PIPE, text=True, encoding='utf-8')
+    for line in process.stdout:
+        match = re.search(r'http://([\d.]+):(\d+)', line)
+        if match:
+            return process, match.group(1), int(match.group(2))
+    raise RuntimeError("Сервис не запустился")
+
+
+def main():
+    """Нагрузка на HTTP-сервис: сотни одновременных клиентов-врачей на одной базе"""
+    parser = argparse.ArgumentParser(description="Бенчмарк HTTP/JSON-сервиса")
+    parser.add_argument('--clients', type=int, default=200, help="одновременных клиентов")
+    parser.add_argument('--rounds', type=int, default=10, help="повторов сценария у каждого клиента")
+    parser.add_argument('--workers', type=int, default=8, help="потоков сервиса для базы")
+    parser.add_argument('--doctors', type=int, default=50)
+    parser.add_argument('--patients', type=int, default=10000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'hospital.db')
+        generate_database(db_path, DataGenerator(doctors=args.doctors, patients=args.patients, appointments=5000))
+        process, host, port = start_service(db_path, args.workers)
+        try:
+            latencies, errors, elapsed = asyncio.run(
+                run_clients(host, port, args.clients, args.rounds, args.doctors))
+        finally:
+            process.terminate()
+            process.wait()
+
+    requests = sum(len(values) for values in latencies.values())
+    print(f"Клиентов: {args.clients}, потоков базы: {args.workers}, запросов: {requests}, ошибок: {len(errors)}")
+    print(f"Пропускная способность: {requests / elapsed:.0f} запросов/с за {elapsed:.1f} с")
+    print(f"{'запрос':12} {'медиана, мс':>12} {'p95, мс':>10} {'p99, мс':>10}")
+    for action, values in latencies.items():
+        print(f"{action:12} {statistics.median(values) * 1000:12.2f} {percentile(values, 0.95) * 1000:10.2f}"
+              f" {percentile(values, 0.99) * 1000:10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import argparse
+import contextlib
+import csv
+import os
+import tempfile
+import time
+
+from bulk_import import DEFAULT_BATCH_SIZE, FIELDS, PatientImporter, RejectWriter, read_csv
+from generate_data import DataGenerator, generate_database
+from migrations import deferred_search_index
+from repositories import MedicalCardRepository, card_search_query
+from storage_profiles import connect
+
+DOCTORS = 50
+# Поиск, которым сравниваются индексы после загрузки разными способами
+SEARCH_TEXT = 'кашель'
+
+
+def write_csv(path, rows):
+    """Входной файл загрузки: пациенты и медкарты генератора синтетических данных"""
+    generator = DataGenerator(doctors=DOCTORS, patients=rows, appointments=0)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(FIELDS)
+        for patient, card in zip(list(generator.patient_rows()), generator.medical_card_rows()):
+            writer.writerow(patient + card[1:])
+
+
+def run_import(db_path, csv_path, rejects_path, batch_size, deferred):
+    """Загрузка файла в новую базу. Возвращает (загружено, секунд всего, секунд на построение индекса
+    после загрузки, найдено поиском у каждого врача)"""
+    generate_database(db_path, DataGenerator(doctors=DOCTORS, patients=0, appointments=0))
+    conn = connect(db_path, 'bulk-load')
+    rejects = RejectWriter(rejects_path)
+    try:
+        importer = PatientImporter(conn, rejects, batch_size)
+        started = time.perf_counter()
+        with deferred_search_index(conn) if deferred else contextlib.nullcontext():
+            imported = importer.run(read_csv(csv_path))
+            loaded = time.perf_counter()
+        finished = time.perf_counter()
+        # Индекс должен совпадать с медкартами: иначе integrity-check завершается ошибкой
+        conn.execute("INSERT INTO medical_cards_fts (medical_cards_fts, rank) VALUES ('integrity-check', 1)")
+        found = [len(conn.execute(MedicalCardRepository.SEARCH,
+                                  (card_search_query(SEARCH_TEXT, doctor_id), 1000000)).fetchall())
+                 for doctor_id in range(1, DOCTORS + 1)]
+    finally:
+        rejects.close()
+        conn.close()
+    return imported, finished - started, finished - loaded, found
+
+
+def main():
+    """Массовая загрузка пациентов и медкарт: индекс FTS триггерами на каждую строку и rebuild после загрузки"""
+    parser = argparse.ArgumentParser(description="Бенчмарк массовой загрузки пациентов и медкарт")
+    parser.add_argument('--rows', type=int, default=300000)
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'patients.csv')
+        write_csv(csv_path, args.rows)
+        print(f"Строк CSV: {args.rows}, пакет: {args.batch_size}")
+
+        results = {}
+        for title, deferred in (('триггеры на каждую строку', False), ('rebuild после загрузки', True)):
+            imported, elapsed, indexing, found = run_import(os.path.join(tmp, f'{deferred}.db'), csv_path,
+                                                            os.path.join(tmp, 'rejects.csv'), args.batch_size,
+                                                            deferred)
+            results[title] = found
+            print(f"{title:28} загружено: {imported}  время: {elapsed:7.2f} с "
+                  f"(rebuild индекса: {indexing:5.2f} с)  {imported / elapsed:9.0f} строк/с")
+
+        triggered, rebuilt = results.values()
+        print("Индексы совпадают: поиск находит те же медкарты" if triggered == rebuilt
+              else "ВНИМАНИЕ: результаты поиска различаются")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import argparse
+import contextlib
+import io
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+from benchmark_connections import percentile
+from generate_data import DataGenerator, generate_database
+from main import HospitalSystem
+from slot_index import SLOT_STEP, WORK_END, WORK_START, format_minute
+
+# Врач, в расписании которого ищется время: при распределении Ципфа у него больше всего приемов
+DOCTOR = 1
+
+
+def timings(action, repeat):
+    """Задержки action() в секундах"""
+    values = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        action()
+        values.append(time.perf_counter() - started)
+    return values
+
+
+def probe_database(db_path, doctor_id, first, days, duration):
+    """Поиск свободного времени врача без индекса: запрос к базе на каждый возможный слот"""
+    conn = sqlite3.connect(db_path)
+    try:
+        found = []
+        for offset in range(days):
+            day = (first + timedelta(days=offset)).isoformat()
+            for start in range(WORK_START, WORK_END - duration + 1, SLOT_STEP):
+                # Прием начинается до конца нового и заканчивается после его начала
+                taken = conn.execute('''
+                    SELECT 1 FROM appointments
+                    WHERE doctor_id = ? AND appointment_date = ? AND appointment_time < ?
+                      AND substr(appointment_time, 1, 2) * 60 + substr(appointment_time, 4, 2) + duration_minutes > ?
+                    LIMIT 1
+                ''', (doctor_id, day, format_minute(start + duration), start)).fetchone()
+                if not taken:
+                    found.append((day, format_minute(start)))
+        return found
+    finally:
+        conn.close()
+
+
+def main():
+    """Поиск свободного времени врача на месяц вперед по индексу занятости и пробами базы"""
+    parser = argparse.ArgumentParser(description="Бенчмарк поиска свободного времени приема")
+    parser.add_argument('--appointments', type=int, default=30000, help="приемов в базе (год, шаг 5 минут)")
+    parser.add_argument('--days', type=int, default=30, help="дней поиска")
+    parser.add_argument('--duration', type=int, default=15, help="длительность приема, минут")
+    parser.add_argument('--doctors', type=int, default=3, help="врачей (у первого больше всего приемов)")
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    first = date(2025, 3, 3)
+    first_date, last_date = first.isoformat(), (first + timedelta(days=args.days - 1)).isoformat()
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'hospital.db')
+        generate_database(db_path, DataGenerator(doctors=args.doctors, patients=10000,
+                                                            appointments=args.appointments))
+        with contextlib.redirect_stdout(io.StringIO()):
+            system = HospitalSystem(db_path)
+        try:
+            appointments = system.appointments
+            started = time.perf_counter()
+            free = appointments.free_slots(DOCTOR, first_date, last_date, args.duration)
+            cold = time.perf_counter() - started
+            results = {
+                f'все свободное за {args.days} дн.': timings(
+                    lambda: appointments.free_slots(DOCTOR, first_date, last_date, args.duration), args.repeat),
+                'ближайшие 10': timings(
+                    lambda: appointments.free_slots(DOCTOR, first_date, '2025-12-31', args.duration, 10), args.repeat),
+                'проверка пересечения': timings(
+                    lambda: appointments.slot_taken(DOCTOR, first_date, '12:00', args.duration), args.repeat),
+            }
+        finally:
+            system.close()
+        started = time.perf_counter()
+        probed = probe_database(db_path, DOCTOR, first, args.days, args.duration)
+        probe = time.perf_counter() - started
+
+    print(f"Приемов: {args.appointments} у {args.doctors} врачей, поиск у врача {DOCTOR} "
+          f"с {first_date} по {last_date}, прием {args.duration} мин")
+    print(f"Свободных слотов: {len(free)}; первый поиск с загрузкой дней из базы: {cold * 1000:.2f} мс")
+    print(f"{'запрос':32} {'медиана, мс':>12} {'p95, мс':>10}")
+    for action, values in results.items():
+        print(f"{action:32} {statistics.median(values) * 1000:12.3f} {percentile(values, 0.95) * 1000:10.3f}")
+    print(f"{'пробы базы по каждому слоту':32} {probe * 1000:12.3f} {'':>10} (найдено то же: {probed == free})")
+
+
+if __name__ == "__main__":
+    main()
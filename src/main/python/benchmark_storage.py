@@ -0,0 +1,114 @@
+import argparse
+import builtins
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+from benchmark_connections import ScriptedInput, last_id, slots
+from main import HospitalSystem
+from storage_profiles import STORAGE_PROFILES, apply_profile
+
+# Выгрузка лежит в export_tool в корне репозитория
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'export_tool'))
+from data_exporter import HospitalDataExporter  # noqa: E402
+from synthetic_db import create_synthetic_database  # noqa: E402
+
+# None - настройки SQLite по умолчанию (журнал отката, полная синхронизация)
+WRITE_PROFILES = (None, 'interactive', 'bulk-load')
+READ_PROFILES = (None,) + tuple(STORAGE_PROFILES)
+
+
+def profile_title(profile):
+    return profile or 'по умолчанию'
+
+
+def run_writes(db_path, profile, operations):
+    """Пути записи HospitalSystem: запись на прием, назначение препарата, отметка приема.
+    Возвращает число операций в секунду для каждого действия"""
+    scripted = ScriptedInput()
+    seconds = {'schedule_appointment': 0.0, 'add_medication': 0.0, 'mark_medication_taken': 0.0}
+
+    def timed(action, method, *args, answers=()):
+        scripted.answers = list(answers)
+        started = time.perf_counter()
+        method(*args)
+        seconds[action] += time.perf_counter() - started
+
+    original_input = builtins.input
+    builtins.input = scripted
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            system = HospitalSystem(db_path, profile)
+            system.seed_demo_data()
+            system.current_patient_id = 1
+            try:
+                for slot_date, slot_time in slots(operations):
+                    timed('schedule_appointment', system.schedule_appointment,
+                          answers=('2', slot_date, slot_time, '5'))
+                    timed('add_medication', system.add_medication, 1, answers=('Ибупрофен', 'По 1 таблетке'))
+                    medication_id = last_id(system, 'medications', 'medication_id')
+                    timed('mark_medication_taken', system.mark_medication_taken, answers=(str(medication_id),))
+            finally:
+                system.close()
+    finally:
+        builtins.input = original_input
+    return {action: operations / total for action, total in seconds.items()}
+
+
+class ProfiledExporter(HospitalDataExporter):
+    """Выгрузка, у соединения которой включен профиль хранения"""
+
+    def __init__(self, db_path, profile):
+        super().__init__(db_path)
+        self.profile = profile
+
+    def get_connection(self):
+        conn = super().get_connection()
+        if conn is not None:
+            apply_profile(conn, self.profile)
+        return conn
+
+
+def run_reads(db_path, profile, repeat):
+    """Лучшее время чтения всех пациентов выгрузкой"""
+    best = None
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            exporter = ProfiledExporter(db_path, profile)
+            started = time.perf_counter()
+            count = sum(1 for _ in exporter.iter_patient_data())
+            elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return count, best
+
+
+def main():
+    """Сравнение профилей хранения на путях записи системы и на чтении выгрузкой"""
+    parser = argparse.ArgumentParser(description="Бенчмарк профилей хранения SQLite")
+    parser.add_argument('--operations', type=int, default=300, help="операций записи каждого вида")
+    parser.add_argument('--patients', type=int, default=50000, help="пациентов в базе для чтения")
+    parser.add_argument('--repeat', type=int, default=3, help="повторов чтения, берется лучшее время")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"Запись: по {args.operations} операций каждого вида, операций в секунду")
+        print(f"{'профиль':16} {'запись на прием':>16} {'назначение':>12} {'отметка':>10}")
+        for profile in WRITE_PROFILES:
+            db_path = os.path.join(tmp, f'writes-{profile_title(profile)}.db')
+            rates = run_writes(db_path, profile, args.operations)
+            print(f"{profile_title(profile):16} {rates['schedule_appointment']:16.0f} "
+                  f"{rates['add_medication']:12.0f} {rates['mark_medication_taken']:10.0f}")
+
+        db_path = os.path.join(tmp, 'reads.db')
+        create_synthetic_database(db_path, args.patients, 2, 2)
+        print(f"\nЧтение выгрузкой: {args.patients} пациентов, лучшее из {args.repeat}")
+        for profile in READ_PROFILES:
+            count, seconds = run_reads(db_path, profile, args.repeat)
+            print(f"{profile_title(profile):16} {seconds:8.3f} с  {count / seconds:10.0f} пациентов/с")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+import argparse
+import contextlib
+import csv
+import json
+import os
+import sqlite3
+import sys
+import time
+
+from migrations import MigrationError, deferred_search_index, migrate
+from storage_profiles import connect
+
+# Поля входного файла; patient_id и doctor_id можно не указывать
+FIELDS = ('patient_id', 'surname', 'name', 'patronymic', 'doctor_id',
+          'health_complaints', 'medical_history', 'treatment_plan')
+REQUIRED_FIELDS = ('surname', 'name', 'patronymic')
+CARD_FIELDS = ('health_complaints', 'medical_history', 'treatment_plan')
+
+DEFAULT_BATCH_SIZE = 50000
+
+
+class RejectedRecord(Exception):
+    """Запись не прошла проверку и попадет в файл отклоненных записей"""
+
+
+def read_csv(path):
+    """Записи CSV-файла с заголовком: (номер строки, словарь полей)"""
+    # utf-8-sig: файлы, сохраненные из Excel, начинаются с BOM
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        reader = csv.DictReader(f)
+        missing = [field for field in REQUIRED_FIELDS if field not in (reader.fieldnames or ())]
+        if missing:
+            raise ValueError(f"В заголовке CSV нет обязательных столбцов: {', '.join(missing)}")
+        for record in reader:
+            yield reader.line_num, record
+
+
+def read_jsonl(path):
+    """Записи файла JSON Lines: (номер строки, словарь полей или исходная строка при ошибке разбора)"""
+    with open(path, encoding='utf-8-sig') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = line.rstrip('\n')
+            yield line_number, record
+
+
+READERS = {'csv': read_csv, 'jsonl': read_jsonl}
+
+
+def detect_format(path):
+    """Формат по расширению файла: .csv или .jsonl/.ndjson"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return 'csv'
+    if extension in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    raise ValueError(f"Не удалось определить формат файла {path}: укажите --format")
+
+
+def _text(record, field, required=False):
+    value = record.get(field)
+    if value is None:
+        value = ''
+    if not isinstance(value, str):
+        raise RejectedRecord(f"поле {field} должно быть строкой")
+    value = value.strip()
+    if required and not value:
+        raise RejectedRecord(f"не заполнено поле {field}")
+    return value
+
+
+def _integer(record, field):
+    value = record.get(field)
+    if value is None or value == '':
+        return None
+    if isinstance(value, bool):
+        raise RejectedRecord(f"поле {field} должно быть целым числом")
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise RejectedRecord(f"поле {field} должно быть целым числом: {value!r}") from None
+    if number <= 0:
+        raise RejectedRecord(f"поле {field} должно быть положительным: {number}")
+    return number
+
+
+def validate(record, doctor_ids):
+    """Проверяет запись. Возвращает (patient_id или None, строка patients без id, строка medical_cards без id)"""
+    if isinstance(record, str):
+        raise RejectedRecord("строка не является корректным JSON")
+    if not isinstance(record, dict):
+        raise RejectedRecord("запись не является объектом JSON")
+    patient_id = _integer(record, 'patient_id')
+    doctor_id = _integer(record, 'doctor_id')
+    if doctor_id is not None and doctor_id not in doctor_ids:
+        raise RejectedRecord(f"врач {doctor_id} не найден")
+    patient = (_text(record, 'surname', True), _text(record, 'name', True),
+               _text(record, 'patronymic', True), doctor_id)
+    card = tuple(_text(record, field) for field in CARD_FIELDS)
+    return patient_id, patient, card
+
+
+class RejectWriter:
+    """Файл отклоненных записей (CSV): номер строки, причина, исходная запись"""
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._file = None
+        self._writer = None
+
+    def write(self, line_number, reason, record):
+        if self._file is None:
+            self._file = open(self.path, 'w', encoding='utf-8', newline='')
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(('line', 'reason', 'record'))
+        raw = record if isinstance(record, str) else json.dumps(record, ensure_ascii=False)
+        self._writer.writerow((line_number, reason, raw))
+        self.count += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+class PatientImporter:
+    """Загрузка пациентов и медкарт пакетами: одна транзакция и один executemany на таблицу на пакет"""
+
+    def __init__(self, conn, rejects, batch_size=DEFAULT_BATCH_SIZE):
+        self.conn = conn
+        self.rejects = rejects
+        self.batch_size = batch_size
+        self.doctor_ids = {row[0] for row in conn.execute('SELECT doctor_id FROM doctors')}
+        # Пациенты без patient_id получают номера после максимального в базе
+        self.next_id = conn.execute('SELECT COALESCE(MAX(patient_id), 0) + 1 FROM patients').fetchone()[0]
+        self.seen_ids = set()
+        self.imported = 0
+
+    def _flush(self, batch):
+        """Записывает пакет; пациенты, уже существующие в базе, отклоняются"""
+        ids = [patient[0] for _, patient, _ in batch]
+        existing = {row[0] for row in self.conn.execute(
+            'SELECT patient_id FROM patients WHERE patient_id BETWEEN ? AND ?', (min(ids), max(ids)))}
+
+        patients = []
+        cards = []
+        for line_number, patient, card in batch:
+            if patient[0] in existing:
+                # Исходная запись в пакете не хранится: восстанавливаем ее из проверенных полей
+                record = dict(zip(FIELDS, patient + card[1:]))
+                self.rejects.write(line_number, f"пациент {patient[0]} уже есть в базе", record)
+                continue
+            patients.append(patient)
+            cards.append(card)
+
+        self.conn.execute('BEGIN')
+        try:
+            self.conn.executemany('''
+                INSERT INTO patients (patient_id, surname, name, patronymic, doctor_id)
+                VALUES (?, ?, ?, ?, ?)
+            ''', patients)
+            self.conn.executemany('''
+                INSERT INTO medical_cards (patient_id, health_complaints, medical_history, treatment_plan)
+                VALUES (?, ?, ?, ?)
+            ''', cards)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        self.imported += len(patients)
+
+    def run(self, records, progress=None):
+        """Загружает записи (номер строки, запись); progress(imported, rejected) вызывается после пакета"""
+        batch = []
+        for line_number, record in records:
+            try:
+                patient_id, patient, card = validate(record, self.doctor_ids)
+                if patient_id is None:
+                    patient_id = self.next_id
+                if patient_id in self.seen_ids:
+                    raise RejectedRecord(f"пациент {patient_id} повторяется в файле")
+            except RejectedRecord as e:
+                self.rejects.write(line_number, str(e), record)
+                continue
+
+            self.seen_ids.add(patient_id)
+            self.next_id = max(self.next_id, patient_id + 1)
+            batch.append((line_number, (patient_id,) + patient, (patient_id,) + card))
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+                if progress:
+                    progress(self.imported, self.rejects.count)
+
+        if batch:
+            self._flush(batch)
+        if progress:
+            progress(self.imported, self.rejects.count)
+        return self.imported
+
+
+def main():
+    """Массовая загрузка пациентов и медкарт из CSV или JSON Lines"""
+    parser = argparse.ArgumentParser(description="Массовая загрузка пациентов и медкарт")
+    parser.add_argument('input', help="файл CSV или JSON Lines с полями: " + ', '.join(FIELDS))
+    parser.add_argument('--db', default='../database/hospital.db')
+    parser.add_argument('--format', choices=sorted(READERS), help="по умолчанию - по расширению файла")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--rejects', help="файл отклоненных записей (по умолчанию <input>.rejects.csv)")
+    parser.add_argument('--profile', default='bulk-load', help="профиль хранения SQLite")
+    parser.add_argument('--search-index', choices=('rebuild', 'triggers'), default='rebuild',
+                        help="поиск по медкартам: перестроить индекс после загрузки (быстрее для больших файлов) "
+                             "или обновлять его триггерами на каждую строку (для небольших добавлений в большую базу)")
+    args = parser.parse_args()
+
+    rejects = RejectWriter(args.rejects or args.input + '.rejects.csv')
+    started = time.perf_counter()
+
+    def progress(imported, rejected):
+        elapsed = time.perf_counter() - started
+        print(f"Загружено: {imported}, отклонено: {rejected}, {imported / elapsed:.0f} записей/с")
+
+    conn = None
+    try:
+        file_format = args.format or detect_format(args.input)
+        db_dir = os.path.dirname(args.db)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        conn = connect(args.db, args.profile)
+        migrate(conn)
+
+        importer = PatientImporter(conn, rejects, args.batch_size)
+        # rebuild: полнотекстовый индекс медкарт строится один раз после загрузки, а не триггером на каждую строку
+        with deferred_search_index(conn) if args.search_index == 'rebuild' else contextlib.nullcontext():
+            imported = importer.run(READERS[file_format](args.input), progress)
+    except (OSError, ValueError, sqlite3.Error, MigrationError) as e:
+        print(f"Ошибка загрузки: {e}")
+        sys.exit(1)
+    finally:
+        rejects.close()
+        if conn is not None:
+            conn.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"\nЗагрузка завершена за {elapsed:.1f} с: пациентов {imported}, "
+          f"{imported / elapsed if elapsed else 0:.0f} записей/с")
+    if rejects.count:
+        print(f"Отклонено записей: {rejects.count}, причины в файле {rejects.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import os
+import sqlite3
+import threading
+
+from storage_profiles import DEFAULT_PROFILE, connect
+
+
+class PooledConnection:
+    """Соединение из пула. close() не закрывает соединение, а возвращает его в пул:
+    незавершенная транзакция откатывается, как при закрытии обычного соединения"""
+    __slots__ = ('_conn',)
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self):
+        return self._conn.cursor()
+
+    def execute(self, sql, parameters=()):
+        return self._conn.execute(sql, parameters)
+
+    def commit(self):
+        self._conn.commit()
+
+    def close(self):
+        if self._conn.in_transaction:
+            self._conn.rollback()
+
+    def __enter__(self):
+        return self._conn.__enter__()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return self._conn.__exit__(exc_type, exc_value, traceback)
+
+
+class ConnectionPool:
+    """Пул соединений с базой: у каждого потока одно долгоживущее соединение.
+    Соединение открывается при первом обращении потока и живет до close_all(),
+    поэтому кэш подготовленных запросов sqlite3 переиспользуется между действиями.
+    При открытии к соединению применяется профиль хранения (см. storage_profiles)"""
+
+    def __init__(self, db_path, profile=DEFAULT_PROFILE, cached_statements=256):
+        self.db_path = db_path
+        self.profile = profile
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+        self._closed = False
+        # Сколько соединений открыто за время работы пула
+        self.opened = 0
+
+    def _open(self):
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        # Соединение используется только своим потоком; из другого потока его закрывает close_all()
+        conn = connect(self.db_path, self.profile, cached_statements=self.cached_statements,
+                       check_same_thread=False)
+        with self._lock:
+            if self._closed:
+                conn.close()
+                raise sqlite3.ProgrammingError("Пул соединений закрыт")
+            self._connections.append(conn)
+            self.opened += 1
+        return conn
+
+    def connection(self):
+        """Соединение текущего потока (открывается при первом обращении)"""
+        conn = getattr(self._local, 'connection', None)
+        if conn is None:
+            conn = self._open()
+            self._local.connection = conn
+        return PooledConnection(conn)
+
+    def cursor(self):
+        """Курсор на соединении текущего потока"""
+        return self.connection().cursor()
+
+    def release(self):
+        """Закрывает соединение текущего потока (например, перед завершением рабочего потока)"""
+        conn = getattr(self._local, 'connection', None)
+        if conn is None:
+            return
+        self._local.connection = None
+        with self._lock:
+            self._connections.remove(conn)
+        conn.close()
+
+    def close_all(self):
+        """Закрывает все соединения пула; после этого новые соединения не выдаются"""
+        with self._lock:
+            self._closed = True
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
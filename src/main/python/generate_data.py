@@ -0,0 +1,280 @@
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+from itertools import accumulate
+
+from migrations import MigrationError, deferred_search_index, migrate
+from storage_profiles import connect
+
+# Фамилии в мужской форме; женская форма получается окончанием "а"
+SURNAMES = ['Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Петров', 'Соколов', 'Михайлов',
+            'Новиков', 'Федоров', 'Морозов', 'Волков', 'Алексеев', 'Лебедев', 'Семенов', 'Егоров',
+            'Павлов', 'Козлов', 'Степанов', 'Николаев', 'Орлов', 'Андреев', 'Макаров', 'Никитин',
+            'Захаров', 'Зайцев', 'Соловьев', 'Борисов', 'Яковлев', 'Григорьев', 'Романов', 'Воробьев',
+            'Белкин', 'Котов', 'Медведев', 'Стрелкин', 'Сергеев', 'Кузьмин', 'Фролов', 'Александров']
+MALE_NAMES = ['Александр', 'Дмитрий', 'Максим', 'Сергей', 'Андрей', 'Алексей', 'Артем', 'Илья',
+              'Кирилл', 'Михаил', 'Никита', 'Матвей', 'Роман', 'Егор', 'Иван', 'Владислав',
+              'Николай', 'Антон', 'Олег', 'Павел']
+FEMALE_NAMES = ['Анастасия', 'Мария', 'Анна', 'Виктория', 'Екатерина', 'Наталья', 'Марина', 'Полина',
+                'Дарья', 'Алиса', 'Ксения', 'Елена', 'Ольга', 'Татьяна', 'Ирина', 'Светлана']
+# Отчества: (мужская форма, женская форма)
+PATRONYMICS = [('Александрович', 'Александровна'), ('Дмитриевич', 'Дмитриевна'), ('Сергеевич', 'Сергеевна'),
+               ('Андреевич', 'Андреевна'), ('Алексеевич', 'Алексеевна'), ('Михайлович', 'Михайловна'),
+               ('Иванович', 'Ивановна'), ('Николаевич', 'Николаевна'), ('Владимирович', 'Владимировна'),
+               ('Олегович', 'Олеговна'), ('Павлович', 'Павловна'), ('Викторович', 'Викторовна')]
+COMPLAINTS = ['Головная боль', 'Кашель', 'Температура', 'Насморк', 'Красное горло', 'Озноб',
+              'Головокружение', 'Слабость', 'Боль в спине', 'Боль в суставах', 'Тошнота', 'Бессонница']
+HISTORIES = ['Ранее ничем не болел', 'Ранее болел ОРВИ', 'Ранее болел ангиной', 'Ранее болел простой простудой',
+             'Ранее болел ОРВИ и простой простудой', 'Хронический бронхит', 'Гипертония',
+             'Аллергия на пенициллин', 'Сахарный диабет 2 типа', 'Перенес пневмонию']
+TREATMENT_PLANS = ['', '', '', 'Постельный режим, обильное питье', 'Контроль давления дважды в день',
+                   'Повторный осмотр через неделю', 'Физиотерапия, 10 сеансов', 'Анализ крови, повторный прием']
+MEDICATIONS = [
+    ('Парацетамол', 'По 1 таблетке 3 раза в день после еды'),
+    ('Амоксиклав', 'По 1 таблетке 2 раза в день 7 дней'),
+    ('Ибупрофен', 'По 1 таблетке при температуре'),
+    ('Тантум Верде', 'По 1 впрыскиванию 3 раза в день'),
+    ('Називин', 'По 1 впрыскиванию в каждую ноздрю 2 раза в день'),
+    ('Арбидол', 'По 2 капсулы 4 раза в день'),
+    ('Стрепсилс', 'По 1 таблетке каждые 2-3 часа'),
+    ('Лизиноприл', 'По 1 таблетке утром'),
+    ('Метформин', 'По 1 таблетке 2 раза в день во время еды'),
+    ('Омепразол', 'По 1 капсуле утром натощак'),
+    ('Цетиризин', 'По 1 таблетке вечером'),
+    ('Амброксол', 'По 1 таблетке 3 раза в день'),
+]
+
+# Рабочие часы: прием начинается не раньше 8:00 и заканчивается не позже 20:00
+WORK_START_MINUTE = 8 * 60
+WORK_END_MINUTE = 20 * 60
+
+
+def female_surname(surname):
+    return surname + 'а'
+
+
+def doctor_weights(doctors, skew):
+    """Веса врачей по закону Ципфа: первые врачи получают непропорционально много пациентов"""
+    return [1 / (rank ** skew) for rank in range(1, doctors + 1)]
+
+
+def working_days(start, days):
+    """Рабочие дни (пн-пт) в диапазоне [start, start + days)"""
+    return [start + timedelta(days=offset) for offset in range(days)
+            if (start + timedelta(days=offset)).weekday() < 5]
+
+
+def slot_times(slot_minutes, duration=None):
+    """Время начала слотов рабочего дня с шагом slot_minutes: прием длительностью duration
+    (по умолчанию - один слот) заканчивается не позже конца рабочего дня"""
+    duration = slot_minutes if duration is None else duration
+    return [f'{minute // 60:02d}:{minute % 60:02d}'
+            for minute in range(WORK_START_MINUTE, WORK_END_MINUTE - duration + 1, slot_minutes)]
+
+
+class DataGenerator:
+    """Воспроизводимая генерация данных для схемы main.py: одинаковый seed дает одинаковую базу"""
+
+    def __init__(self, seed=42, doctors=50, patients=100000, appointments=30000,
+                 medications_per_patient=3.0, taken_share=0.6, confirmed_share=0.7, skew=1.1,
+                 start=date(2025, 1, 1), days=365, slot_minutes=5):
+        self.random = random.Random(seed)
+        self.doctors = doctors
+        self.patients = patients
+        self.appointments = appointments
+        self.medications = round(patients * medications_per_patient)
+        self.taken_share = taken_share
+        self.confirmed_share = confirmed_share
+        self.skew = skew
+        self.days = working_days(start, days)
+        self.slot_minutes = slot_minutes
+        self.times = slot_times(slot_minutes)
+
+        # У каждого врача свое расписание: слоты выбираются без повторов в расписании врача,
+        # поэтому у врача приемов не больше, чем слотов (проверяется и для каждого врача при генерации)
+        self.slots_per_doctor = len(self.days) * len(self.times)
+        # Врач каждого пациента (по порядку patient_id); заполняется в patient_rows
+        self.patient_doctor_ids = None
+        if appointments > self.slots_per_doctor * doctors:
+            raise ValueError(f"Приемов {appointments} больше, чем слотов в рабочие дни у всех врачей: "
+                             f"{self.slots_per_doctor * doctors}. Увеличьте --days или уменьшите --slot-minutes")
+        if doctors < 1:
+            raise ValueError("Нужен хотя бы один врач")
+
+    def doctor_rows(self):
+        """Врачи: ID с 1, пароль - ID, записанный дважды (у врача 7 пароль 77)"""
+        rnd = self.random
+        for doctor_id in range(1, self.doctors + 1):
+            patronymic = rnd.choice(PATRONYMICS)
+            if rnd.random() < 0.5:
+                yield (doctor_id, rnd.choice(SURNAMES), rnd.choice(MALE_NAMES), patronymic[0],
+                       str(doctor_id) * 2)
+            else:
+                yield (doctor_id, female_surname(rnd.choice(SURNAMES)), rnd.choice(FEMALE_NAMES), patronymic[1],
+                       str(doctor_id) * 2)
+
+    def patient_rows(self):
+        """Пациенты: столбцы генерируются целиком через choices, а не по одному значению"""
+        rnd = self.random
+        n = self.patients
+        female = [value < 0.52 for value in (rnd.random() for _ in range(n))]
+        surnames = rnd.choices(SURNAMES, k=n)
+        male_names = rnd.choices(MALE_NAMES, k=n)
+        female_names = rnd.choices(FEMALE_NAMES, k=n)
+        patronymics = rnd.choices(PATRONYMICS, k=n)
+        cum_weights = list(accumulate(doctor_weights(self.doctors, self.skew)))
+        doctor_ids = rnd.choices(range(1, self.doctors + 1), cum_weights=cum_weights, k=n)
+        self.patient_doctor_ids = doctor_ids
+
+        for i in range(n):
+            if female[i]:
+                yield (i + 1, female_surname(surnames[i]), female_names[i], patronymics[i][1], doctor_ids[i])
+            else:
+                yield (i + 1, surnames[i], male_names[i], patronymics[i][0], doctor_ids[i])
+
+    def medical_card_rows(self):
+        rnd = self.random
+        n = self.patients
+        first = rnd.choices(COMPLAINTS, k=n)
+        second = rnd.choices(COMPLAINTS, k=n)
+        histories = rnd.choices(HISTORIES, k=n)
+        plans = rnd.choices(TREATMENT_PLANS, k=n)
+        for i in range(n):
+            complaints = first[i] if first[i] == second[i] else f'{first[i]}, {second[i].lower()}'
+            yield (i + 1, complaints, histories[i], plans[i])
+
+    def appointment_rows(self):
+        """Приемы (после patient_rows): пациенты - случайные, слоты выбираются без повторов в расписании
+        врача пациента, поэтому в одно время идут приемы у разных врачей. Прием длится один слот,
+        и записи врача не пересекаются; строки идут по времени"""
+        rnd = self.random
+        per_day = len(self.times)
+        patient_ids = rnd.choices(range(1, self.patients + 1), k=self.appointments)
+        by_doctor = {}
+        for patient_id in patient_ids:
+            by_doctor.setdefault(self.patient_doctor_ids[patient_id - 1], []).append(patient_id)
+        booked = []
+        for doctor_id in sorted(by_doctor):
+            doctor_patients = by_doctor[doctor_id]
+            if len(doctor_patients) > self.slots_per_doctor:
+                raise ValueError(f"У врача {doctor_id} приемов {len(doctor_patients)} больше, чем слотов "
+                                 f"в рабочие дни: {self.slots_per_doctor}. Увеличьте --days, уменьшите "
+                                 f"--slot-minutes или --skew")
+            booked.extend(zip(rnd.sample(range(self.slots_per_doctor), len(doctor_patients)), doctor_patients))
+        booked.sort()
+        confirmed = [value < self.confirmed_share for value in (rnd.random() for _ in range(self.appointments))]
+        day_names = [day.isoformat() for day in self.days]
+        for i, (slot, patient_id) in enumerate(booked):
+            day, time_index = divmod(slot, per_day)
+            yield (patient_id, day_names[day], self.times[time_index], self.slot_minutes, int(confirmed[i]))
+
+    def medication_rows(self):
+        """Препараты: случайным пациентам, в порядке patient_id (как назначения в карте)"""
+        rnd = self.random
+        patient_ids = sorted(rnd.choices(range(1, self.patients + 1), k=self.medications))
+        medications = rnd.choices(MEDICATIONS, k=self.medications)
+        taken = [value < self.taken_share for value in (rnd.random() for _ in range(self.medications))]
+        for i in range(self.medications):
+            yield (patient_ids[i], medications[i][0], medications[i][1], int(taken[i]))
+
+    def populate(self, conn):
+        """Заполняет пустую базу. Возвращает число строк по таблицам"""
+        conn.execute('BEGIN')
+        try:
+            conn.executemany('INSERT INTO administrators (admin_id, username, password) VALUES (?, ?, ?)',
+                             [(1, 'admin', '123123')])
+            conn.executemany('''
+                INSERT INTO doctors (doctor_id, surname, name, patronymic, password)
+                VALUES (?, ?, ?, ?, ?)
+            ''', self.doctor_rows())
+            conn.executemany('''
+                INSERT INTO patients (patient_id, surname, name, patronymic, doctor_id)
+                VALUES (?, ?, ?, ?, ?)
+            ''', self.patient_rows())
+            conn.executemany('''
+                INSERT INTO medical_cards (patient_id, health_complaints, medical_history, treatment_plan)
+                VALUES (?, ?, ?, ?)
+            ''', self.medical_card_rows())
+            conn.executemany('''
+                INSERT INTO appointments (patient_id, doctor_id, appointment_date, appointment_time,
+                                          duration_minutes, confirmed)
+                VALUES (?1, (SELECT doctor_id FROM patients WHERE patient_id = ?1), ?2, ?3, ?4, ?5)
+            ''', self.appointment_rows())
+            conn.executemany('''
+                INSERT INTO medications (patient_id, medication_name, usage_description, is_taken)
+                VALUES (?, ?, ?, ?)
+            ''', self.medication_rows())
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return {table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                for table in ('doctors', 'patients', 'medical_cards', 'appointments', 'medications')}
+
+
+def generate_database(db_path, generator, profile='bulk-load'):
+    """Создает новую базу со схемой main.py и заполняет ее генератором"""
+    if os.path.exists(db_path):
+        raise FileExistsError(f"База {db_path} уже существует")
+    db_dir = os.path.dirname(db_path)
+    if db_dir:
+        os.makedirs(db_dir, exist_ok=True)
+
+    conn = connect(db_path, profile)
+    try:
+        migrate(conn)
+        # Полнотекстовый индекс медкарт строится один раз после заполнения, а не триггером на каждую строку
+        with deferred_search_index(conn):
+            return generator.populate(conn)
+    finally:
+        conn.close()
+
+
+def main():
+    """Генерация воспроизводимой синтетической базы больницы"""
+    parser = argparse.ArgumentParser(description="Генерация синтетической базы больницы")
+    parser.add_argument('--db', default='../database/hospital.db')
+    parser.add_argument('--force', action='store_true', help="удалить существующую базу")
+    parser.add_argument('--seed', type=int, default=42, help="зерно генератора случайных чисел")
+    parser.add_argument('--doctors', type=int, default=50)
+    parser.add_argument('--patients', type=int, default=100000)
+    parser.add_argument('--appointments', type=int, default=30000,
+                        help="приемов; у каждого врача не больше числа слотов: рабочих дней в --days "
+                             "на слотов в дне")
+    parser.add_argument('--medications', type=float, default=3.0, help="препаратов на пациента в среднем")
+    parser.add_argument('--taken', type=float, default=0.6, help="доля принятых препаратов")
+    parser.add_argument('--confirmed', type=float, default=0.7, help="доля подтвержденных приемов")
+    parser.add_argument('--skew', type=float, default=1.1,
+                        help="перекос нагрузки врачей (показатель закона Ципфа, 0 - равномерно)")
+    parser.add_argument('--start', type=date.fromisoformat, default=date(2025, 1, 1), help="первый день приемов")
+    parser.add_argument('--days', type=int, default=365, help="число календарных дней с приемами")
+    parser.add_argument('--slot-minutes', type=int, default=5, help="шаг слотов приема в минутах")
+    args = parser.parse_args()
+
+    try:
+        generator = DataGenerator(args.seed, args.doctors, args.patients, args.appointments, args.medications,
+                                  args.taken, args.confirmed, args.skew, args.start, args.days,
+                                  args.slot_minutes)
+        if args.force:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(args.db + suffix):
+                    os.remove(args.db + suffix)
+        started = time.perf_counter()
+        counts = generate_database(args.db, generator)
+    except (OSError, ValueError, MigrationError) as e:
+        print(f"Ошибка генерации: {e}")
+        sys.exit(1)
+    elapsed = time.perf_counter() - started
+
+    rows = sum(counts.values())
+    print(f"База {args.db} создана за {elapsed:.1f} с ({rows / elapsed:.0f} строк/с):")
+    for table, count in counts.items():
+        print(f"  {table}: {count}")
+    print("Администратор: admin / 123123, пароль врача - его ID, записанный дважды (врач 1: 11)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,497 @@
+import argparse
+import asyncio
+import json
+import re
+import secrets
+import sqlite3
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qsl, urlsplit
+
+from main import (FREE_SLOTS_SHOWN, HospitalSystem, check_appointment_date, check_appointment_duration,
+                  check_appointment_end, check_appointment_time)
+from read_cache import DEFAULT_CACHE_SIZE
+from slot_index import DEFAULT_DURATION, SlotBusy, day_key
+from storage_profiles import DEFAULT_PROFILE, STORAGE_PROFILES
+
+# Ограничения запроса: заголовки и тело больше этого размера отклоняются
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 64 * 1024
+
+# Рабочих потоков для запросов к базе; у каждого потока свое соединение из пула
+DEFAULT_WORKERS = 8
+
+# Сессия истекает, если ей не пользовались столько секунд; просроченные сессии
+# удаляются при обращении к ним и при входе (не чаще раза в SESSION_SWEEP_INTERVAL)
+SESSION_TTL = 30 * 60
+SESSION_SWEEP_INTERVAL = 60
+
+
+class HttpError(Exception):
+    """Ошибка запроса: HTTP-статус и сообщение для клиента"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Session:
+    __slots__ = ('token', 'role', 'user_id', 'expires_at')
+
+    def __init__(self, token, role, user_id, expires_at):
+        self.token = token
+        self.role = role
+        self.user_id = user_id
+        self.expires_at = expires_at
+
+
+def route(method, pattern, role=None):
+    """Помечает метод HospitalService как обработчик запроса; role - кому доступен (None - всем)"""
+    def decorator(handler):
+        handler.route = (method, re.compile(f'^{pattern}$'), role)
+        return handler
+    return decorator
+
+
+def _field(body, name, kind=str):
+    value = body.get(name)
+    if not isinstance(value, kind) or isinstance(value, bool):
+        raise HttpError(HTTPStatus.BAD_REQUEST, f"Поле {name} обязательно")
+    return value
+
+
+class HospitalService:
+    """Операции врача, пациента и администратора в виде JSON-обработчиков.
+    Данные - через репозитории HospitalSystem, те же, что у меню"""
+
+    def __init__(self, system, session_ttl=SESSION_TTL):
+        self.system = system
+        self.session_ttl = session_ttl
+        self.sessions = {}
+        self._sessions_lock = threading.Lock()
+        self._next_sweep = time.monotonic() + SESSION_SWEEP_INTERVAL
+        self.routes = [getattr(self, name).route + (getattr(self, name),)
+                       for name in dir(type(self)) if hasattr(getattr(type(self), name), 'route')]
+
+    def dispatch(self, method, target, headers, body):
+        """Выполняет запрос (в рабочем потоке). Возвращает (статус, данные для JSON)"""
+        try:
+            url = urlsplit(target)
+            path = url.path.rstrip('/') or '/'
+            allowed = False
+            for route_method, pattern, role, handler in self.routes:
+                match = pattern.match(path)
+                if not match:
+                    continue
+                if route_method != method:
+                    allowed = True
+                    continue
+                session = self._session(headers, role)
+                if method in ('POST', 'PUT'):
+                    payload = self._parse_body(body)
+                else:
+                    # Параметры GET-запроса передаются обработчику так же, как тело POST
+                    payload = dict(parse_qsl(url.query))
+                return handler(session, payload, *match.groups())
+            if allowed:
+                raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED, "Метод не поддерживается")
+            raise HttpError(HTTPStatus.NOT_FOUND, "Неизвестный адрес")
+        except HttpError as e:
+            return e.status, {'error': e.message}
+        except sqlite3.Error as e:
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {'error': f"Ошибка базы данных: {e}"}
+        except Exception:
+            # Ошибка в обработчике - ответ 500, а не оборванное соединение; подробности - в журнал сервиса
+            traceback.print_exc()
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {'error': "Внутренняя ошибка сервиса"}
+
+    @staticmethod
+    def _parse_body(body):
+        if not body:
+            return {}
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Тело запроса не является JSON") from None
+        if not isinstance(payload, dict):
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Тело запроса должно быть объектом JSON")
+        return payload
+
+    def _session(self, headers, role):
+        if role is None:
+            return None
+        authorization = headers.get('authorization', '')
+        token = authorization[7:] if authorization.startswith('Bearer ') else ''
+        session = self.sessions.get(token)
+        if session is None:
+            raise HttpError(HTTPStatus.UNAUTHORIZED, "Требуется вход")
+        now = time.monotonic()
+        if session.expires_at <= now:
+            with self._sessions_lock:
+                self.sessions.pop(token, None)
+            raise HttpError(HTTPStatus.UNAUTHORIZED, "Сессия истекла, требуется вход")
+        session.expires_at = now + self.session_ttl
+        if role != 'any' and session.role != role:
+            raise HttpError(HTTPStatus.FORBIDDEN, "Нет доступа")
+        return session
+
+    def _login(self, role, user_id):
+        token = secrets.token_urlsafe(24)
+        now = time.monotonic()
+        with self._sessions_lock:
+            if now >= self._next_sweep:
+                # Сессии, к которым больше не обращаются, иначе копились бы бесконечно
+                for expired in [key for key, session in self.sessions.items() if session.expires_at <= now]:
+                    del self.sessions[expired]
+                self._next_sweep = now + SESSION_SWEEP_INTERVAL
+            self.sessions[token] = Session(token, role, user_id, now + self.session_ttl)
+        return token
+
+    def _check_patient_access(self, session, patient_id):
+        """Врач видит только своих пациентов, пациент - только себя, администратор - всех"""
+        if session.role == 'admin':
+            if not self.system.patients.exists(patient_id):
+                raise HttpError(HTTPStatus.NOT_FOUND, "Пациент не найден!")
+            return
+        if session.role == 'patient':
+            if patient_id != session.user_id:
+                raise HttpError(HTTPStatus.FORBIDDEN, "Нет доступа")
+            return
+        patient = self.system.patients.get(patient_id)
+        if not patient or patient.doctor_id != session.user_id:
+            raise HttpError(HTTPStatus.FORBIDDEN, "Это не ваш пациент!")
+
+    # Вход и выход
+
+    @route('POST', '/login/doctor')
+    def doctor_login(self, session, body):
+        doctor = self.system.doctors.get(_field(body, 'doctor_id', int))
+        if not doctor:
+            raise HttpError(HTTPStatus.NOT_FOUND, "Врач с таким ID не найден!")
+        if _field(body, 'password') != doctor.password:
+            raise HttpError(HTTPStatus.UNAUTHORIZED, "Неверный пароль!")
+        token = self._login('doctor', doctor.doctor_id)
+        return HTTPStatus.OK, {'token': token,
+                               'doctor': doctor.as_dict('doctor_id', 'surname', 'name', 'patronymic')}
+
+    @route('POST', '/login/patient')
+    def patient_login(self, session, body):
+        patient = self.system.patients.get(_field(body, 'patient_id', int))
+        if not patient:
+            raise HttpError(HTTPStatus.NOT_FOUND, "Пациент с таким ID не найден!")
+        return HTTPStatus.OK, {'token': self._login('patient', patient.patient_id), 'patient': patient.as_dict()}
+
+    @route('POST', '/login/admin')
+    def admin_login(self, session, body):
+        admin = self.system.administrators.authenticate(_field(body, 'username'), _field(body, 'password'))
+        if not admin:
+            raise HttpError(HTTPStatus.UNAUTHORIZED, "Неверные учетные данные!")
+        return HTTPStatus.OK, {'token': self._login('admin', admin.admin_id)}
+
+    @route('POST', '/logout', 'any')
+    def logout(self, session, body):
+        with self._sessions_lock:
+            self.sessions.pop(session.token, None)
+        return HTTPStatus.OK, {}
+
+    @route('GET', '/doctors')
+    def doctors_list(self, session, body):
+        return HTTPStatus.OK, {'doctors': [doctor.as_dict('doctor_id', 'surname', 'name', 'patronymic')
+                                           for doctor in self.system.doctors.list()]}
+
+    # Врач
+
+    @route('GET', '/doctor/patients', 'doctor')
+    def doctor_patients(self, session, body):
+        return HTTPStatus.OK, {'patients': [entry.as_dict()
+                                            for entry in self.system.patients.doctor_roster(session.user_id)]}
+
+    @route('GET', '/doctor/search', 'doctor')
+    def search_cards(self, session, body):
+        """Поиск по медкартам своих пациентов: ?q=слова&limit=20"""
+        try:
+            limit = int(body.get('limit', 20))
+        except ValueError:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Поле limit должно быть числом") from None
+        # От 1 до 100: LIMIT -1 в SQLite означает "без ограничения"
+        limit = max(1, min(limit, 100))
+        results = self.system.medical_cards.search(session.user_id, _field(body, 'q'), limit)
+        return HTTPStatus.OK, {'results': [result.as_dict() for result in results]}
+
+    @route('GET', r'/patients/(\d+)/card', 'any')
+    def medical_card(self, session, body, patient_id):
+        patient_id = int(patient_id)
+        self._check_patient_access(session, patient_id)
+        card = self.system.medical_cards.get(patient_id)
+        if not card:
+            raise HttpError(HTTPStatus.NOT_FOUND, "Медкарта пациента не найдена!")
+        return HTTPStatus.OK, {
+            'card': card.as_dict(),
+            'medications': [med.as_dict() for med in self.system.medications.for_patient(patient_id)],
+            'appointments': [app.as_dict() for app in self.system.appointments.for_patient(patient_id)],
+        }
+
+    @route('PUT', r'/patients/(\d+)/card', 'doctor')
+    def update_medical_card(self, session, body, patient_id):
+        """Жалобы, история болезни и план лечения; меняются только переданные поля"""
+        patient_id = int(patient_id)
+        self._check_patient_access(session, patient_id)
+        names = ('health_complaints', 'medical_history', 'treatment_plan')
+        # Все поля проверяются до записи: ошибка в одном не оставляет медкарту измененной наполовину
+        values = {name: _field(body, name) for name in names if name in body}
+        if not values:
+            raise HttpError(HTTPStatus.BAD_REQUEST, f"Нужно хотя бы одно поле: {', '.join(names)}")
+        if not self.system.medical_cards.update(patient_id, **values):
+            raise HttpError(HTTPStatus.NOT_FOUND, "Медкарта пациента не найдена!")
+        return HTTPStatus.OK, {'updated': list(values)}
+
+    @route('GET', r'/patients/(\d+)/medications', 'any')
+    def patient_medications(self, session, body, patient_id):
+        patient_id = int(patient_id)
+        self._check_patient_access(session, patient_id)
+        return HTTPStatus.OK, {'medications': [med.as_dict()
+                                               for med in self.system.medications.for_patient(patient_id)]}
+
+    @route('POST', r'/patients/(\d+)/medications', 'doctor')
+    def prescribe(self, session, body, patient_id):
+        patient_id = int(patient_id)
+        self._check_patient_access(session, patient_id)
+        self.system.medications.add(patient_id, _field(body, 'medication_name'),
+                                    body.get('usage_description', ''))
+        return HTTPStatus.CREATED, {}
+
+    # Пациент
+
+    @route('POST', r'/medications/(\d+)/taken', 'patient')
+    def mark_taken(self, session, body, medication_id):
+        if not self.system.medications.mark_taken(int(medication_id), session.user_id):
+            raise HttpError(HTTPStatus.NOT_FOUND, "Препарат не найден!")
+        return HTTPStatus.OK, {}
+
+    @route('GET', r'/patients/(\d+)/appointments', 'any')
+    def patient_appointments(self, session, body, patient_id):
+        patient_id = int(patient_id)
+        self._check_patient_access(session, patient_id)
+        return HTTPStatus.OK, {'appointments': [app.as_dict()
+                                                for app in self.system.appointments.for_patient(patient_id)]}
+
+    # Администратор
+
+    @route('GET', '/patients', 'admin')
+    def all_patients(self, session, body):
+        return HTTPStatus.OK, {'patients': [patient.as_dict() for patient in self.system.patients.all_with_doctors()]}
+
+    @route('POST', '/appointments', 'admin')
+    def schedule(self, session, body):
+        patient_id = _field(body, 'patient_id', int)
+        date = _field(body, 'date')
+        time_str = _field(body, 'time')
+        duration = body.get('duration_minutes', DEFAULT_DURATION)
+        if type(duration) is not int:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Поле duration_minutes должно быть числом")
+        patient = self.system.patients.get(patient_id)
+        if not patient:
+            raise HttpError(HTTPStatus.NOT_FOUND, "Пациент не найден!")
+        if patient.doctor_id is None:
+            raise HttpError(HTTPStatus.CONFLICT, "Пациенту не назначен врач!")
+        error = (check_appointment_date(date) or check_appointment_time(time_str) or check_appointment_duration(duration)
+                 or check_appointment_end(time_str, duration))
+        if error:
+            raise HttpError(HTTPStatus.BAD_REQUEST, error)
+        try:
+            appointment_id = self.system.appointments.add(patient_id, patient.doctor_id, date, time_str, duration)
+        except sqlite3.IntegrityError:
+            raise HttpError(HTTPStatus.CONFLICT, "Это время уже занято! Выберите другое время.") from None
+        except SlotBusy as e:
+            raise HttpError(HTTPStatus.SERVICE_UNAVAILABLE, str(e)) from None
+        return HTTPStatus.CREATED, {'appointment_id': appointment_id, 'doctor_id': patient.doctor_id}
+
+    @route('GET', '/appointments/free', 'admin')
+    def free_slots(self, session, body):
+        """Свободное время врача: ?doctor_id=1&from=ГГГГ-ММ-ДД&to=ГГГГ-ММ-ДД&duration=15&limit=10.
+        Без to - ближайшее свободное время до конца года (limit, по умолчанию 10), с to - все за период"""
+        try:
+            doctor_id = int(_field(body, 'doctor_id'))
+        except ValueError:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Поле doctor_id должно быть числом") from None
+        if not self.system.doctors.get(doctor_id):
+            raise HttpError(HTTPStatus.NOT_FOUND, "Врач не найден!")
+        first_date = _field(body, 'from')
+        last_date = body.get('to') or f'{first_date[:4]}-12-31'
+        try:
+            duration = int(body.get('duration', DEFAULT_DURATION))
+            limit = int(body['limit']) if 'limit' in body else (None if 'to' in body else FREE_SLOTS_SHOWN)
+        except ValueError:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Поля duration и limit должны быть числами") from None
+        error = (check_appointment_date(first_date) or check_appointment_date(last_date)
+                 or check_appointment_duration(duration))
+        if error:
+            raise HttpError(HTTPStatus.BAD_REQUEST, error)
+        slots = self.system.appointments.free_slots(doctor_id, first_date, last_date, duration, limit)
+        return HTTPStatus.OK, {'slots': [{'date': day, 'time': start} for day, start in slots]}
+
+    @route('GET', '/appointments/unconfirmed', 'admin')
+    def unconfirmed(self, session, body):
+        return HTTPStatus.OK, {'appointments': [app.as_dict() for app in self.system.appointments.unconfirmed()]}
+
+    @route('GET', '/stats', 'admin')
+    def stats(self, session, body):
+        return HTTPStatus.OK, {'cache': self.system.cache.stats() if self.system.cache is not None else None,
+                               'sessions': len(self.sessions)}
+
+    @route('POST', '/appointments/confirm', 'admin')
+    def confirm_batch(self, session, body):
+        """Подтверждение пачкой одним запросом: {"ids": [1, 2, 3]} или
+        {"from": "ГГГГ-ММ-ДД", "to": "ГГГГ-ММ-ДД", "doctor_id": 111} (to и doctor_id - необязательно)"""
+        if 'ids' in body:
+            ids = body['ids']
+            if not isinstance(ids, list) or not all(type(value) is int for value in ids):
+                raise HttpError(HTTPStatus.BAD_REQUEST, "Поле ids должно быть списком чисел")
+            return HTTPStatus.OK, {'confirmed': self.system.appointments.confirm_ids(ids)}
+        first_date = _field(body, 'from')
+        last_date = body.get('to', first_date)
+        if not isinstance(last_date, str):
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Поле to должно быть датой ГГГГ-ММ-ДД")
+        doctor_id = body.get('doctor_id')
+        if doctor_id is not None and type(doctor_id) is not int:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Поле doctor_id должно быть числом")
+        error = check_appointment_date(first_date) or check_appointment_date(last_date)
+        if error:
+            raise HttpError(HTTPStatus.BAD_REQUEST, error)
+        if doctor_id is not None and not self.system.doctors.get(doctor_id):
+            raise HttpError(HTTPStatus.NOT_FOUND, "Врач не найден!")
+        confirmed = self.system.appointments.confirm_period(day_key(first_date), day_key(last_date), doctor_id)
+        return HTTPStatus.OK, {'confirmed': confirmed}
+
+    @route('POST', r'/appointments/(\d+)/confirm', 'admin')
+    def confirm(self, session, body, appointment_id):
+        if not self.system.appointments.confirm(int(appointment_id)):
+            raise HttpError(HTTPStatus.NOT_FOUND, "Запись не найдена!")
+        return HTTPStatus.OK, {}
+
+
+class HttpServer:
+    """HTTP/1.1 с keep-alive на asyncio: соединения обслуживает цикл событий,
+    обработчики с запросами к базе выполняются в ограниченном пуле потоков"""
+
+    def __init__(self, service, workers=DEFAULT_WORKERS):
+        self.service = service
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='hospital-db')
+
+    async def handle_client(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except asyncio.IncompleteReadError:
+                    break
+                except asyncio.LimitOverrunError:
+                    await self._respond(writer, HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE,
+                                        {'error': "Слишком большие заголовки"}, False)
+                    break
+
+                try:
+                    method, target, version, headers = self._parse_head(head)
+                    length = int(headers.get('content-length', 0))
+                    if length < 0:
+                        raise ValueError(f"Content-Length: {length}")
+                except ValueError:
+                    await self._respond(writer, HTTPStatus.BAD_REQUEST, {'error': "Некорректный запрос"}, False)
+                    break
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                                        {'error': "Слишком большое тело запроса"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                status, payload = await loop.run_in_executor(self.executor, self.service.dispatch,
+                                                             method, target, headers, body)
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception:
+            # Сбой разбора или ответа: клиент получает 500, ошибка - в журнал сервиса
+            traceback.print_exc()
+            try:
+                await self._respond(writer, HTTPStatus.INTERNAL_SERVER_ERROR,
+                                    {'error': "Внутренняя ошибка сервиса"}, False)
+            except Exception:
+                pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _parse_head(head):
+        lines = head.decode('latin-1').split('\r\n')
+        method, target, version = lines[0].split(' ')
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+        return method, target, version, headers
+
+    @staticmethod
+    async def _respond(writer, status, payload, keep_alive):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        writer.write(f'HTTP/1.1 {status.value} {status.phrase}\r\n'
+                     f'Content-Type: application/json; charset=utf-8\r\n'
+                     f'Content-Length: {len(body)}\r\n'
+                     f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'.encode('latin-1') + body)
+        await writer.drain()
+
+    async def serve(self, host, port, started=None):
+        """Принимает соединения до отмены; started(host, port) вызывается после запуска"""
+        server = await asyncio.start_server(self.handle_client, host, port,
+                                            limit=MAX_HEADER_BYTES, backlog=1024)
+        host, port = server.sockets[0].getsockname()[:2]
+        if started:
+            started(host, port)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
+def main():
+    """HTTP/JSON-сервис системы больницы"""
+    parser = argparse.ArgumentParser(description="HTTP/JSON-сервис системы больницы")
+    parser.add_argument('--db', default='../database/hospital.db')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080, help="0 - любой свободный порт")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="потоков для запросов к базе")
+    parser.add_argument('--profile', choices=sorted(STORAGE_PROFILES), default=DEFAULT_PROFILE,
+                        help="профиль хранения SQLite")
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE,
+                        help="записей в кэше врачей и списков пациентов (0 - без кэша)")
+    parser.add_argument('--session-ttl', type=int, default=SESSION_TTL,
+                        help="через сколько секунд без запросов истекает сессия")
+    args = parser.parse_args()
+
+    system = HospitalSystem(args.db, args.profile, args.cache_size)
+    server = HttpServer(HospitalService(system, args.session_ttl), args.workers)
+
+    def started(host, port):
+        print(f"Сервис запущен: http://{host}:{port} (потоков для базы: {args.workers})", flush=True)
+
+    try:
+        asyncio.run(server.serve(args.host, args.port, started))
+    except KeyboardInterrupt:
+        print("Сервис остановлен")
+    finally:
+        server.close()
+        system.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,217 +1,197 @@
+import argparse
 import sqlite3
-import os
 from datetime import datetime, time
+from itertools import groupby
+
+from db_pool import ConnectionPool
+from migrations import LATEST_VERSION, MigrationError, current_version, migrate
+from read_cache import DEFAULT_CACHE_SIZE, ReadCache
+from repositories import (AdministratorRepository, AppointmentRepository, DoctorRepository,
+                          MedicalCardRepository, MedicationRepository, PatientRepository)
+from slot_index import DEFAULT_DURATION, SLOT_STEP, WORK_END, SlotIndex, day_key, format_minute, minute_of_day
+from storage_profiles import DEFAULT_PROFILE, STORAGE_PROFILES
+
+# Сколько ближайших свободных слотов показывать администратору
+FREE_SLOTS_SHOWN = 10
+
+
+def check_appointment_date(date):
+    """Проверка даты приема. Возвращает текст ошибки или None"""
+    try:
+        appointment_date = datetime.strptime(date, '%Y-%m-%d')
+    except ValueError:
+        return "Неверный формат даты!"
+    if appointment_date.year != 2025:
+        return "Год должен быть 2025!"
+    return None
+
+
+def check_appointment_time(time_str):
+    """Проверка времени приема: с 8:00 до 20:00. Возвращает текст ошибки или None"""
+    try:
+        appointment_time = datetime.strptime(time_str, '%H:%M').time()
+    except ValueError:
+        return "Неверный формат времени!"
+    if appointment_time < time(8, 0) or appointment_time > time(20, 0):
+        return "Время приема должно быть с 8:00 до 20:00!"
+    return None
+
+
+def check_appointment_duration(duration):
+    """Проверка длительности приема в минутах: от 5 до 240. Возвращает текст ошибки или None"""
+    try:
+        minutes = int(duration)
+    except (TypeError, ValueError):
+        return "Длительность должна быть числом минут!"
+    if minutes < 5 or minutes > 240:
+        return "Длительность приема должна быть от 5 до 240 минут!"
+    return None
+
+
+def check_appointment_end(time_str, duration):
+    """Проверка конца приема: начало (ЧЧ:ММ, уже проверенное) плюс длительность - не позже 20:00.
+    Возвращает текст ошибки или None"""
+    if minute_of_day(time_str) + int(duration) > WORK_END:
+        return f"Прием должен закончиться не позже {format_minute(WORK_END)}!"
+    return None
 
 
 class HospitalSystem:
-    def __init__(self):
-        self.db_path = "../database/hospital.db"
+    def __init__(self, db_path="../database/hospital.db", profile=DEFAULT_PROFILE, cache_size=DEFAULT_CACHE_SIZE):
+        self.db_path = db_path
+        self.pool = ConnectionPool(self.db_path, profile)
         self.current_doctor_id = None
         self.current_patient_id = None
         self.current_admin_id = None
+
+        # Кэш врачей и списков пациентов; 0 - без кэша
+        self.cache = ReadCache(cache_size) if cache_size else None
+
+        # Доступ к данным: все SQL-запросы системы - в repositories.py
+        self.doctors = DoctorRepository(self.get_connection, self.cache)
+        self.patients = PatientRepository(self.get_connection, self.cache)
+        self.medical_cards = MedicalCardRepository(self.get_connection, self.cache)
+        self.medications = MedicationRepository(self.get_connection, self.cache)
+        self.administrators = AdministratorRepository(self.get_connection, self.cache)
         self.initialize_database()
 
+        # Занятость расписания по дням в памяти: проверка пересечения записей без запроса к базе
+        self.slots = SlotIndex(self.db_path, profile)
+        self.appointments = AppointmentRepository(self.get_connection, self.cache, self.slots)
+
     def get_connection(self):
-        """Создает соединение с базой данных"""
+        """Соединение с базой данных из пула (одно долгоживущее соединение на поток).
+        close() у него возвращает соединение в пул, а не закрывает его"""
         try:
-            db_dir = os.path.dirname(self.db_path)
-            if not os.path.exists(db_dir):
-                os.makedirs(db_dir, exist_ok=True)
-            return sqlite3.connect(self.db_path)
+            return self.pool.connection()
         except Exception as e:
             print(f"Ошибка подключения к базе: {e}")
             return None
 
+    def close(self):
+        """Закрывает все соединения с базой данных"""
+        self.slots.close()
+        self.pool.close_all()
+
     def initialize_database(self):
-        """Инициализация базы данных с распределением пациентов"""
+        """Проверка базы при запуске: миграции применяются, только если схема устарела.
+        Время запуска не зависит от объема данных"""
         try:
             conn = self.get_connection()
-            cursor = conn.cursor()
-
-            # Создание таблицы врачей
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS doctors (
-                    doctor_id INTEGER PRIMARY KEY,
-                    surname TEXT NOT NULL,
-                    name TEXT NOT NULL,
-                    patronymic TEXT NOT NULL,
-                    password TEXT NOT NULL
-                )
-            ''')
-
-            # Создание таблицы пациентов
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS patients (
-                    patient_id INTEGER PRIMARY KEY,
-                    surname TEXT NOT NULL,
-                    name TEXT NOT NULL,
-                    patronymic TEXT NOT NULL,
-                    doctor_id INTEGER,
-                    FOREIGN KEY (doctor_id) REFERENCES doctors (doctor_id)
-                )
-            ''')
-
-            # Создание таблицы медицинских карт
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS medical_cards (
-                    patient_id INTEGER PRIMARY KEY,
-                    health_complaints TEXT,
-                    medical_history TEXT,
-                    treatment_plan TEXT,
-                    FOREIGN KEY (patient_id) REFERENCES patients (patient_id)
-                )
-            ''')
-
-            # Создание таблицы приемов
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS appointments (
-                    appointment_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    patient_id INTEGER NOT NULL,
-                    appointment_date TEXT NOT NULL,
-                    appointment_time TEXT NOT NULL,
-                    confirmed INTEGER DEFAULT 0,
-                    FOREIGN KEY (patient_id) REFERENCES patients (patient_id)
-                )
-            ''')
-
-            # Создание таблицы лекарств
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS medications (
-                    medication_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    patient_id INTEGER NOT NULL,
-                    medication_name TEXT NOT NULL,
-                    usage_description TEXT,
-                    is_taken INTEGER DEFAULT 0,
-                    FOREIGN KEY (patient_id) REFERENCES patients (patient_id)
-                )
-            ''')
-
-            # Создание таблицы администраторов
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS administrators (
-                    admin_id INTEGER PRIMARY KEY,
-                    username TEXT NOT NULL,
-                    password TEXT NOT NULL
-                )
-            ''')
-
-            # Очистка и добавление врачей
-            cursor.execute('DELETE FROM doctors')
-            doctors = [
-                (111, 'Антибиотиков', 'Андрей', 'Андреевич', '111222'),
-                (222, 'Вируснов', 'Виталий', 'Витальевич', '222111')
-            ]
-            cursor.executemany('''
-                INSERT INTO doctors (doctor_id, surname, name, patronymic, password)
-                VALUES (?, ?, ?, ?, ?)
-            ''', doctors)
-
-            # Очистка и добавление пациентов с распределением
-            cursor.execute('DELETE FROM patients')
-            patients = [
-                (1, 'Белкин', 'Дмитрий', 'Дмитриевич', 111),
-                (2, 'Волков', 'Андрей', 'Владимирович', 111),
-                (3, 'Котов', 'Владислав', 'Владиславович', 111),
-                (4, 'Медведев', 'Михаил', 'Михайлович', 222),
-                (5, 'Стрелкин', 'Николай', 'Николаевич', 222),
-                (6, 'Петров', 'Антон', 'Антонович', 222),
-                (7, 'Соколов', 'Олег', 'Олегович', 222)
-            ]
-            cursor.executemany('''
-                INSERT INTO patients (patient_id, surname, name, patronymic, doctor_id)
-                VALUES (?, ?, ?, ?, ?)
-            ''', patients)
-
-            # Очистка и добавление медицинских карт
-            cursor.execute('DELETE FROM medical_cards')
-            medical_cards = [
-                (1, 'Головная боль, кашель, температура', 'Ранее болел ОРВИ и простой простудой', ''),
-                (2, 'Кашель, высокая температура', 'Ранее болел простой простудой', ''),
-                (3, 'Озноб, головная боль, головокружение', 'Ранее болел ОРВИ', ''),
-                (4, 'Насморк, красное горло, кашель', 'Ранее болел ангиной', ''),
-                (5, 'Насморк, головная боль, головокружение', 'Ранее ничем не болел', ''),
-                (6, 'Кашель, озноб', 'Ранее болел простой простудой', ''),
-                (7, 'Кашель, насморк, головная боль, красное горло', 'Ранее болел ОРВИ и простой простудой', '')
-            ]
-            cursor.executemany('''
-                INSERT INTO medical_cards (patient_id, health_complaints, medical_history, treatment_plan)
-                VALUES (?, ?, ?, ?)
-            ''', medical_cards)
-
-            # Очистка и добавление приемов
-            cursor.execute('DELETE FROM appointments')
-            appointments = [
-                (1, '2025-01-15', '10:00', 1),
-                (2, '2025-01-16', '11:30', 1),
-                (4, '2025-01-18', '09:00', 1),
-                (6, '2025-01-20', '16:45', 1)
-            ]
-            cursor.executemany('''
-                INSERT INTO appointments (patient_id, appointment_date, appointment_time, confirmed)
-                VALUES (?, ?, ?, ?)
-            ''', appointments)
-
-            # Очистка и добавление препаратов (по одному на каждого пациента)
-            cursor.execute('DELETE FROM medications')
-            medications = [
-                (1, 'Парацетамол', 'По 1 таблетке 3 раза в день после еды', 1),
-                (2, 'Амоксиклав', 'По 1 таблетке 2 раза в день 7 дней', 0),
-                (3, 'Ибупрофен', 'По 1 таблетке при температуре', 0),
-                (4, 'Тантум Верде', 'По 1 впрыскиванию 3 раза в день', 1),
-                (5, 'Називин', 'По 1 впрыскиванию в каждую ноздрю 2 раза в день', 0),
-                (6, 'Арбидол', 'По 2 капсулы 4 раза в день', 0),
-                (7, 'Стрепсилс', 'По 1 таблетке каждые 2-3 часа', 0)
-            ]
-            cursor.executemany('''
-                INSERT INTO medications (patient_id, medication_name, usage_description, is_taken)
-                VALUES (?, ?, ?, ?)
-            ''', medications)
-
-            # Очистка и добавление администраторов
-            cursor.execute('DELETE FROM administrators')
-            admins = [
-                (1, 'admin', '123123')
-            ]
-            cursor.executemany('''
-                INSERT INTO administrators (admin_id, username, password)
-                VALUES (?, ?, ?)
-            ''', admins)
 
+            # Создание таблиц и индексов: недостающие миграции схемы
+            if current_version(conn) < LATEST_VERSION:
+                applied = migrate(conn)
+                print(f"Применены миграции схемы: {', '.join(map(str, applied))}")
+
+            conn.close()
+
+            if not self.administrators.any():
+                print("База данных пуста. Для демонстрационных данных запустите программу с ключом --seed")
+
+        except (sqlite3.Error, MigrationError) as e:
+            print(f"Ошибка инициализации базы данных: {e}")
+
+    def seed_demo_data(self):
+        """Заполнение базы демонстрационными данными с распределением пациентов.
+        Существующие данные удаляются"""
+        doctors = [
+            (111, 'Антибиотиков', 'Андрей', 'Андреевич', '111222'),
+            (222, 'Вируснов', 'Виталий', 'Витальевич', '222111')
+        ]
+        patients = [
+            (1, 'Белкин', 'Дмитрий', 'Дмитриевич', 111),
+            (2, 'Волков', 'Андрей', 'Владимирович', 111),
+            (3, 'Котов', 'Владислав', 'Владиславович', 111),
+            (4, 'Медведев', 'Михаил', 'Михайлович', 222),
+            (5, 'Стрелкин', 'Николай', 'Николаевич', 222),
+            (6, 'Петров', 'Антон', 'Антонович', 222),
+            (7, 'Соколов', 'Олег', 'Олегович', 222)
+        ]
+        medical_cards = [
+            (1, 'Головная боль, кашель, температура', 'Ранее болел ОРВИ и простой простудой', ''),
+            (2, 'Кашель, высокая температура', 'Ранее болел простой простудой', ''),
+            (3, 'Озноб, головная боль, головокружение', 'Ранее болел ОРВИ', ''),
+            (4, 'Насморк, красное горло, кашель', 'Ранее болел ангиной', ''),
+            (5, 'Насморк, головная боль, головокружение', 'Ранее ничем не болел', ''),
+            (6, 'Кашель, озноб', 'Ранее болел простой простудой', ''),
+            (7, 'Кашель, насморк, головная боль, красное горло', 'Ранее болел ОРВИ и простой простудой', '')
+        ]
+        appointments = [
+            (1, 111, '2025-01-15', '10:00', 1),
+            (2, 111, '2025-01-16', '11:30', 1),
+            (4, 222, '2025-01-18', '09:00', 1),
+            (6, 222, '2025-01-20', '16:45', 1)
+        ]
+        # По одному препарату на каждого пациента
+        medications = [
+            (1, 'Парацетамол', 'По 1 таблетке 3 раза в день после еды', 1),
+            (2, 'Амоксиклав', 'По 1 таблетке 2 раза в день 7 дней', 0),
+            (3, 'Ибупрофен', 'По 1 таблетке при температуре', 0),
+            (4, 'Тантум Верде', 'По 1 впрыскиванию 3 раза в день', 1),
+            (5, 'Називин', 'По 1 впрыскиванию в каждую ноздрю 2 раза в день', 0),
+            (6, 'Арбидол', 'По 2 капсулы 4 раза в день', 0),
+            (7, 'Стрепсилс', 'По 1 таблетке каждые 2-3 часа', 0)
+        ]
+        admins = [
+            (1, 'admin', '123123')
+        ]
+
+        try:
+            conn = self.get_connection()
+            # Очистка и заполнение всех таблиц одной транзакцией
+            for repository, rows in ((self.doctors, doctors), (self.patients, patients),
+                                     (self.medical_cards, medical_cards), (self.appointments, appointments),
+                                     (self.medications, medications), (self.administrators, admins)):
+                repository.replace_all(conn, rows)
             conn.commit()
             conn.close()
-            print("База данных инициализирована с распределением пациентов!")
+            if self.cache is not None:
+                self.cache.clear()
+            print("База данных заполнена демонстрационными данными с распределением пациентов!")
 
         except sqlite3.Error as e:
-            print(f"Ошибка инициализации базы данных: {e}")
+            print(f"Ошибка заполнения базы данных: {e}")
 
     def doctor_login(self):
         """Авторизация врача"""
         try:
             print("\nДоступные врачи:")
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.execute('SELECT doctor_id, surname, name, patronymic FROM doctors')
-            doctors = cursor.fetchall()
-            for doctor in doctors:
-                print(f"ID: {doctor[0]}, {doctor[1]} {doctor[2]} {doctor[3]}")
-            conn.close()
+            for doctor in self.doctors.list():
+                print(f"ID: {doctor.doctor_id}, {doctor.full_name}")
 
             doctor_id = input("\nВведите ID врача: ")
             password = input("Введите пароль: ")
 
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.execute('SELECT * FROM doctors WHERE doctor_id = ?', (doctor_id,))
-            doctor = cursor.fetchone()
-            conn.close()
+            doctor = self.doctors.get(doctor_id)
 
             if not doctor:
                 print("Врач с таким ID не найден!")
                 return False
 
-            if password == doctor[4]:
-                self.current_doctor_id = doctor[0]
-                print(f"Добро пожаловать, {doctor[1]} {doctor[2]} {doctor[3]}!")
+            if password == doctor.password:
+                self.current_doctor_id = doctor.doctor_id
+                print(f"Добро пожаловать, {doctor.full_name}!")
                 return True
             else:
                 print("Неверный пароль!")
@@ -229,7 +209,8 @@ class HospitalSystem:
             print("=" * 40)
             print("1. Посмотреть моих пациентов")
             print("2. Выбрать пациента для работы")
-            print("3. Выход")
+            print("3. Поиск по медкартам моих пациентов")
+            print("4. Выход")
 
             choice = input("Выберите действие: ")
 
@@ -238,6 +219,8 @@ class HospitalSystem:
             elif choice == '2':
                 self.work_with_patient()
             elif choice == '3':
+                self.search_medical_cards()
+            elif choice == '4':
                 self.current_doctor_id = None
                 break
             else:
@@ -246,39 +229,49 @@ class HospitalSystem:
     def show_doctor_patients(self):
         """Показывает пациентов текущего врача"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-
-            cursor.execute('''
-                SELECT p.patient_id, p.surname, p.name, p.patronymic, 
-                       a.appointment_date, a.appointment_time, a.confirmed
-                FROM patients p
-                LEFT JOIN appointments a ON p.patient_id = a.patient_id
-                WHERE p.doctor_id = ?
-                ORDER BY p.patient_id
-            ''', (self.current_doctor_id,))
-
-            patients = cursor.fetchall()
+            patients = self.patients.doctor_roster(self.current_doctor_id)
 
             print("\n" + "=" * 50)
             print("ВАШИ ПАЦИЕНТЫ:")
             print("=" * 50)
             if patients:
                 for patient in patients:
-                    status = "Подтверждена" if patient[6] else "Не подтверждена"
-                    appointment_info = f" - Запись: {patient[4]} {patient[5]} ({status})" if patient[
-                        4] else " - Нет записи"
-                    print(f"ID: {patient[0]}, {patient[1]} {patient[2]} {patient[3]}{appointment_info}")
+                    status = "Подтверждена" if patient.confirmed else "Не подтверждена"
+                    appointment_info = (f" - Запись: {patient.appointment_date} {patient.appointment_time} ({status})"
+                                        if patient.appointment_date else " - Нет записи")
+                    print(f"ID: {patient.patient_id}, {patient.surname} {patient.name} {patient.patronymic}"
+                          f"{appointment_info}")
             else:
                 print("У вас пока нет пациентов")
 
-            conn.close()
             return patients
 
         except sqlite3.Error as e:
             print(f"Ошибка базы данных: {e}")
             return []
 
+    def search_medical_cards(self):
+        """Поиск по жалобам, истории болезни и плану лечения пациентов текущего врача"""
+        try:
+            text = input("Введите слова для поиска (например: ангина): ")
+            results = self.medical_cards.search(self.current_doctor_id, text)
+
+            print("\n" + "=" * 50)
+            print("РЕЗУЛЬТАТЫ ПОИСКА:")
+            print("=" * 50)
+            if results:
+                for result in results:
+                    print(f"ID: {result.patient_id}, {result.surname} {result.name} {result.patronymic}")
+                    print(f"  {result.snippet}")
+            else:
+                print("Ничего не найдено")
+
+            return results
+
+        except sqlite3.Error as e:
+            print(f"Ошибка базы данных: {e}")
+            return []
+
     def work_with_patient(self):
         """Работа с конкретным пациентом"""
         patients = self.show_doctor_patients()
@@ -289,18 +282,11 @@ class HospitalSystem:
             patient_id = input("\nВведите ID пациента для работы: ")
 
             # Проверка, что пациент принадлежит врачу
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.execute('SELECT doctor_id FROM patients WHERE patient_id = ?', (patient_id,))
-            patient = cursor.fetchone()
-
-            if not patient or str(patient[0]) != str(self.current_doctor_id):
+            patient = self.patients.get(patient_id)
+            if not patient or str(patient.doctor_id) != str(self.current_doctor_id):
                 print("Это не ваш пациент!")
-                conn.close()
                 return
 
-            conn.close()
-
             while True:
                 print(f"\nРАБОТА С ПАЦИЕНТОМ ID: {patient_id}")
                 print("1. Записать жалобы на здоровье")
@@ -365,14 +351,7 @@ class HospitalSystem:
             medication_name = input("Введите название препарата: ")
             usage_description = input("Введите способ применения: ")
 
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO medications (patient_id, medication_name, usage_description)
-                VALUES (?, ?, ?)
-            ''', (patient_id, medication_name, usage_description))
-            conn.commit()
-            conn.close()
+            self.medications.add(patient_id, medication_name, usage_description)
 
             print("Препарат успешно добавлен!")
 
@@ -385,46 +364,27 @@ class HospitalSystem:
             # Показываем текущие препараты
             self.view_patient_medications(patient_id)
 
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.execute('SELECT medication_id FROM medications WHERE patient_id = ?', (patient_id,))
-            medications = cursor.fetchall()
-
-            if not medications:
+            if not self.medications.has_any(patient_id):
                 print("У пациента нет препаратов для изменения!")
-                conn.close()
                 return
 
             try:
                 medication_id = int(input("Введите ID препарата для изменения: "))
 
                 # Проверяем, что препарат принадлежит пациенту
-                cursor.execute('SELECT * FROM medications WHERE medication_id = ? AND patient_id = ?',
-                               (medication_id, patient_id))
-                medication = cursor.fetchone()
-
-                if not medication:
+                if not self.medications.get(medication_id, patient_id):
                     print("Препарат не найден или не принадлежит пациенту!")
-                    conn.close()
                     return
 
                 new_name = input("Введите новое название препарата: ")
                 new_usage = input("Введите новый способ применения: ")
 
-                cursor.execute('''
-                    UPDATE medications 
-                    SET medication_name = ?, usage_description = ?
-                    WHERE medication_id = ?
-                ''', (new_name, new_usage, medication_id))
-
-                conn.commit()
+                self.medications.update(medication_id, new_name, new_usage)
                 print("Препарат успешно изменен!")
 
             except ValueError:
                 print("Неверный ID препарата!")
 
-            conn.close()
-
         except sqlite3.Error as e:
             print(f"Ошибка базы данных: {e}")
 
@@ -434,39 +394,24 @@ class HospitalSystem:
             # Показываем текущие препараты
             self.view_patient_medications(patient_id)
 
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.execute('SELECT medication_id FROM medications WHERE patient_id = ?', (patient_id,))
-            medications = cursor.fetchall()
-
-            if not medications:
+            if not self.medications.has_any(patient_id):
                 print("У пациента нет препаратов для удаления!")
-                conn.close()
                 return
 
             try:
                 medication_id = int(input("Введите ID препарата для удаления: "))
 
                 # Проверяем, что препарат принадлежит пациенту
-                cursor.execute('SELECT * FROM medications WHERE medication_id = ? AND patient_id = ?',
-                               (medication_id, patient_id))
-                medication = cursor.fetchone()
-
-                if not medication:
+                if not self.medications.get(medication_id, patient_id):
                     print("Препарат не найден или не принадлежит пациенту!")
-                    conn.close()
                     return
 
-                cursor.execute('DELETE FROM medications WHERE medication_id = ?', (medication_id,))
-
-                conn.commit()
+                self.medications.delete(medication_id)
                 print("Препарат успешно удален!")
 
             except ValueError:
                 print("Неверный ID препарата!")
 
-            conn.close()
-
         except sqlite3.Error as e:
             print(f"Ошибка базы данных: {e}")
 
@@ -475,15 +420,7 @@ class HospitalSystem:
         try:
             complaints = input("Введите жалобы пациента: ")
 
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.execute('''
-                UPDATE medical_cards 
-                SET health_complaints = ?
-                WHERE patient_id = ?
-            ''', (complaints, patient_id))
-            conn.commit()
-            conn.close()
+            self.medical_cards.set_health_complaints(patient_id, complaints)
 
             print("Жалобы успешно записаны!")
 
@@ -495,16 +432,7 @@ class HospitalSystem:
         try:
             treatment_plan = input("Введите план лечения: ")
 
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.execute('''
-                UPDATE medical_cards 
-                SET treatment_plan = ?
-                WHERE patient_id = ?
-            ''', (treatment_plan, patient_id))
-
-            conn.commit()
-            conn.close()
+            self.medical_cards.set_treatment_plan(patient_id, treatment_plan)
             print("План лечения успешно назначен!")
 
         except sqlite3.Error as e:
@@ -515,15 +443,7 @@ class HospitalSystem:
         try:
             medical_history = input("Введите историю болезни: ")
 
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.execute('''
-                UPDATE medical_cards 
-                SET medical_history = ?
-                WHERE patient_id = ?
-            ''', (medical_history, patient_id))
-            conn.commit()
-            conn.close()
+            self.medical_cards.set_medical_history(patient_id, medical_history)
 
             print("История болезни успешно записана!")
 
@@ -533,16 +453,7 @@ class HospitalSystem:
     def view_patient_medications(self, patient_id):
         """Просмотр лекарств пациента"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-
-            cursor.execute('''
-                SELECT medication_id, medication_name, usage_description, is_taken
-                FROM medications 
-                WHERE patient_id = ?
-            ''', (patient_id,))
-
-            medications = cursor.fetchall()
+            medications = self.medications.for_patient(patient_id)
 
             print("\n" + "=" * 40)
             print("ЛЕКАРСТВА ПАЦИЕНТА:")
@@ -550,80 +461,54 @@ class HospitalSystem:
 
             if medications:
                 for med in medications:
-                    status = "Принято" if med[3] else "Не принято"
-                    print(f"ID препарата: {med[0]}")
-                    print(f"Лекарство: {med[1]}")
-                    print(f"Способ применения: {med[2]}")
+                    status = "Принято" if med.is_taken else "Не принято"
+                    print(f"ID препарата: {med.medication_id}")
+                    print(f"Лекарство: {med.medication_name}")
+                    print(f"Способ применения: {med.usage_description}")
                     print(f"Статус: {status}")
                     print("-" * 20)
             else:
                 print("Лекарства не назначены")
 
-            conn.close()
-
         except sqlite3.Error as e:
             print(f"Ошибка базы данных: {e}")
 
     def view_patient_medical_card(self, patient_id):
         """Просмотр медкарты пациента"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-
-            cursor.execute('''
-                SELECT p.surname, p.name, p.patronymic,
-                       mc.health_complaints, mc.medical_history, mc.treatment_plan
-                FROM patients p
-                JOIN medical_cards mc ON p.patient_id = mc.patient_id
-                WHERE p.patient_id = ?
-            ''', (patient_id,))
-
-            patient_info = cursor.fetchone()
+            card = self.medical_cards.get(patient_id)
 
-            if not patient_info:
+            if not card:
                 print("Медкарта пациента не найдена!")
                 return
 
             print("\n" + "=" * 50)
             print("МЕДИЦИНСКАЯ КАРТА ПАЦИЕНТА:")
             print("=" * 50)
-            print(f"Пациент: {patient_info[0]} {patient_info[1]} {patient_info[2]}")
-            print(f"Жалобы: {patient_info[3]}")
-            print(f"История болезни: {patient_info[4]}")
-            print(f"План лечения: {patient_info[5]}")
+            print(f"Пациент: {card.surname} {card.name} {card.patronymic}")
+            print(f"Жалобы: {card.health_complaints}")
+            print(f"История болезни: {card.medical_history}")
+            print(f"План лечения: {card.treatment_plan}")
 
             # Получаем препараты пациента
-            cursor.execute('''
-                SELECT medication_name, usage_description, is_taken
-                FROM medications 
-                WHERE patient_id = ?
-            ''', (patient_id,))
-
-            medications = cursor.fetchall()
+            medications = self.medications.for_patient(patient_id)
 
             if medications:
                 print(f"\nНазначенные препараты:")
                 for med in medications:
-                    status = "Принят" if med[2] else "Не принят"
-                    print(f"  - {med[0]} - {med[1]} [{status}]")
+                    status = "Принят" if med.is_taken else "Не принят"
+                    print(f"  - {med.medication_name} - {med.usage_description} [{status}]")
 
             # Получаем информацию о приемах
-            cursor.execute('''
-                SELECT appointment_date, appointment_time, confirmed
-                FROM appointments 
-                WHERE patient_id = ?
-            ''', (patient_id,))
-
-            appointments = cursor.fetchall()
+            appointments = self.appointments.for_patient(patient_id)
 
             if appointments:
                 print(f"\nЗаписи на прием:")
                 for app in appointments:
-                    status = "Подтверждена" if app[2] else "Ожидает подтверждения"
-                    print(f"  - {app[0]} {app[1]} - {status}")
+                    status = "Подтверждена" if app.confirmed else "Ожидает подтверждения"
+                    print(f"  - {app.appointment_date} {app.appointment_time} - {status}")
 
             print("=" * 50)
-            conn.close()
 
         except sqlite3.Error as e:
             print(f"Ошибка базы данных: {e}")
@@ -633,18 +518,14 @@ class HospitalSystem:
         try:
             patient_id = input("Введите ID пациента: ")
 
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.execute('SELECT * FROM patients WHERE patient_id = ?', (patient_id,))
-            patient = cursor.fetchone()
-            conn.close()
+            patient = self.patients.get(patient_id)
 
             if not patient:
                 print("Пациент с таким ID не найден!")
                 return False
 
-            self.current_patient_id = patient[0]
-            print(f"Добро пожаловать, {patient[1]} {patient[2]} {patient[3]}!")
+            self.current_patient_id = patient.patient_id
+            print(f"Добро пожаловать, {patient.full_name}!")
             self.show_patient_menu()
             return True
 
@@ -680,63 +561,34 @@ class HospitalSystem:
     def mark_medication_taken(self):
         """Отметка приема препарата"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-
-            cursor.execute('''
-                SELECT medication_id, medication_name 
-                FROM medications 
-                WHERE patient_id = ? AND is_taken = 0
-            ''', (self.current_patient_id,))
-
-            medications = cursor.fetchall()
+            medications = self.medications.untaken(self.current_patient_id)
 
             if not medications:
                 print("Нет препаратов для отметки!")
-                conn.close()
                 return
 
             print("\nДоступные препараты для отметки:")
             for med in medications:
-                print(f"ID: {med[0]} - {med[1]}")
+                print(f"ID: {med.medication_id} - {med.medication_name}")
 
             try:
                 med_id = int(input("Введите ID препарата для отметки: "))
 
-                cursor.execute('''
-                    UPDATE medications 
-                    SET is_taken = 1 
-                    WHERE medication_id = ? AND patient_id = ?
-                ''', (med_id, self.current_patient_id))
-
-                if cursor.rowcount > 0:
+                if self.medications.mark_taken(med_id, self.current_patient_id) > 0:
                     print("Препарат отмечен как принятый!")
                 else:
                     print("Препарат не найден!")
 
-                conn.commit()
-
             except ValueError:
                 print("Неверный ID препарата!")
 
-            conn.close()
-
         except sqlite3.Error as e:
             print(f"Ошибка базы данных: {e}")
 
     def view_appointment_info(self):
         """Просмотр информации о приеме"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-
-            cursor.execute('''
-                SELECT appointment_date, appointment_time, confirmed
-                FROM appointments 
-                WHERE patient_id = ?
-            ''', (self.current_patient_id,))
-
-            appointments = cursor.fetchall()
+            appointments = self.appointments.for_patient(self.current_patient_id)
 
             print("\n" + "=" * 40)
             print("ИНФОРМАЦИЯ О ПРИЕМЕ:")
@@ -744,16 +596,16 @@ class HospitalSystem:
 
             if appointments:
                 for app in appointments:
-                    status = "Подтверждена" if app[2] else "Ожидает подтверждения"
-                    print(f"Дата приема: {app[0]}")
-                    print(f"Время приема: {app[1]}")
+                    status = "Подтверждена" if app.confirmed else "Ожидает подтверждения"
+                    print(f"Дата приема: {app.appointment_date}")
+                    print(f"Время приема: {app.appointment_time}")
+                    print(f"Длительность: {app.duration_minutes} мин")
+                    print(f"Врач: {app.doctor_full_name or 'не указан'}")
                     print(f"Статус: {status}")
                     print("-" * 20)
             else:
                 print("Запись на прием не найдена")
 
-            conn.close()
-
         except sqlite3.Error as e:
             print(f"Ошибка базы данных: {e}")
 
@@ -763,17 +615,13 @@ class HospitalSystem:
             username = input("Введите имя пользователя: ")
             password = input("Введите пароль: ")
 
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.execute('SELECT * FROM administrators WHERE username = ? AND password = ?', (username, password))
-            admin = cursor.fetchone()
-            conn.close()
+            admin = self.administrators.authenticate(username, password)
 
             if not admin:
                 print("Неверные учетные данные!")
                 return False
 
-            self.current_admin_id = admin[0]
+            self.current_admin_id = admin.admin_id
             print(f"Добро пожаловать, администратор {username}!")
             self.show_admin_menu()
             return True
@@ -790,8 +638,10 @@ class HospitalSystem:
             print("=" * 40)
             print("1. Показать всех пациентов")
             print("2. Записать пациента на прием")
-            print("3. Подтвердить запись пациента")
-            print("4. Выход")
+            print("3. Найти свободное время")
+            print("4. Подтвердить запись пациента")
+            print("5. Подтвердить записи за период")
+            print("6. Выход")
 
             choice = input("Выберите действие: ")
 
@@ -800,8 +650,12 @@ class HospitalSystem:
             elif choice == '2':
                 self.schedule_appointment()
             elif choice == '3':
-                self.confirm_appointment()
+                self.find_free_slots()
             elif choice == '4':
+                self.confirm_appointment()
+            elif choice == '5':
+                self.confirm_appointments_for_period()
+            elif choice == '6':
                 self.current_admin_id = None
                 break
             else:
@@ -810,28 +664,17 @@ class HospitalSystem:
     def show_all_patients(self):
         """Показать всех пациентов"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-
-            cursor.execute('''
-                SELECT p.patient_id, p.surname, p.name, p.patronymic,
-                       d.surname, d.name, d.patronymic
-                FROM patients p
-                LEFT JOIN doctors d ON p.doctor_id = d.doctor_id
-                ORDER BY p.patient_id
-            ''')
-
-            patients = cursor.fetchall()
+            patients = self.patients.all_with_doctors()
 
             print("\n" + "=" * 60)
             print("ВСЕ ПАЦИЕНТЫ:")
             print("=" * 60)
 
             for patient in patients:
-                doctor_info = f"{patient[4]} {patient[5]} {patient[6]}" if patient[4] else "Не назначен"
-                print(f"ID: {patient[0]}, {patient[1]} {patient[2]} {patient[3]} - Врач: {doctor_info}")
-
-            conn.close()
+                doctor_info = (f"{patient.doctor_surname} {patient.doctor_name} {patient.doctor_patronymic}"
+                               if patient.doctor_surname else "Не назначен")
+                print(f"ID: {patient.patient_id}, {patient.surname} {patient.name} {patient.patronymic}"
+                      f" - Врач: {doctor_info}")
 
         except sqlite3.Error as e:
             print(f"Ошибка базы данных: {e}")
@@ -842,126 +685,233 @@ class HospitalSystem:
             self.show_all_patients()
             patient_id = input("\nВведите ID пациента для записи: ")
 
-            # Проверка существования пациента
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.execute('SELECT patient_id FROM patients WHERE patient_id = ?', (patient_id,))
-            if not cursor.fetchone():
+            # Проверка существования пациента; запись идет в расписание его врача
+            patient = self.patients.get(patient_id)
+            if not patient:
                 print("Пациент не найден!")
-                conn.close()
                 return
+            doctor = self.doctors.get(patient.doctor_id) if patient.doctor_id is not None else None
+            if not doctor:
+                print("Пациенту не назначен врач!")
+                return
+            print(f"Врач: {doctor.full_name}")
 
             # Ввод даты
             print("\nВведите дату приема (формат: ГГГГ-ММ-ДД, например: 2025-01-15):")
             date = input("Дата: ")
 
-            try:
-                # Проверка корректности даты
-                appointment_date = datetime.strptime(date, '%Y-%m-%d')
-                if appointment_date.year != 2025:
-                    print("Год должен быть 2025!")
-                    conn.close()
-                    return
-            except ValueError:
-                print("Неверный формат даты!")
-                conn.close()
+            error = check_appointment_date(date)
+            if error:
+                print(error)
                 return
 
             # Ввод времени
             print("\nВведите время приема (формат: ЧЧ:ММ, например: 14:30):")
             time_str = input("Время: ")
 
-            try:
-                # Проверка корректности времени
-                appointment_time = datetime.strptime(time_str, '%H:%M').time()
-                if appointment_time < time(8, 0) or appointment_time > time(20, 0):
-                    print("Время приема должно быть с 8:00 до 20:00!")
-                    conn.close()
-                    return
-            except ValueError:
-                print("Неверный формат времени!")
-                conn.close()
+            error = check_appointment_time(time_str)
+            if error:
+                print(error)
                 return
 
-            # Проверка занятости времени
-            cursor.execute('''
-                SELECT patient_id FROM appointments 
-                WHERE appointment_date = ? AND appointment_time = ?
-            ''', (date, time_str))
+            duration = input(f"Длительность приема в минутах (Enter - {DEFAULT_DURATION}): ") or DEFAULT_DURATION
+            error = check_appointment_duration(duration)
+            if error:
+                print(error)
+                return
+            duration = int(duration)
 
-            if cursor.fetchone():
+            error = check_appointment_end(time_str, duration)
+            if error:
+                print(error)
+                return
+
+            # Проверка занятости времени: прием не должен пересекаться с другими записями врача в этот день
+            if self.appointments.slot_taken(doctor.doctor_id, date, time_str, duration):
                 print("Это время уже занято! Выберите другое время.")
-                conn.close()
+                self.show_free_slots(self.appointments.free_slots(doctor.doctor_id, date, date, duration))
                 return
 
-            # Создание записи
-            cursor.execute('''
-                INSERT INTO appointments (patient_id, appointment_date, appointment_time)
-                VALUES (?, ?, ?)
-            ''', (patient_id, date, time_str))
+            # Создание записи; время мог занять другой администратор после проверки
+            try:
+                self.appointments.add(patient.patient_id, doctor.doctor_id, date, time_str, duration)
+            except sqlite3.IntegrityError:
+                print("Это время уже занято! Выберите другое время.")
+                self.show_free_slots(self.appointments.free_slots(doctor.doctor_id, date, date, duration))
+                return
 
-            conn.commit()
-            conn.close()
+            print(f"Пациент ID:{patient_id} успешно записан к врачу {doctor.full_name} "
+                  f"на {date} в {time_str} ({duration} мин)")
 
-            print(f"Пациент ID:{patient_id} успешно записан на {date} в {time_str}")
+        except sqlite3.Error as e:
+            print(f"Ошибка базы данных: {e}")
+
+    def find_free_slots(self):
+        """Поиск свободного времени приема у врача: ближайшее свободное или все свободное за период"""
+        try:
+            print("\nВрачи:")
+            for doctor in self.doctors.list():
+                print(f"ID: {doctor.doctor_id}, {doctor.full_name}")
+            doctor = self.doctors.get(input("\nВведите ID врача: "))
+            if not doctor:
+                print("Врач с таким ID не найден!")
+                return []
+
+            duration = input(f"Длительность приема в минутах (Enter - {DEFAULT_DURATION}): ") or DEFAULT_DURATION
+            error = check_appointment_duration(duration)
+            if error:
+                print(error)
+                return []
+            duration = int(duration)
+
+            print("\nВведите дату, с которой искать (формат: ГГГГ-ММ-ДД, например: 2025-01-15):")
+            first_date = input("С даты: ")
+            error = check_appointment_date(first_date)
+            if error:
+                print(error)
+                return []
+
+            last_date = input("По дату (Enter - ближайшее свободное время): ")
+            if last_date:
+                error = check_appointment_date(last_date)
+                if error:
+                    print(error)
+                    return []
+                if datetime.strptime(last_date, '%Y-%m-%d') < datetime.strptime(first_date, '%Y-%m-%d'):
+                    print("Конечная дата раньше начальной!")
+                    return []
+                slots = self.appointments.free_slots(doctor.doctor_id, first_date, last_date, duration)
+            else:
+                # Записать можно только в пределах года (check_appointment_date)
+                slots = self.appointments.free_slots(doctor.doctor_id, first_date, f'{first_date[:4]}-12-31',
+                                                     duration, FREE_SLOTS_SHOWN)
+
+            self.show_free_slots(slots)
+            return slots
 
         except sqlite3.Error as e:
             print(f"Ошибка базы данных: {e}")
+            return []
+
+    def show_free_slots(self, slots):
+        """Свободное время по дням; подряд идущие начала приема - одним промежутком"""
+        print("\n" + "=" * 50)
+        print("СВОБОДНОЕ ВРЕМЯ (начало приема):")
+        print("=" * 50)
+        if not slots:
+            print("Свободного времени нет")
+        for day, day_slots in groupby(slots, key=lambda slot: slot[0]):
+            ranges = []
+            for _, start in day_slots:
+                if ranges and minute_of_day(start) - minute_of_day(ranges[-1][1]) == SLOT_STEP:
+                    ranges[-1][1] = start
+                else:
+                    ranges.append([start, start])
+            print(f"{day}: " + ", ".join(first if first == last else f"{first}-{last}" for first, last in ranges))
 
     def confirm_appointment(self):
         """Подтверждение записи пациента"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-
             # Показать неподтвержденные записи
-            cursor.execute('''
-                SELECT a.appointment_id, p.patient_id, a.appointment_date, a.appointment_time
-                FROM appointments a
-                JOIN patients p ON a.patient_id = p.patient_id
-                WHERE a.confirmed = 0
-                ORDER BY a.appointment_date, a.appointment_time
-            ''')
-
-            appointments = cursor.fetchall()
+            appointments = self.appointments.unconfirmed()
 
             if not appointments:
                 print("Нет неподтвержденных записей!")
-                conn.close()
                 return
 
             print("\nНеподтвержденные записи:")
             for app in appointments:
-                print(f"ID записи: {app[0]}, Пациент ID: {app[1]}, Дата: {app[2]}, Время: {app[3]}")
+                print(f"ID записи: {app.appointment_id}, Пациент ID: {app.patient_id}, "
+                      f"Дата: {app.appointment_date}, Время: {app.appointment_time}, "
+                      f"Врач: {app.doctor_full_name or 'не указан'}")
 
             try:
-                appointment_id = int(input("\nВведите ID записи для подтверждения: "))
-
-                cursor.execute('''
-                    UPDATE appointments 
-                    SET confirmed = 1 
-                    WHERE appointment_id = ?
-                ''', (appointment_id,))
-
-                if cursor.rowcount > 0:
+                text = input("\nВведите ID записи для подтверждения (несколько - через запятую): ")
+                appointment_ids = [int(part) for part in text.replace(',', ' ').split()]
+                if not appointment_ids:
+                    raise ValueError(text)
+
+                if len(appointment_ids) > 1:
+                    # Весь список - одним запросом в одной транзакции
+                    confirmed = self.appointments.confirm_ids(appointment_ids)
+                    print(f"Подтверждено записей: {confirmed} из {len(appointment_ids)}")
+                elif self.appointments.confirm(appointment_ids[0]) > 0:
                     print("Запись подтверждена!")
                 else:
                     print("Запись не найдена!")
 
-                conn.commit()
-
             except ValueError:
                 print("Неверный ID записи!")
 
-            conn.close()
+        except sqlite3.Error as e:
+            print(f"Ошибка базы данных: {e}")
+
+    def confirm_appointments_for_period(self):
+        """Подтверждение всех неподтвержденных записей за период (у одного врача или у всех)
+        одним запросом, без вывода списка записей"""
+        try:
+            print("\nВведите период (формат: ГГГГ-ММ-ДД, например: 2025-01-15):")
+            first_date = input("С даты: ")
+            error = check_appointment_date(first_date)
+            if error:
+                print(error)
+                return 0
+
+            last_date = input("По дату (Enter - только этот день): ") or first_date
+            error = check_appointment_date(last_date)
+            if error:
+                print(error)
+                return 0
+            if datetime.strptime(last_date, '%Y-%m-%d') < datetime.strptime(first_date, '%Y-%m-%d'):
+                print("Конечная дата раньше начальной!")
+                return 0
+
+            doctor_id = input("ID врача (Enter - у всех врачей): ")
+            doctor = None
+            if doctor_id:
+                doctor = self.doctors.get(doctor_id)
+                if not doctor:
+                    print("Врач с таким ID не найден!")
+                    return 0
+
+            # Даты сравниваются как строки: в том виде, в котором их хранит таблица (2025-1-5 -> 2025-01-05)
+            confirmed = self.appointments.confirm_period(day_key(first_date), day_key(last_date),
+                                                         doctor.doctor_id if doctor else None)
+            print(f"Подтверждено записей: {confirmed}" + (f" (врач {doctor.full_name})" if doctor else ""))
+            return confirmed
 
         except sqlite3.Error as e:
             print(f"Ошибка базы данных: {e}")
+            return 0
 
 
 def main():
-    system = HospitalSystem()
-
+    parser = argparse.ArgumentParser(description="Система больницы")
+    parser.add_argument('--profile', choices=sorted(STORAGE_PROFILES), default=DEFAULT_PROFILE,
+                        help="профиль хранения SQLite")
+    parser.add_argument('--seed', action='store_true',
+                        help="заполнить базу демонстрационными данными (существующие данные удаляются)")
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE,
+                        help="записей в кэше врачей и списков пациентов (0 - без кэша)")
+    parser.add_argument('--cache-stats', action='store_true', help="показать счетчики кэша при выходе")
+    args = parser.parse_args()
+
+    system = HospitalSystem(profile=args.profile, cache_size=args.cache_size)
+    try:
+        if args.seed:
+            system.seed_demo_data()
+        run_menu(system)
+        if args.cache_stats and system.cache is not None:
+            stats = system.cache.stats()
+            print(f"Кэш: попаданий {stats['hits']}, промахов {stats['misses']} "
+                  f"({stats['hit_rate']:.0%}), записей {stats['entries']}/{stats['max_entries']}, "
+                  f"вытеснено {stats['evictions']}, сброшено {stats['invalidations']}")
+    finally:
+        system.close()
+
+
+def run_menu(system):
+    """Главное меню системы"""
     while True:
         print("\n" + "=" * 40)
         print("СИСТЕМА БОЛЬНИЦЫ")
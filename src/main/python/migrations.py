@@ -0,0 +1,374 @@
+import argparse
+import contextlib
+import re
+import sqlite3
+import sys
+
+from repositories import (AppointmentRepository, MedicalCardRepository, MedicationRepository, PatientRepository,
+                          card_search_query)
+
+
+class MigrationError(Exception):
+    """Миграцию нельзя применить к текущим данным"""
+
+
+def _initial_schema(conn):
+    """Таблицы системы, индексы под частые запросы и уникальность занятого слота приема"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS doctors (
+            doctor_id INTEGER PRIMARY KEY,
+            surname TEXT NOT NULL,
+            name TEXT NOT NULL,
+            patronymic TEXT NOT NULL,
+            password TEXT NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS patients (
+            patient_id INTEGER PRIMARY KEY,
+            surname TEXT NOT NULL,
+            name TEXT NOT NULL,
+            patronymic TEXT NOT NULL,
+            doctor_id INTEGER,
+            FOREIGN KEY (doctor_id) REFERENCES doctors (doctor_id)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS medical_cards (
+            patient_id INTEGER PRIMARY KEY,
+            health_complaints TEXT,
+            medical_history TEXT,
+            treatment_plan TEXT,
+            FOREIGN KEY (patient_id) REFERENCES patients (patient_id)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS appointments (
+            appointment_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            patient_id INTEGER NOT NULL,
+            appointment_date TEXT NOT NULL,
+            appointment_time TEXT NOT NULL,
+            confirmed INTEGER DEFAULT 0,
+            FOREIGN KEY (patient_id) REFERENCES patients (patient_id)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS medications (
+            medication_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            patient_id INTEGER NOT NULL,
+            medication_name TEXT NOT NULL,
+            usage_description TEXT,
+            is_taken INTEGER DEFAULT 0,
+            FOREIGN KEY (patient_id) REFERENCES patients (patient_id)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS administrators (
+            admin_id INTEGER PRIMARY KEY,
+            username TEXT NOT NULL,
+            password TEXT NOT NULL
+        )
+    ''')
+
+    # Пациенты врача (show_doctor_patients)
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_patients_doctor ON patients (doctor_id)')
+    # Приемы и препараты пациента (медкарта, информация о приеме, выгрузка)
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_appointments_patient ON appointments (patient_id)')
+    # Непринятые препараты пациента (mark_medication_taken); префикс patient_id - все препараты пациента
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_medications_patient_taken ON medications (patient_id, is_taken)')
+
+    # Один слот (дата и время) может быть занят только одной записью
+    duplicates = conn.execute('''
+        SELECT COUNT(*) FROM (
+            SELECT 1 FROM appointments
+            GROUP BY appointment_date, appointment_time
+            HAVING COUNT(*) > 1
+        )
+    ''').fetchone()[0]
+    if duplicates:
+        raise MigrationError(f"В таблице appointments есть занятые дважды слоты: {duplicates}. "
+                             f"Освободите их перед миграцией")
+    conn.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS ux_appointments_slot
+        ON appointments (appointment_date, appointment_time)
+    ''')
+
+
+# Поля медкарты в полнотекстовом индексе
+CARD_TEXT_FIELDS = ('health_complaints', 'medical_history', 'treatment_plan')
+
+
+def _medical_cards_search(conn):
+    """Полнотекстовый индекс FTS5 по жалобам, истории болезни и плану лечения.
+    Индекс без копии текста: содержимое - представление medical_cards_search_source
+    (медкарта и врач пациента). Столбец doctor_id в индексе сужает поиск до пациентов
+    врача без соединения с patients. Индекс синхронизируют триггеры на обеих таблицах"""
+    if not conn.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')").fetchone()[0]:
+        raise MigrationError("SQLite собран без FTS5: полнотекстовый поиск по медкартам недоступен")
+
+    fields = ', '.join(CARD_TEXT_FIELDS)
+    columns = f'{fields}, doctor_id'
+    card_fields = ', '.join(f'mc.{field}' for field in CARD_TEXT_FIELDS)
+    conn.execute(f'''
+        CREATE VIEW medical_cards_search_source AS
+        SELECT mc.patient_id, {card_fields}, p.doctor_id
+        FROM medical_cards mc
+        LEFT JOIN patients p ON p.patient_id = mc.patient_id
+    ''')
+    # Префиксные индексы: основа слова ищется как префикс ("ангин"*) без перебора всех слов с этим началом
+    conn.execute(f'''
+        CREATE VIRTUAL TABLE medical_cards_fts USING fts5(
+            {columns},
+            content='medical_cards_search_source', content_rowid='patient_id',
+            tokenize='unicode61 remove_diacritics 2', prefix='3 4 5 6'
+        )
+    ''')
+    # Релевантность только по тексту: совпадение номера врача не влияет на порядок
+    conn.execute("INSERT INTO medical_cards_fts (medical_cards_fts, rank) VALUES ('rank', 'bm25(1.0, 1.0, 1.0, 0.0)')")
+
+    _create_medical_cards_fts_triggers(conn)
+
+    # Индексация уже существующих медкарт
+    conn.execute("INSERT INTO medical_cards_fts (medical_cards_fts) VALUES ('rebuild')")
+    conn.execute("INSERT INTO medical_cards_fts (medical_cards_fts) VALUES ('optimize')")
+
+
+def _create_medical_cards_fts_triggers(conn):
+    """Триггеры, которые синхронизируют индекс medical_cards_fts с medical_cards и patients"""
+    fields = ', '.join(CARD_TEXT_FIELDS)
+    columns = f'{fields}, doctor_id'
+    # Из индекса с внешним содержимым строка удаляется командой 'delete' с ранее проиндексированными значениями
+    doctor_of = 'SELECT doctor_id FROM patients WHERE patient_id = {}.patient_id'
+    new_values = ', '.join(f'new.{field}' for field in CARD_TEXT_FIELDS) + f', ({doctor_of.format("new")})'
+    old_values = ', '.join(f'old.{field}' for field in CARD_TEXT_FIELDS) + f', ({doctor_of.format("old")})'
+    conn.execute(f'''
+        CREATE TRIGGER medical_cards_fts_insert AFTER INSERT ON medical_cards BEGIN
+            INSERT INTO medical_cards_fts (rowid, {columns}) VALUES (new.patient_id, {new_values});
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER medical_cards_fts_delete AFTER DELETE ON medical_cards BEGIN
+            INSERT INTO medical_cards_fts (medical_cards_fts, rowid, {columns})
+            VALUES ('delete', old.patient_id, {old_values});
+        END
+    ''')
+    # UPDATE OF: смена врача пациента во время обновления медкарты здесь не учитывается - ее ловят триггеры patients
+    conn.execute(f'''
+        CREATE TRIGGER medical_cards_fts_update AFTER UPDATE OF {fields} ON medical_cards BEGIN
+            INSERT INTO medical_cards_fts (medical_cards_fts, rowid, {columns})
+            VALUES ('delete', old.patient_id, {old_values});
+            INSERT INTO medical_cards_fts (rowid, {columns}) VALUES (new.patient_id, {new_values});
+        END
+    ''')
+
+    # Врач пациента меняется (или пациент появляется / удаляется при существующей медкарте):
+    # медкарта переиндексируется с новым doctor_id
+    def reindex(event, old_doctor, new_doctor, key, when=''):
+        conn.execute(f'''
+            CREATE TRIGGER medical_cards_fts_patient_{event.split()[0].lower()} AFTER {event} ON patients {when}
+            BEGIN
+                INSERT INTO medical_cards_fts (medical_cards_fts, rowid, {columns})
+                SELECT 'delete', patient_id, {fields}, {old_doctor} FROM medical_cards WHERE patient_id = {key};
+                INSERT INTO medical_cards_fts (rowid, {columns})
+                SELECT patient_id, {fields}, {new_doctor} FROM medical_cards WHERE patient_id = {key};
+            END
+        ''')
+
+    reindex('INSERT', 'NULL', 'new.doctor_id', 'new.patient_id')
+    reindex('DELETE', 'old.doctor_id', 'NULL', 'old.patient_id')
+    reindex('UPDATE OF doctor_id', 'old.doctor_id', 'new.doctor_id', 'new.patient_id',
+            'WHEN old.doctor_id IS NOT new.doctor_id')
+
+
+# Триггеры, которые создает _create_medical_cards_fts_triggers
+MEDICAL_CARDS_FTS_TRIGGERS = ('medical_cards_fts_insert', 'medical_cards_fts_delete', 'medical_cards_fts_update',
+                              'medical_cards_fts_patient_insert', 'medical_cards_fts_patient_delete',
+                              'medical_cards_fts_patient_update')
+
+
+@contextlib.contextmanager
+def deferred_search_index(conn):
+    """Массовая загрузка медкарт и пациентов без построчной синхронизации полнотекстового индекса:
+    на время загрузки триггеры medical_cards_fts удаляются, после нее (и при ошибке загрузки) создаются
+    снова, а индекс перестраивается одной командой rebuild. Если процесс загрузки оборвался
+    до восстановления триггеров, их и индекс восстановит следующая загрузка через эту функцию"""
+    conn.execute('BEGIN')
+    try:
+        for name in MEDICAL_CARDS_FTS_TRIGGERS:
+            conn.execute(f'DROP TRIGGER IF EXISTS {name}')
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    try:
+        yield
+    finally:
+        conn.execute('BEGIN')
+        try:
+            _create_medical_cards_fts_triggers(conn)
+            conn.execute("INSERT INTO medical_cards_fts (medical_cards_fts) VALUES ('rebuild')")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+
+def _appointment_durations(conn):
+    """Длительность приема в минутах: пересечение записей проверяется по интервалу, а не по совпадению
+    времени начала. У существующих записей - длительность по умолчанию (15 минут)"""
+    conn.execute('''
+        ALTER TABLE appointments
+        ADD COLUMN duration_minutes INTEGER NOT NULL DEFAULT 15 CHECK (duration_minutes > 0)
+    ''')
+
+
+def _doctor_calendars(conn):
+    """Расписание у каждого врача свое: запись привязана к врачу пациента, и в одно время
+    могут идти приемы у разных врачей. Врач существующих записей - текущий врач пациента"""
+    conn.execute('ALTER TABLE appointments ADD COLUMN doctor_id INTEGER REFERENCES doctors (doctor_id)')
+    conn.execute('''
+        UPDATE appointments
+        SET doctor_id = (SELECT doctor_id FROM patients WHERE patients.patient_id = appointments.patient_id)
+    ''')
+    # Уникальность слота - в расписании врача, а не всей больницы
+    conn.execute('DROP INDEX IF EXISTS ux_appointments_slot')
+    conn.execute('''
+        CREATE UNIQUE INDEX ux_appointments_doctor_slot
+        ON appointments (doctor_id, appointment_date, appointment_time)
+    ''')
+
+
+def _unconfirmed_appointments(conn):
+    """Частичный индекс неподтвержденных записей по дате: список на подтверждение и подтверждение
+    за период читают только неподтвержденные записи, а не всю таблицу"""
+    conn.execute('''
+        CREATE INDEX idx_appointments_unconfirmed
+        ON appointments (appointment_date, appointment_time)
+        WHERE confirmed = 0
+    ''')
+
+
+# Миграции по возрастанию версии: (версия, название, функция)
+MIGRATIONS = [
+    (1, 'initial_schema', _initial_schema),
+    (2, 'medical_cards_search', _medical_cards_search),
+    (3, 'appointment_durations', _appointment_durations),
+    (4, 'doctor_calendars', _doctor_calendars),
+    (5, 'unconfirmed_appointments', _unconfirmed_appointments),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def _ensure_version_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def current_version(conn):
+    """Версия схемы базы (0, если миграции еще не применялись)"""
+    table = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'").fetchone()
+    if not table:
+        return 0
+    return conn.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version').fetchone()[0]
+
+
+def migrate(conn, target=LATEST_VERSION):
+    """Применяет недостающие миграции по порядку, каждую в своей транзакции.
+    Возвращает список примененных версий (пустой, если схема уже актуальна)"""
+    applied = []
+    for version, name, upgrade in MIGRATIONS:
+        if version > target:
+            break
+        if version <= current_version(conn):
+            continue
+
+        # BEGIN IMMEDIATE: две запущенные одновременно программы не применят миграцию дважды
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            _ensure_version_table(conn)
+            if version <= current_version(conn):
+                conn.rollback()
+                continue
+            upgrade(conn)
+            conn.execute('INSERT INTO schema_version (version, name) VALUES (?, ?)', (version, name))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version)
+    return applied
+
+
+# Частые запросы системы (текст - из repositories.py); у каждого в плане не должно быть полного просмотра таблицы
+HOT_QUERIES = [
+    ('пациенты врача', PatientRepository.DOCTOR_ROSTER, (111,)),
+    ('занятость дня врача', AppointmentRepository.DAY_OCCUPANCY, (111, '2025-01-15')),
+    ('занятость дней врача', AppointmentRepository.OCCUPANCY, (111, '2025-01-15', '2025-02-14')),
+    ('непринятые препараты', MedicationRepository.UNTAKEN, (1,)),
+    ('препараты пациента', MedicationRepository.FOR_PATIENT, (1,)),
+    ('приемы пациента', AppointmentRepository.FOR_PATIENT, (1,)),
+    ('медкарта', MedicalCardRepository.GET, (1,)),
+    ('неподтвержденные записи', AppointmentRepository.UNCONFIRMED, ()),
+    ('подтверждение за период', AppointmentRepository.CONFIRM_PERIOD, ('2025-01-15', '2025-01-31')),
+    ('подтверждение у врача', AppointmentRepository.CONFIRM_DOCTOR_PERIOD, (111, '2025-01-15', '2025-01-31')),
+    ('подтверждение по списку', AppointmentRepository.CONFIRM_IDS, ('[1, 2, 3]',)),
+    ('поиск по медкартам', MedicalCardRepository.SEARCH, (card_search_query('ангина', 111), 20)),
+]
+
+# Полный просмотр таблицы без индекса: "SCAN patients"
+_FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+# Вложенный запрос, результат которого просматривается целиком: "MATERIALIZE found"
+_SUBQUERY = re.compile(r'^(?:MATERIALIZE|CO-ROUTINE) (\w+)$')
+
+
+def query_plan(conn, sql, parameters=()):
+    """Строки EXPLAIN QUERY PLAN запроса"""
+    return [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', parameters)]
+
+
+def check_query_plans(conn, queries=None):
+    """Проверяет планы частых запросов. Возвращает список (название, план, используется ли индекс)"""
+    results = []
+    for title, sql, parameters in queries or HOT_QUERIES:
+        plan = query_plan(conn, sql, parameters)
+        # Просмотр результата вложенного запроса - не просмотр таблицы: его строки уже отобраны
+        subqueries = {match.group(1) for match in map(_SUBQUERY.match, plan) if match}
+        uses_index = not any(match and match.group(1) not in subqueries for match in map(_FULL_SCAN.match, plan))
+        results.append((title, plan, uses_index))
+    return results
+
+
+def main():
+    """Применяет миграции к базе и проверяет планы частых запросов"""
+    parser = argparse.ArgumentParser(description="Миграции схемы базы больницы")
+    parser.add_argument('db_path', nargs='?', default='../database/hospital.db')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db_path)
+    try:
+        before = current_version(conn)
+        applied = migrate(conn)
+        print(f"Версия схемы: {before} -> {current_version(conn)}"
+              + (f" (применены миграции: {', '.join(map(str, applied))})" if applied else " (схема актуальна)"))
+
+        print("\nПланы частых запросов:")
+        failed = 0
+        for title, plan, uses_index in check_query_plans(conn):
+            print(f"  [{'OK' if uses_index else 'ПОЛНЫЙ ПРОСМОТР'}] {title}: {'; '.join(plan)}")
+            failed += not uses_index
+    except (sqlite3.Error, MigrationError) as e:
+        print(f"Ошибка миграции: {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import threading
+from collections import OrderedDict
+
+DEFAULT_CACHE_SIZE = 1024
+
+
+class ReadCache:
+    """Кэш результатов чтения с вытеснением давно не использованных записей (LRU).
+    У каждой записи есть таблицы, от которых она зависит; запись в таблицу через
+    репозиторий удаляет зависящие от нее записи кэша. Изменения, сделанные в обход
+    HospitalSystem (другим процессом, bulk_import.py), кэш не видит"""
+
+    def __init__(self, max_entries=DEFAULT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        # Таблица -> ключи зависящих от нее записей
+        self._dependents = {}
+        self._lock = threading.Lock()
+        # Растет при каждой инвалидации: загрузка, начатая до записи в базу, не кладет в кэш старые данные
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key, tables, load):
+        """Значение по ключу; при промахе вызывает load() и запоминает результат"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            generation = self._generation
+
+        value = load()
+
+        with self._lock:
+            if generation == self._generation and self.max_entries > 0:
+                self._entries[key] = (value, tables)
+                self._entries.move_to_end(key)
+                for table in tables:
+                    self._dependents.setdefault(table, set()).add(key)
+                while len(self._entries) > self.max_entries:
+                    self._forget(next(iter(self._entries)))
+                    self.evictions += 1
+        return value
+
+    def _forget(self, key):
+        _, tables = self._entries.pop(key)
+        for table in tables:
+            dependents = self._dependents.get(table)
+            if dependents is not None:
+                dependents.discard(key)
+
+    def invalidate(self, table):
+        """Удаляет записи, зависящие от таблицы"""
+        with self._lock:
+            self._generation += 1
+            for key in self._dependents.pop(table, ()):
+                if key in self._entries:
+                    self._forget(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._dependents.clear()
+
+    def stats(self):
+        """Счетчики кэша"""
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / requests if requests else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
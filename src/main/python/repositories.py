@@ -0,0 +1,499 @@
+# Слой доступа к данным системы больницы: все SQL-запросы HospitalSystem собраны здесь.
+# Запросы - константы классов: текст каждого запроса всегда один и тот же, и sqlite3 берет
+# подготовленное выражение из кэша соединения. Строки результата - объекты с __slots__:
+# атрибуты по именам столбцов и без словаря на каждую строку.
+
+import json
+import re
+
+
+# Окончания русских слов для поиска по основе: отбрасывается самое длинное подходящее.
+# Это не полноценный стемминг, а приближение: основа ищется как префикс (ангина -> ангин*)
+_RUSSIAN_ENDINGS = sorted({
+    # прилагательные и причастия
+    'ими', 'ыми', 'его', 'ого', 'ему', 'ому', 'ее', 'ие', 'ые', 'ое', 'ей', 'ий', 'ый', 'ой', 'ем', 'им', 'ым',
+    'ом', 'их', 'ых', 'ую', 'юю', 'ая', 'яя', 'ою', 'ею',
+    # существительные
+    'иями', 'ями', 'ами', 'ией', 'иям', 'ием', 'иях', 'ев', 'ов', 'ье', 'еи', 'ии', 'ям', 'ам', 'ах', 'ях',
+    'ию', 'ью', 'ия', 'ья', 'а', 'е', 'и', 'й', 'о', 'у', 'ы', 'ь', 'ю', 'я',
+    # глаголы (без коротких окончаний вроде -на, -ла, которые чаще оказываются частью основы существительного)
+    'ила', 'ыла', 'ите', 'или', 'ыли', 'ил', 'ыл', 'ило', 'ыло', 'ят', 'ует', 'уют', 'ит',
+    'ить', 'ыть', 'ишь', 'ете', 'ет', 'ют', 'ть', 'ешь',
+}, key=len, reverse=True)
+_MIN_STEM = 3
+# Слова короче (предлоги, союзы) в запросе не учитываются, если есть слова длиннее
+_MIN_WORD = 3
+_WORD = re.compile(r'\w+')
+
+
+def russian_stem(word):
+    """Приближенная основа слова: без возвратной частицы и окончания, не короче трех букв"""
+    word = word.lower().replace('ё', 'е')
+    for suffix in ('ся', 'сь'):
+        if word.endswith(suffix) and len(word) - len(suffix) >= _MIN_STEM:
+            word = word[:-len(suffix)]
+            break
+    for ending in _RUSSIAN_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= _MIN_STEM:
+            return word[:-len(ending)]
+    return word
+
+
+def _stem_variants(stem):
+    """Основа и ее написания через ё: токенизатор не отождествляет е и ё, а ё в слове обычно одна"""
+    return [stem] + [stem[:i] + 'ё' + stem[i + 1:] for i, letter in enumerate(stem) if letter == 'е']
+
+
+def card_search_query(text, doctor_id):
+    """Запрос FTS5 из текста пользователя по медкартам пациентов врача: все слова обязательны,
+    каждое ищется по основе как префикс в полях медкарты. Слова берутся в кавычки, поэтому синтаксис
+    FTS5 в тексте не действует. None - в тексте нет слов"""
+    words = _WORD.findall(text)
+    words = [word for word in words if len(word) >= _MIN_WORD] or words
+    terms = []
+    for word in words:
+        variants = [f'"{variant}"*' for variant in _stem_variants(russian_stem(word))]
+        terms.append(variants[0] if len(variants) == 1 else f"({' OR '.join(variants)})")
+    if not terms:
+        return None
+    # Явный AND: после группы в скобках FTS5 не допускает неявного
+    return (f'doctor_id : "{int(doctor_id)}" AND '
+            f'{{health_complaints medical_history treatment_plan}} : ({" AND ".join(terms)})')
+
+
+class Row:
+    """Строка результата запроса; порядок __slots__ совпадает с порядком столбцов SELECT"""
+    __slots__ = ()
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    @classmethod
+    def factory(cls, cursor, values):
+        """row_factory для курсора sqlite3"""
+        return cls(*values)
+
+    def __iter__(self):
+        return (getattr(self, name) for name in self.__slots__)
+
+    def as_dict(self, *names):
+        """Словарь столбцов (например, для JSON); names - только перечисленные столбцы"""
+        return {name: getattr(self, name) for name in names or self.__slots__}
+
+    def __eq__(self, other):
+        return type(self) is type(other) and tuple(self) == tuple(other)
+
+    def __repr__(self):
+        fields = ', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)
+        return f'{type(self).__name__}({fields})'
+
+
+class Doctor(Row):
+    __slots__ = ('doctor_id', 'surname', 'name', 'patronymic', 'password')
+
+    @property
+    def full_name(self):
+        return f'{self.surname} {self.name} {self.patronymic}'
+
+
+class Patient(Row):
+    __slots__ = ('patient_id', 'surname', 'name', 'patronymic', 'doctor_id')
+
+    @property
+    def full_name(self):
+        return f'{self.surname} {self.name} {self.patronymic}'
+
+
+class RosterEntry(Row):
+    """Пациент врача и его запись на прием (поля записи - None, если записи нет)"""
+    __slots__ = ('patient_id', 'surname', 'name', 'patronymic',
+                 'appointment_date', 'appointment_time', 'confirmed')
+
+
+class PatientWithDoctor(Row):
+    """Пациент и ФИО лечащего врача (None, если врач не назначен)"""
+    __slots__ = ('patient_id', 'surname', 'name', 'patronymic',
+                 'doctor_surname', 'doctor_name', 'doctor_patronymic')
+
+
+class MedicalCard(Row):
+    """Медкарта вместе с ФИО пациента"""
+    __slots__ = ('surname', 'name', 'patronymic', 'health_complaints', 'medical_history', 'treatment_plan')
+
+
+class CardSearchResult(Row):
+    """Найденная медкарта: пациент, фрагмент текста с совпадением и ранг (меньше - релевантнее)"""
+    __slots__ = ('patient_id', 'surname', 'name', 'patronymic', 'snippet', 'rank')
+
+
+class Appointment(Row):
+    """Запись на прием и ФИО врача, к которому она сделана"""
+    __slots__ = ('appointment_id', 'patient_id', 'doctor_id', 'appointment_date', 'appointment_time',
+                 'duration_minutes', 'confirmed', 'doctor_surname', 'doctor_name', 'doctor_patronymic')
+
+    @property
+    def doctor_full_name(self):
+        if self.doctor_surname is None:
+            return None
+        return f'{self.doctor_surname} {self.doctor_name} {self.doctor_patronymic}'
+
+
+class Medication(Row):
+    __slots__ = ('medication_id', 'patient_id', 'medication_name', 'usage_description', 'is_taken')
+
+
+class Administrator(Row):
+    __slots__ = ('admin_id', 'username', 'password')
+
+
+class Repository:
+    """Основа репозиториев. connect() возвращает соединение, close() которого его освобождает
+    (у пула соединений - возвращает в пул). cache - общий ReadCache (None - без кэша):
+    изменения через репозиторий сбрасывают записи кэша, зависящие от его таблицы"""
+
+    # Таблица и вставка для replace_all; задаются в наследниках
+    TABLE = None
+    INSERT = None
+
+    def __init__(self, connect, cache=None):
+        self._connect = connect
+        self.cache = cache
+
+    def _cached(self, key, tables, load):
+        """Результат load() через кэш; кэшированные списки - кортежи, чтобы их нельзя было изменить"""
+        if self.cache is None:
+            return load()
+        return self.cache.get(key, tables, load)
+
+    def _fetchall(self, sql, parameters, row_cls):
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.row_factory = row_cls.factory
+            return cursor.execute(sql, parameters).fetchall()
+        finally:
+            conn.close()
+
+    def _fetchone(self, sql, parameters, row_cls):
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.row_factory = row_cls.factory
+            return cursor.execute(sql, parameters).fetchone()
+        finally:
+            conn.close()
+
+    def _exists(self, sql, parameters):
+        conn = self._connect()
+        try:
+            return conn.execute(sql, parameters).fetchone() is not None
+        finally:
+            conn.close()
+
+    def _write(self, sql, parameters):
+        """Выполняет запрос изменения в своей транзакции. Возвращает число измененных строк"""
+        conn = self._connect()
+        try:
+            cursor = conn.execute(sql, parameters)
+            conn.commit()
+        finally:
+            conn.close()
+        if self.cache is not None:
+            self.cache.invalidate(self.TABLE)
+        return cursor.rowcount
+
+    def replace_all(self, conn, rows):
+        """Заменяет содержимое таблицы строками rows в транзакции вызывающего (conn не фиксируется).
+        Кэш после фиксации сбрасывает вызывающий"""
+        conn.execute(f'DELETE FROM {self.TABLE}')
+        conn.executemany(self.INSERT, rows)
+
+
+class DoctorRepository(Repository):
+    TABLE = 'doctors'
+    INSERT = '''
+        INSERT INTO doctors (doctor_id, surname, name, patronymic, password)
+        VALUES (?, ?, ?, ?, ?)
+    '''
+    LIST = 'SELECT doctor_id, surname, name, patronymic, password FROM doctors ORDER BY doctor_id'
+    GET = 'SELECT doctor_id, surname, name, patronymic, password FROM doctors WHERE doctor_id = ?'
+
+    def list(self):
+        return self._cached(('doctors',), ('doctors',), lambda: tuple(self._fetchall(self.LIST, (), Doctor)))
+
+    def get(self, doctor_id):
+        return self._cached(('doctor', doctor_id), ('doctors',),
+                            lambda: self._fetchone(self.GET, (doctor_id,), Doctor))
+
+
+class PatientRepository(Repository):
+    TABLE = 'patients'
+    INSERT = '''
+        INSERT INTO patients (patient_id, surname, name, patronymic, doctor_id)
+        VALUES (?, ?, ?, ?, ?)
+    '''
+    GET = 'SELECT patient_id, surname, name, patronymic, doctor_id FROM patients WHERE patient_id = ?'
+    EXISTS = 'SELECT 1 FROM patients WHERE patient_id = ?'
+    DOCTOR_ROSTER = '''
+        SELECT p.patient_id, p.surname, p.name, p.patronymic,
+               a.appointment_date, a.appointment_time, a.confirmed
+        FROM patients p
+        LEFT JOIN appointments a ON p.patient_id = a.patient_id
+        WHERE p.doctor_id = ?
+        ORDER BY p.patient_id
+    '''
+    ALL_WITH_DOCTORS = '''
+        SELECT p.patient_id, p.surname, p.name, p.patronymic,
+               d.surname, d.name, d.patronymic
+        FROM patients p
+        LEFT JOIN doctors d ON p.doctor_id = d.doctor_id
+        ORDER BY p.patient_id
+    '''
+
+    def get(self, patient_id):
+        return self._cached(('patient', patient_id), ('patients',),
+                            lambda: self._fetchone(self.GET, (patient_id,), Patient))
+
+    def exists(self, patient_id):
+        if self.cache is not None:
+            return self.get(patient_id) is not None
+        return self._exists(self.EXISTS, (patient_id,))
+
+    def doctor_roster(self, doctor_id):
+        """Пациенты врача с записями на прием: по строке на каждую запись"""
+        return self._cached(('roster', doctor_id), ('patients', 'appointments'),
+                            lambda: tuple(self._fetchall(self.DOCTOR_ROSTER, (doctor_id,), RosterEntry)))
+
+    def all_with_doctors(self):
+        return self._cached(('all_patients',), ('patients', 'doctors'),
+                            lambda: tuple(self._fetchall(self.ALL_WITH_DOCTORS, (), PatientWithDoctor)))
+
+
+class MedicalCardRepository(Repository):
+    TABLE = 'medical_cards'
+    INSERT = '''
+        INSERT INTO medical_cards (patient_id, health_complaints, medical_history, treatment_plan)
+        VALUES (?, ?, ?, ?)
+    '''
+    GET = '''
+        SELECT p.surname, p.name, p.patronymic,
+               mc.health_complaints, mc.medical_history, mc.treatment_plan
+        FROM patients p
+        JOIN medical_cards mc ON p.patient_id = mc.patient_id
+        WHERE p.patient_id = ?
+    '''
+    SET_HEALTH_COMPLAINTS = 'UPDATE medical_cards SET health_complaints = ? WHERE patient_id = ?'
+    SET_MEDICAL_HISTORY = 'UPDATE medical_cards SET medical_history = ? WHERE patient_id = ?'
+    SET_TREATMENT_PLAN = 'UPDATE medical_cards SET treatment_plan = ? WHERE patient_id = ?'
+    # Несколько полей одним запросом: None - поле не меняется
+    UPDATE = '''
+        UPDATE medical_cards
+        SET health_complaints = COALESCE(?, health_complaints),
+            medical_history = COALESCE(?, medical_history),
+            treatment_plan = COALESCE(?, treatment_plan)
+        WHERE patient_id = ?
+    '''
+    # Поиск по медкартам пациентов врача; индекс medical_cards_fts обновляют триггеры (миграция 2).
+    # Врач - условие внутри MATCH (столбец doctor_id индекса). ORDER BY rank LIMIT во вложенном
+    # запросе: FTS5 строит фрагменты текста только для возвращаемых строк
+    SEARCH = '''
+        SELECT p.patient_id, p.surname, p.name, p.patronymic, found.snippet, found.rank
+        FROM (
+            SELECT rowid, snippet(medical_cards_fts, -1, '[', ']', '...', 12) AS snippet, rank
+            FROM medical_cards_fts
+            WHERE medical_cards_fts MATCH ?
+            ORDER BY rank
+            LIMIT ?
+        ) found
+        JOIN patients p ON p.patient_id = found.rowid
+        ORDER BY found.rank
+    '''
+
+    def get(self, patient_id):
+        return self._fetchone(self.GET, (patient_id,), MedicalCard)
+
+    def set_health_complaints(self, patient_id, complaints):
+        return self._write(self.SET_HEALTH_COMPLAINTS, (complaints, patient_id))
+
+    def set_medical_history(self, patient_id, medical_history):
+        return self._write(self.SET_MEDICAL_HISTORY, (medical_history, patient_id))
+
+    def set_treatment_plan(self, patient_id, treatment_plan):
+        return self._write(self.SET_TREATMENT_PLAN, (treatment_plan, patient_id))
+
+    def update(self, patient_id, health_complaints=None, medical_history=None, treatment_plan=None):
+        """Меняет переданные поля медкарты в одной транзакции. Возвращает число измененных строк
+        (0 - медкарты нет)"""
+        return self._write(self.UPDATE, (health_complaints, medical_history, treatment_plan, patient_id))
+
+    def search(self, doctor_id, text, limit=20):
+        """Медкарты пациентов врача, в которых есть все слова текста (по основе), по релевантности"""
+        query = card_search_query(text, doctor_id)
+        if query is None:
+            return []
+        return self._fetchall(self.SEARCH, (query, limit), CardSearchResult)
+
+
+class AppointmentRepository(Repository):
+    """Записи на прием; расписание у каждого врача свое. Новые записи создает индекс занятости
+    slots (SlotIndex): он проверяет пересечение по времени с учетом длительности и вставляет
+    запись в одной транзакции"""
+    TABLE = 'appointments'
+    INSERT = '''
+        INSERT INTO appointments (patient_id, doctor_id, appointment_date, appointment_time, confirmed)
+        VALUES (?, ?, ?, ?, ?)
+    '''
+    FOR_PATIENT = '''
+        SELECT a.appointment_id, a.patient_id, a.doctor_id, a.appointment_date, a.appointment_time,
+               a.duration_minutes, a.confirmed, d.surname, d.name, d.patronymic
+        FROM appointments a
+        LEFT JOIN doctors d ON a.doctor_id = d.doctor_id
+        WHERE a.patient_id = ?
+    '''
+    # Занятость дня и отрезка дней врача для индекса slots; поиск по индексу ux_appointments_doctor_slot
+    DAY_OCCUPANCY = '''
+        SELECT appointment_time, duration_minutes
+        FROM appointments
+        WHERE doctor_id = ? AND appointment_date = ?
+    '''
+    OCCUPANCY = '''
+        SELECT appointment_date, appointment_time, duration_minutes
+        FROM appointments
+        WHERE doctor_id = ? AND appointment_date BETWEEN ? AND ?
+    '''
+    ADD = '''
+        INSERT INTO appointments (patient_id, doctor_id, appointment_date, appointment_time, duration_minutes)
+        VALUES (?, ?, ?, ?, ?)
+    '''
+    UNCONFIRMED = '''
+        SELECT a.appointment_id, a.patient_id, a.doctor_id, a.appointment_date, a.appointment_time,
+               a.duration_minutes, a.confirmed, d.surname, d.name, d.patronymic
+        FROM appointments a
+        JOIN patients p ON a.patient_id = p.patient_id
+        LEFT JOIN doctors d ON a.doctor_id = d.doctor_id
+        WHERE a.confirmed = 0
+        ORDER BY a.appointment_date, a.appointment_time
+    '''
+    CONFIRM = 'UPDATE appointments SET confirmed = 1 WHERE appointment_id = ?'
+    # Подтверждение пачкой - один UPDATE в одной транзакции: за период - по idx_appointments_unconfirmed,
+    # у врача - по ux_appointments_doctor_slot, по списку - по первичному ключу. Список ID передается
+    # одним параметром JSON, поэтому текст запроса не зависит от длины списка
+    CONFIRM_PERIOD = '''
+        UPDATE appointments SET confirmed = 1
+        WHERE confirmed = 0 AND appointment_date BETWEEN ? AND ?
+    '''
+    CONFIRM_DOCTOR_PERIOD = '''
+        UPDATE appointments SET confirmed = 1
+        WHERE doctor_id = ? AND appointment_date BETWEEN ? AND ? AND confirmed = 0
+    '''
+    CONFIRM_IDS = '''
+        UPDATE appointments SET confirmed = 1
+        WHERE appointment_id IN (SELECT value FROM json_each(?)) AND confirmed = 0
+    '''
+
+    def __init__(self, connect, cache=None, slots=None):
+        super().__init__(connect, cache)
+        self.slots = slots
+
+    def for_patient(self, patient_id):
+        return self._fetchall(self.FOR_PATIENT, (patient_id,), Appointment)
+
+    def slot_taken(self, doctor_id, appointment_date, appointment_time, duration):
+        """Пересекается ли прием с другими записями врача в этот день (по индексу в памяти, без запроса к базе)"""
+        return self.slots.overlaps(doctor_id, appointment_date, appointment_time, duration)
+
+    def free_slots(self, doctor_id, first_date, last_date, duration, limit=None):
+        """Свободное время приема у врача (дата, время) с first_date по last_date; limit - только самое раннее"""
+        return self.slots.free_slots(doctor_id, first_date, last_date, duration, limit)
+
+    def add(self, patient_id, doctor_id, appointment_date, appointment_time, duration):
+        """Создает запись к врачу. Возвращает ее ID; sqlite3.IntegrityError - время пересекается
+        с другой записью этого врача"""
+        appointment_id = self.slots.book(patient_id, doctor_id, appointment_date, appointment_time, duration)
+        if self.cache is not None:
+            self.cache.invalidate(self.TABLE)
+        return appointment_id
+
+    def unconfirmed(self):
+        return self._fetchall(self.UNCONFIRMED, (), Appointment)
+
+    def confirm(self, appointment_id):
+        return self._write(self.CONFIRM, (appointment_id,))
+
+    def confirm_period(self, first_date, last_date, doctor_id=None):
+        """Подтверждает неподтвержденные записи с first_date по last_date включительно (у врача или у всех).
+        Возвращает число подтвержденных"""
+        if doctor_id is None:
+            return self._write(self.CONFIRM_PERIOD, (first_date, last_date))
+        return self._write(self.CONFIRM_DOCTOR_PERIOD, (doctor_id, first_date, last_date))
+
+    def confirm_ids(self, appointment_ids):
+        """Подтверждает неподтвержденные записи из списка ID. Возвращает число подтвержденных"""
+        return self._write(self.CONFIRM_IDS, (json.dumps([int(appointment_id) for appointment_id in appointment_ids]),))
+
+
+class MedicationRepository(Repository):
+    TABLE = 'medications'
+    INSERT = '''
+        INSERT INTO medications (patient_id, medication_name, usage_description, is_taken)
+        VALUES (?, ?, ?, ?)
+    '''
+    FOR_PATIENT = '''
+        SELECT medication_id, patient_id, medication_name, usage_description, is_taken
+        FROM medications
+        WHERE patient_id = ?
+    '''
+    UNTAKEN = '''
+        SELECT medication_id, patient_id, medication_name, usage_description, is_taken
+        FROM medications
+        WHERE patient_id = ? AND is_taken = 0
+    '''
+    HAS_ANY = 'SELECT 1 FROM medications WHERE patient_id = ? LIMIT 1'
+    GET = '''
+        SELECT medication_id, patient_id, medication_name, usage_description, is_taken
+        FROM medications
+        WHERE medication_id = ? AND patient_id = ?
+    '''
+    ADD = 'INSERT INTO medications (patient_id, medication_name, usage_description) VALUES (?, ?, ?)'
+    UPDATE = 'UPDATE medications SET medication_name = ?, usage_description = ? WHERE medication_id = ?'
+    DELETE = 'DELETE FROM medications WHERE medication_id = ?'
+    MARK_TAKEN = 'UPDATE medications SET is_taken = 1 WHERE medication_id = ? AND patient_id = ?'
+
+    def for_patient(self, patient_id):
+        return self._fetchall(self.FOR_PATIENT, (patient_id,), Medication)
+
+    def untaken(self, patient_id):
+        return self._fetchall(self.UNTAKEN, (patient_id,), Medication)
+
+    def has_any(self, patient_id):
+        return self._exists(self.HAS_ANY, (patient_id,))
+
+    def get(self, medication_id, patient_id):
+        """Препарат пациента; None, если препарата нет или он назначен другому пациенту"""
+        return self._fetchone(self.GET, (medication_id, patient_id), Medication)
+
+    def add(self, patient_id, medication_name, usage_description):
+        return self._write(self.ADD, (patient_id, medication_name, usage_description))
+
+    def update(self, medication_id, medication_name, usage_description):
+        return self._write(self.UPDATE, (medication_name, usage_description, medication_id))
+
+    def delete(self, medication_id):
+        return self._write(self.DELETE, (medication_id,))
+
+    def mark_taken(self, medication_id, patient_id):
+        return self._write(self.MARK_TAKEN, (medication_id, patient_id))
+
+
+class AdministratorRepository(Repository):
+    TABLE = 'administrators'
+    INSERT = 'INSERT INTO administrators (admin_id, username, password) VALUES (?, ?, ?)'
+    AUTHENTICATE = 'SELECT admin_id, username, password FROM administrators WHERE username = ? AND password = ?'
+    ANY = 'SELECT 1 FROM administrators LIMIT 1'
+
+    def authenticate(self, username, password):
+        return self._fetchone(self.AUTHENTICATE, (username, password), Administrator)
+
+    def any(self):
+        return self._exists(self.ANY, ())
@@ -0,0 +1,220 @@
+# Индекс занятости расписания в памяти: для каждого врача и дня - битовая маска минут суток
+# (бит N установлен, если минута N занята приемом). Пересечение новой записи с уже
+# существующими - одна операция AND над маской дня, без запроса к базе.
+#
+# Дни загружаются из таблицы appointments при первом обращении. Записи система делает
+# через собственное соединение индекса, поэтому PRAGMA data_version этого соединения
+# меняется только от чужих изменений (другие соединения пула, другие процессы): тогда
+# загруженные дни сбрасываются и перечитываются из базы.
+
+import random
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+from repositories import AppointmentRepository
+from storage_profiles import DEFAULT_PROFILE, connect
+
+# Длительность приема по умолчанию, минут (такая же у записей, созданных до миграции 3)
+DEFAULT_DURATION = 15
+MINUTES_PER_DAY = 24 * 60
+# Рабочее время (минуты суток): свободные слоты ищутся так, чтобы прием закончился до 20:00
+WORK_START = 8 * 60
+WORK_END = 20 * 60
+# Шаг, с которым предлагается время начала приема
+SLOT_STEP = 5
+# Дней, загружаемых из базы одним запросом при поиске свободного времени
+LOAD_CHUNK_DAYS = 31
+# Ожидание блокировки записи базы (секунд) в одной попытке записи и число попыток: если
+# другие процессы держат базу дольше, запись не ждет бесконечно, а сообщает об этом
+BUSY_TIMEOUT = 1.0
+BOOK_ATTEMPTS = 5
+# Пауза перед повтором (секунд): удваивается с каждой попыткой, со случайной добавкой,
+# чтобы ожидающие процессы не начинали следующую попытку одновременно
+RETRY_DELAY = 0.01
+
+
+def _run_starts(free, length):
+    """Маска минут, с которых начинается не меньше length свободных минут подряд.
+    Сдвиги удваиваются: для приема в 60 минут - 6 операций AND, а не 60"""
+    starts, covered = free, 1
+    while covered < length:
+        shift = min(covered, length - covered)
+        starts &= starts >> shift
+        covered += shift
+    return starts
+
+
+class SlotTaken(sqlite3.IntegrityError):
+    """Время приема пересекается с другой записью"""
+
+
+class SlotBusy(sqlite3.OperationalError):
+    """База занята другими записями дольше, чем ждет запись на прием (все попытки исчерпаны)"""
+
+
+def _is_busy(error):
+    """SQLITE_BUSY: блокировку записи держит другое соединение"""
+    return str(error).startswith('database is locked')
+
+
+def day_key(appointment_date):
+    """Дата ГГГГ-ММ-ДД в виде, в котором ее хранит таблица (2025-1-5 -> 2025-01-05)"""
+    return datetime.strptime(appointment_date, '%Y-%m-%d').date().isoformat()
+
+
+def minute_of_day(appointment_time):
+    """Минута суток из строки ЧЧ:ММ (без strptime: при загрузке дня так разбирается каждая запись)"""
+    hours, minutes = appointment_time.split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+def format_minute(minute):
+    return f'{minute // 60:02d}:{minute % 60:02d}'
+
+
+def interval_mask(start, duration):
+    """Маска минут [start, start + duration), обрезанная концом суток"""
+    end = min(start + duration, MINUTES_PER_DAY)
+    return ((1 << (end - start)) - 1) << start
+
+
+# Рабочее время в виде маски минут и подписи ЧЧ:ММ для начал приема на сетке SLOT_STEP
+_WORK_HOURS = interval_mask(WORK_START, WORK_END - WORK_START)
+_GRID_LABELS = [format_minute(minute) for minute in range(WORK_START, WORK_END, SLOT_STEP)]
+
+
+def _grid_starts(starts):
+    """Подписи минут сетки SLOT_STEP, у которых установлен бит маски starts, по возрастанию.
+    Биты разбираются строкой: срез с шагом дает сразу все точки сетки, без цикла по битам"""
+    bits = format(starts >> WORK_START, 'b')[::-1][::SLOT_STEP]
+    return [label for label, bit in zip(_GRID_LABELS, bits) if bit == '1']
+
+
+class SlotIndex:
+    """Занятость расписания по дням. Потокобезопасен: все обращения под одной блокировкой"""
+
+    def __init__(self, db_path, profile=DEFAULT_PROFILE):
+        # isolation_level=None: транзакции записи открываются явно (BEGIN IMMEDIATE)
+        self._conn = connect(db_path, profile, check_same_thread=False, isolation_level=None,
+                             timeout=BUSY_TIMEOUT)
+        self._lock = threading.Lock()
+        # (ID врача, дата ГГГГ-ММ-ДД) -> маска занятых минут
+        self._days = {}
+        self._data_version = None
+        self.reloads = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _sync(self):
+        """Сбрасывает загруженные дни, если таблицу с прошлой проверки меняло другое соединение"""
+        version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+        if version != self._data_version:
+            if self._days:
+                self.reloads += 1
+            self._days.clear()
+            self._data_version = version
+
+    def _load(self, doctor_id, first, last):
+        """Загружает незагруженные дни врача на отрезке [first, last] (даты) одним запросом"""
+        days = ((first + timedelta(days=offset)).isoformat() for offset in range((last - first).days + 1))
+        missing = dict.fromkeys((doctor_id, day) for day in days if (doctor_id, day) not in self._days)
+        if not missing:
+            return
+        occupied = dict.fromkeys(missing, 0)
+        first_day, last_day = next(iter(missing))[1], next(reversed(missing))[1]
+        for day, appointment_time, duration in self._conn.execute(AppointmentRepository.OCCUPANCY,
+                                                                  (doctor_id, first_day, last_day)):
+            key = (doctor_id, day)
+            if key in occupied:
+                occupied[key] |= interval_mask(minute_of_day(appointment_time), duration)
+        self._days.update(occupied)
+
+    def _day(self, doctor_id, day):
+        """Маска дня врача; при первом обращении после сброса - из базы"""
+        occupied = self._days.get((doctor_id, day))
+        if occupied is None:
+            occupied = 0
+            for appointment_time, duration in self._conn.execute(AppointmentRepository.DAY_OCCUPANCY,
+                                                                 (doctor_id, day)):
+                occupied |= interval_mask(minute_of_day(appointment_time), duration)
+            self._days[(doctor_id, day)] = occupied
+        return occupied
+
+    def overlaps(self, doctor_id, appointment_date, appointment_time, duration=DEFAULT_DURATION):
+        """Пересекается ли прием с уже существующими записями врача в этот день"""
+        day, mask = day_key(appointment_date), interval_mask(minute_of_day(appointment_time), duration)
+        with self._lock:
+            self._sync()
+            return bool(self._day(doctor_id, day) & mask)
+
+    def free_slots(self, doctor_id, first_date, last_date, duration=DEFAULT_DURATION, limit=None):
+        """Свободное время врача с first_date по last_date включительно: (дата, время начала) по порядку.
+        Прием длительностью duration помещается в рабочее время и ни с чем не пересекается;
+        limit - вернуть только столько самых ранних (None - все)"""
+        first = datetime.strptime(first_date, '%Y-%m-%d').date()
+        last = datetime.strptime(last_date, '%Y-%m-%d').date()
+        found = []
+        with self._lock:
+            self._sync()
+            chunk = first
+            while chunk <= last and (limit is None or len(found) < limit):
+                chunk_last = min(chunk + timedelta(days=LOAD_CHUNK_DAYS - 1), last)
+                self._load(doctor_id, chunk, chunk_last)
+                for offset in range((chunk_last - chunk).days + 1):
+                    day = (chunk + timedelta(days=offset)).isoformat()
+                    starts = _run_starts(~self._days[(doctor_id, day)] & _WORK_HOURS, duration)
+                    if starts:
+                        found.extend((day, start) for start in _grid_starts(starts))
+                        if limit is not None and len(found) >= limit:
+                            del found[limit:]
+                            break
+                chunk = chunk_last + timedelta(days=1)
+        return found
+
+    def book(self, patient_id, doctor_id, appointment_date, appointment_time, duration=DEFAULT_DURATION):
+        """Создает запись к врачу, если у него это время свободно. Возвращает ID записи; SlotTaken - занято,
+        SlotBusy - база занята другими записями. Проверка и вставка - в одной транзакции записи:
+        между ними никто (ни другой поток, ни другой процесс) не займет это время"""
+        day, start = day_key(appointment_date), minute_of_day(appointment_time)
+        mask = interval_mask(start, duration)
+        for attempt in range(BOOK_ATTEMPTS):
+            try:
+                return self._book(patient_id, doctor_id, day, start, duration, mask)
+            except sqlite3.OperationalError as e:
+                if not _is_busy(e):
+                    raise
+            # Блокировка индекса на время паузы не держится: чтение расписания в этом процессе не ждет
+            time.sleep(RETRY_DELAY * (2 ** attempt) * (1 + random.random()))
+        raise SlotBusy(f"База данных занята, запись на {format_minute(start)} {day} не выполнена. "
+                       f"Повторите попытку")
+
+    def _book(self, patient_id, doctor_id, day, start, duration, mask):
+        """Одна попытка записи; sqlite3.OperationalError (SQLITE_BUSY) - блокировку записи не дождались"""
+        with self._lock:
+            # IMMEDIATE: блокировка записи берется сразу, до проверки, а не при первом INSERT
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                # Под блокировкой записи базы чужие изменения уже видны и новых не будет до COMMIT
+                self._sync()
+                if self._day(doctor_id, day) & mask:
+                    raise SlotTaken(f"Время {format_minute(start)} {day} пересекается с другой записью врача")
+                # Совпадение начала приема дополнительно запрещает индекс ux_appointments_doctor_slot
+                cursor = self._conn.execute(AppointmentRepository.ADD,
+                                            (patient_id, doctor_id, day, format_minute(start), duration))
+                self._conn.execute('COMMIT')
+            except BaseException:
+                if self._conn.in_transaction:
+                    self._conn.execute('ROLLBACK')
+                raise
+            # Своя запись не меняет data_version этого соединения: маска дня обновляется здесь
+            self._days[(doctor_id, day)] |= mask
+            return cursor.lastrowid
+
+    def stats(self):
+        """Загруженные дни (врач и дата) и число перезагрузок из-за чужих изменений"""
+        with self._lock:
+            return {'days': len(self._days), 'reloads': self.reloads}
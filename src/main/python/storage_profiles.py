@@ -0,0 +1,66 @@
+import sqlite3
+
+# Профили хранения: PRAGMA, которые выполняются при открытии каждого соединения.
+# cache_size в отрицательных значениях задается в КиБ, mmap_size - в байтах.
+# Журнал WAL хранится в самом файле базы, поэтому все профили используют его:
+# сменить режим журнала, пока базу держат открытой другие соединения, SQLite не даст.
+STORAGE_PROFILES = {
+    # Работа через меню: короткие транзакции, чтение не блокирует запись
+    'interactive': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -16 * 1024,
+        'mmap_size': 64 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+    },
+    # Массовая загрузка: без fsync, большой кэш страниц
+    'bulk-load': {
+        'journal_mode': 'WAL',
+        'synchronous': 'OFF',
+        'cache_size': -256 * 1024,
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+    },
+    # Отчеты и выгрузки: только чтение, большой кэш и отображение файла в память
+    'reporting': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -64 * 1024,
+        'mmap_size': 1024 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+        'query_only': 'ON',
+    },
+}
+
+DEFAULT_PROFILE = 'interactive'
+
+# Режим журнала меняется вне транзакции и раньше остальных настроек
+_PRAGMA_ORDER = ('journal_mode', 'synchronous', 'cache_size', 'mmap_size', 'temp_store', 'query_only')
+
+
+def apply_profile(conn, profile):
+    """Выполняет PRAGMA профиля на соединении. Возвращает фактические значения настроек"""
+    if profile is None:
+        return {}
+    try:
+        settings = STORAGE_PROFILES[profile]
+    except KeyError:
+        raise ValueError(f"Неизвестный профиль хранения: {profile}") from None
+
+    applied = {}
+    for name in _PRAGMA_ORDER:
+        if name in settings:
+            conn.execute(f'PRAGMA {name} = {settings[name]}')
+            applied[name] = conn.execute(f'PRAGMA {name}').fetchone()[0]
+    return applied
+
+
+def connect(db_path, profile=DEFAULT_PROFILE, **kwargs):
+    """sqlite3.connect с примененным профилем хранения"""
+    conn = sqlite3.connect(db_path, **kwargs)
+    try:
+        apply_profile(conn, profile)
+    except Exception:
+        conn.close()
+        raise
+    return conn